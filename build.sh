@@ -6,4 +6,6 @@ pip install -r requirements.txt
 
 # Collect static files and apply migrations
 python manage.py collectstatic --no-input
-python manage.py migrate
\ No newline at end of file
+python manage.py migrate
+python manage.py generate_mentor_slots
+python manage.py build_lesson_similarity
\ No newline at end of file
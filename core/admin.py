@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Lesson, Quiz, Progress, MentorshipBooking, ForumPost, HomePageContent
+from .models import Lesson, Quiz, Progress, MentorshipBooking, ForumPost, HomePageContent, QuizGenerationJob, QuizCacheEntry, UserProgressSummary, QuizAttempt, AnswerRecord, QuizItemStats, LessonSimilarity, Mentor, MentorAvailability, MentorSlot
 
 @admin.register(Lesson)
 class LessonAdmin(admin.ModelAdmin):
@@ -9,25 +9,129 @@ class LessonAdmin(admin.ModelAdmin):
 
 @admin.register(Quiz)
 class QuizAdmin(admin.ModelAdmin):
-    list_display = ('lesson', 'question')
+    list_display = ('lesson', 'question', 'responses', 'difficulty', 'discrimination', 'review_flags')
+    list_select_related = ('lesson', 'item_stats')
     search_fields = ('question',)
     list_filter = ('lesson',)
+    readonly_fields = ('option_rates',)
+    actions = ['recompute_item_stats']
+
+    def stats(self, obj):
+        try:
+            return obj.item_stats
+        except QuizItemStats.DoesNotExist:
+            return None
+
+    @admin.display(description='Responses', ordering='item_stats__response_count')
+    def responses(self, obj):
+        stats = self.stats(obj)
+        return stats.response_count if stats else 0
+
+    @admin.display(description='Difficulty (p)', ordering='item_stats__difficulty')
+    def difficulty(self, obj):
+        stats = self.stats(obj)
+        return f"{stats.difficulty:.2f}" if stats and stats.difficulty is not None else '-'
+
+    @admin.display(description='Discrimination', ordering='item_stats__discrimination')
+    def discrimination(self, obj):
+        stats = self.stats(obj)
+        return f"{stats.discrimination:.2f}" if stats and stats.discrimination is not None else '-'
+
+    @admin.display(description='Review')
+    def review_flags(self, obj):
+        from . import analytics  # imports numpy; keep it out of every process's startup
+
+        return ', '.join(analytics.item_flags(self.stats(obj), obj.correct_index)) or '-'
+
+    @admin.display(description='Answer distribution')
+    def option_rates(self, obj):
+        stats = self.stats(obj)
+        if not stats or not stats.option_rates:
+            return 'No answers analysed yet.'
+        labels = obj.options_list + ['(blank)']
+        return '; '.join(f"{label}: {rate:.0%}" for label, rate in zip(labels, stats.option_rates))
+
+    @admin.action(description='Recompute item analysis for all questions')
+    def recompute_item_stats(self, request, queryset):
+        from . import analytics
+
+        count = analytics.refresh_item_stats()
+        self.message_user(request, f"Item analysis updated for {count} questions.")
 
 @admin.register(Progress)
 class ProgressAdmin(admin.ModelAdmin):
     list_display = ('user', 'lesson', 'completed', 'score')
+    list_select_related = ('user', 'lesson')
     list_filter = ('completed',)
 
+@admin.register(UserProgressSummary)
+class UserProgressSummaryAdmin(admin.ModelAdmin):
+    list_display = ('user', 'completed_count', 'lowest_score', 'next_lesson', 'updated_at')
+    list_select_related = ('user', 'next_lesson')
+
+@admin.register(LessonSimilarity)
+class LessonSimilarityAdmin(admin.ModelAdmin):
+    list_display = ('lesson', 'similar', 'score')
+    list_select_related = ('lesson', 'similar')
+    raw_id_fields = ('lesson', 'similar')
+    search_fields = ('lesson__title',)
+
+class AnswerRecordInline(admin.TabularInline):
+    model = AnswerRecord
+    extra = 0
+    raw_id_fields = ('quiz',)
+
+@admin.register(QuizAttempt)
+class QuizAttemptAdmin(admin.ModelAdmin):
+    list_display = ('user', 'lesson', 'score', 'correct_count', 'question_count', 'created_at')
+    list_select_related = ('user', 'lesson')
+    list_filter = ('created_at',)
+    raw_id_fields = ('user', 'lesson')
+    inlines = [AnswerRecordInline]
+
+class MentorAvailabilityInline(admin.TabularInline):
+    model = MentorAvailability
+    extra = 0
+
+@admin.register(Mentor)
+class MentorAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slot_minutes', 'is_active')
+    list_filter = ('is_active',)
+    inlines = [MentorAvailabilityInline]
+
+@admin.register(MentorSlot)
+class MentorSlotAdmin(admin.ModelAdmin):
+    list_display = ('mentor', 'start', 'end')
+    list_select_related = ('mentor',)
+    list_filter = ('mentor',)
+    date_hierarchy = 'start'
+
 @admin.register(MentorshipBooking)
 class MentorshipBookingAdmin(admin.ModelAdmin):
     list_display = ('user', 'mentor', 'date', 'status')
+    list_select_related = ('user',)
+    raw_id_fields = ('slot',)
     list_filter = ('status',)
 
 @admin.register(ForumPost)
 class ForumPostAdmin(admin.ModelAdmin):
     list_display = ('title', 'user', 'created_at')
+    list_select_related = ('user',)
     list_filter = ('created_at',)
 
 @admin.register(HomePageContent)
 class HomePageContentAdmin(admin.ModelAdmin):
-    list_display = ('welcome_title', 'hero_image')
\ No newline at end of file
+    list_display = ('welcome_title', 'hero_image')
+
+@admin.register(QuizGenerationJob)
+class QuizGenerationJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'lesson', 'status', 'attempts', 'created_count', 'run_after', 'updated_at')
+    list_filter = ('status',)
+    list_select_related = ('lesson',)
+    readonly_fields = ('created_at', 'updated_at')
+
+
+@admin.register(QuizCacheEntry)
+class QuizCacheEntryAdmin(admin.ModelAdmin):
+    list_display = ('key', 'model_name', 'size_bytes', 'hits', 'last_used_at')
+    readonly_fields = ('created_at',)
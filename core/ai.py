@@ -0,0 +1,379 @@
+import asyncio
+import hashlib
+import json
+import logging
+import threading
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from . import metrics, search
+from .models import Lesson, Quiz, QuizCacheEntry
+
+logger = logging.getLogger(__name__)
+
+QUIZ_MODEL = "gpt-3.5-turbo"  # Use a suitable model (e.g., gpt-4 for better results, if available)
+
+QUIZ_PROMPT_TEMPLATE = """
+Generate exactly 3 multiple-choice questions based on this lesson content: "{content}".
+
+Return ONLY a JSON array with this exact structure:
+[
+  {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option1"}},
+  {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option2"}},
+  {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option3"}}
+]
+No additional text, explanations, or labels. Ensure questions and options are relevant to the lesson content.
+"""
+
+
+# The openai package (with httpx and pydantic) takes most of a second to import, so it is
+# only imported when a client is first needed; processes that never call the model skip it.
+def client_options(base_url=None):
+    base_url = base_url or settings.OPENAI_BASE_URL
+    if not settings.OPENAI_API_KEY and not base_url:
+        raise ImproperlyConfigured("OPENAI_API_KEY is not set.")
+    # Self-hosted OpenAI-compatible servers often need no key, but the client refuses an empty one.
+    return {'api_key': settings.OPENAI_API_KEY or 'unused', 'base_url': base_url}
+
+
+def make_client(base_url=None):
+    from openai import OpenAI
+
+    return OpenAI(**client_options(base_url))
+
+
+# One sync client per configuration, created on first use and shared by every thread,
+# so requests reuse its httpx connection pool instead of reconnecting each time.
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client():
+    key = (settings.OPENAI_API_KEY, settings.OPENAI_BASE_URL)
+    sync_client = _clients.get(key)
+    if sync_client is None:
+        with _clients_lock:
+            sync_client = _clients.get(key)
+            if sync_client is None:
+                sync_client = _clients[key] = make_client()
+    return sync_client
+
+
+# AsyncOpenAI keeps an httpx connection pool tied to the event loop that created
+# it, so each loop (one per ASGI worker, one per request under WSGI) gets its own.
+_async_clients = weakref.WeakKeyDictionary()
+
+
+def get_async_client():
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        from openai import AsyncOpenAI
+
+        async_client = _async_clients[loop] = AsyncOpenAI(**client_options())
+    return async_client
+
+
+def build_quiz_prompt(lesson):
+    return QUIZ_PROMPT_TEMPLATE.format(content=lesson.content)
+
+
+def quiz_request(lesson):
+    return {
+        "model": QUIZ_MODEL,
+        "messages": [{"role": "user", "content": build_quiz_prompt(lesson)}],
+        "max_tokens": 500,
+        "response_format": {"type": "json_object"},
+    }
+
+
+def reply_text(response):
+    raw_text = (response.choices[0].message.content or "").strip()
+    if not raw_text:
+        raise ValueError("Empty response from OpenAI API")
+    return raw_text
+
+
+def request_quiz_text(lesson, api_client=None):
+    """Send the lesson to the chat-completions API and return the raw reply text."""
+    api_client = api_client or get_client()
+    with metrics.llm_call('quiz'):
+        response = api_client.chat.completions.create(**quiz_request(lesson))
+        metrics.record_usage(getattr(response, 'usage', None))
+    return reply_text(response)
+
+
+async def arequest_quiz_text(lesson, api_client=None):
+    """Async twin of ``request_quiz_text`` for async views; the worker is free while the model runs."""
+    api_client = api_client or get_async_client()
+    with metrics.llm_call('quiz'):
+        response = await api_client.chat.completions.create(**quiz_request(lesson))
+        metrics.record_usage(getattr(response, 'usage', None))
+    return reply_text(response)
+
+
+def parse_quiz_list(raw_text, lesson):
+    """
+    Turn the raw reply into a list of question dicts.
+
+    ``response_format=json_object`` makes the model wrap the array in an
+    object (e.g. ``{"questions": [...]}``), so the first list value is used.
+    """
+    try:
+        quiz_list = json.loads(raw_text)
+    except json.JSONDecodeError as e:
+        logger.warning("JSON decode error for lesson %s: %s", lesson.id, e)
+        lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
+        if len(lines) >= 5:
+            return [{
+                "question": lines[0],
+                "options": lines[1:5],
+                "correct_answer": lines[1]
+            }]
+        return []
+
+    if isinstance(quiz_list, dict):
+        if "question" in quiz_list:
+            return [quiz_list]
+        quiz_list = next((v for v in quiz_list.values() if isinstance(v, list)), [])
+    return quiz_list if isinstance(quiz_list, list) else []
+
+
+class QuizStreamParser:
+    """
+    Incremental parser for a streamed quiz reply.
+
+    ``feed()`` takes the next piece of reply text and returns the question
+    objects completed by it: every ``{...}`` that sits directly inside a JSON
+    array is decoded as soon as its closing brace arrives, whether the reply
+    is a bare array or wrapped as ``{"questions": [...]}``.
+    """
+
+    def __init__(self):
+        self.buffer = []
+        self.stack = []  # '[' or the buffer offset where an object started
+        self.in_string = False
+        self.escaped = False
+        self.offset = 0
+
+    def feed(self, text):
+        completed = []
+        self.buffer.append(text)
+        for char in text:
+            position = self.offset
+            self.offset += 1
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char == '[':
+                self.stack.append('[')
+            elif char == '{':
+                self.stack.append(position)
+            elif char in ']}' and self.stack:
+                start = self.stack.pop()
+                if char == '}' and start != '[' and self.stack and self.stack[-1] == '[':
+                    completed.append(self._decode(start, position + 1))
+        return [q for q in completed if q is not None]
+
+    def _decode(self, start, end):
+        text = ''.join(self.buffer)
+        self.buffer = [text]
+        try:
+            return json.loads(text[start:end])
+        except json.JSONDecodeError:
+            return None
+
+
+def is_valid_quiz(q):
+    return (
+        isinstance(q, dict)
+        and "question" in q
+        and "options" in q
+        and isinstance(q["options"], list)
+        and len(q["options"]) == 4
+        and "correct_answer" in q
+        and q["correct_answer"] in q["options"]
+    )
+
+
+def create_quizzes(lesson, quiz_list):
+    """
+    Write the valid entries as Quiz rows and return the new rows.
+
+    Questions the lesson already has (or that repeat within ``quiz_list``)
+    are skipped, so regenerating an unchanged lesson adds no duplicates.
+    """
+    seen = set(Quiz.objects.filter(lesson=lesson).values_list('question', flat=True))
+    new_quizzes = []
+    for q in quiz_list:
+        if not is_valid_quiz(q):
+            logger.info("Invalid quiz data for lesson %s: %r", lesson.id, q)
+            continue
+        if q["question"] in seen:
+            continue
+        seen.add(q["question"])
+        new_quizzes.append(Quiz(
+            lesson=lesson,
+            question=q["question"],
+            option1=q["options"][0],
+            option2=q["options"][1],
+            option3=q["options"][2],
+            option4=q["options"][3],
+            correct_index=q["options"].index(q["correct_answer"]) + 1
+        ))
+    Quiz.objects.bulk_create(new_quizzes)
+    # bulk_create skips post_save, so index the new rows for search and flag the lesson's similarity here.
+    search.save_documents([search.document_for(quiz) for quiz in new_quizzes])
+    if new_quizzes:
+        Lesson.mark_similarity_stale([lesson.id])
+    return new_quizzes
+
+
+def save_quizzes(lesson, quiz_list):
+    """Write the valid, new entries of ``quiz_list`` and return how many were written."""
+    return len(create_quizzes(lesson, quiz_list))
+
+
+def save_quiz(lesson, q):
+    """Write a single question; returns the Quiz, or None if it was invalid or already there."""
+    created = create_quizzes(lesson, [q])
+    return created[0] if created else None
+
+
+def save_fallback_quiz(lesson, error):
+    Quiz.objects.create(
+        lesson=lesson,
+        question=f"Sample question for {lesson.title} (Fallback due to error: {str(error)[:50]})",
+        option1="Option A",
+        option2="Option B",
+        option3="Option C",
+        option4="Option D",
+        correct_index=1
+    )
+
+
+def cache_key(lesson, model=QUIZ_MODEL):
+    payload = "\0".join([QUIZ_PROMPT_TEMPLATE, model, lesson.content])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def get_cached_quiz_list(lesson, model=QUIZ_MODEL):
+    """Return the cached question list for the lesson's current content, or None."""
+    entry = QuizCacheEntry.objects.filter(key=cache_key(lesson, model)).first()
+    if entry is None:
+        return None
+    QuizCacheEntry.objects.filter(id=entry.id).update(hits=F('hits') + 1, last_used_at=timezone.now())
+    return json.loads(entry.response)
+
+
+def store_quiz_list(lesson, quiz_list, model=QUIZ_MODEL):
+    response = json.dumps(quiz_list)
+    QuizCacheEntry.objects.update_or_create(
+        key=cache_key(lesson, model),
+        defaults={
+            'model_name': model,
+            'response': response,
+            'size_bytes': len(response.encode("utf-8")),
+            'last_used_at': timezone.now(),
+        },
+    )
+    evict_cache()
+
+
+def evict_cache(max_bytes=None):
+    """Drop least recently used entries until the cache fits in ``AI_QUIZ_CACHE_MAX_BYTES``."""
+    if max_bytes is None:
+        max_bytes = getattr(settings, 'AI_QUIZ_CACHE_MAX_BYTES', 5 * 1024 * 1024)
+    total = QuizCacheEntry.objects.aggregate(total=Sum('size_bytes'))['total'] or 0
+    if total <= max_bytes:
+        return 0
+    stale_ids = []
+    for entry_id, size in QuizCacheEntry.objects.order_by('last_used_at', 'id').values_list('id', 'size_bytes').iterator():
+        if total <= max_bytes:
+            break
+        stale_ids.append(entry_id)
+        total -= size
+    QuizCacheEntry.objects.filter(id__in=stale_ids).delete()
+    return len(stale_ids)
+
+
+def fetch_quiz_list(lesson, api_client=None):
+    """Valid questions for ``lesson``, from the cache when the content is unchanged."""
+    quiz_list = get_cached_quiz_list(lesson)
+    if quiz_list is not None:
+        return quiz_list
+    raw_text = request_quiz_text(lesson, api_client=api_client)
+    quiz_list = [q for q in parse_quiz_list(raw_text, lesson) if is_valid_quiz(q)]
+    if not quiz_list:
+        raise ValueError("No valid quizzes generated from the response.")
+    store_quiz_list(lesson, quiz_list)
+    return quiz_list
+
+
+def generate_quizzes(lesson, api_client=None):
+    """Fetch quizzes for ``lesson`` (cached or from the model) and store them. Returns the count created."""
+    return save_quizzes(lesson, fetch_quiz_list(lesson, api_client=api_client))
+
+
+async def afetch_quiz_list(lesson, api_client=None):
+    """Async ``fetch_quiz_list``: only the API call is awaited, the cache lookups run in a thread."""
+    quiz_list = await sync_to_async(get_cached_quiz_list)(lesson)
+    if quiz_list is not None:
+        return quiz_list
+    raw_text = await arequest_quiz_text(lesson, api_client=api_client)
+    quiz_list = [q for q in parse_quiz_list(raw_text, lesson) if is_valid_quiz(q)]
+    if not quiz_list:
+        raise ValueError("No valid quizzes generated from the response.")
+    await sync_to_async(store_quiz_list)(lesson, quiz_list)
+    return quiz_list
+
+
+async def astream_quizzes(lesson, api_client=None):
+    """
+    Yield each new Quiz for ``lesson`` as soon as the streamed reply completes it.
+
+    Questions are saved one by one while the model is still writing the rest;
+    the full list is cached at the end like a regular reply.
+    """
+    cached = await sync_to_async(get_cached_quiz_list)(lesson)
+    if cached is not None:
+        for q in cached:
+            quiz = await sync_to_async(save_quiz)(lesson, q)
+            if quiz is not None:
+                yield quiz
+        return
+
+    api_client = api_client or get_async_client()
+    parser = QuizStreamParser()
+    quiz_list = []
+    with metrics.llm_call('quiz_stream'):
+        stream = await api_client.chat.completions.create(
+            **quiz_request(lesson), stream=True, stream_options={"include_usage": True}
+        )
+        async for chunk in stream:
+            # The last chunk has no choices, only the token usage for the whole reply.
+            metrics.record_usage(getattr(chunk, 'usage', None))
+            if not chunk.choices or not chunk.choices[0].delta.content:
+                continue
+            for q in parser.feed(chunk.choices[0].delta.content):
+                if not is_valid_quiz(q):
+                    logger.info("Invalid quiz data for lesson %s: %r", lesson.id, q)
+                    continue
+                quiz_list.append(q)
+                quiz = await sync_to_async(save_quiz)(lesson, q)
+                if quiz is not None:
+                    yield quiz
+    if not quiz_list:
+        raise ValueError("No valid quizzes generated from the response.")
+    await sync_to_async(store_quiz_list)(lesson, quiz_list)
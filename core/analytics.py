@@ -0,0 +1,156 @@
+"""
+Classical item analysis over recorded quiz answers.
+
+Attempts and answers are streamed out of the database in chunks straight
+into NumPy integer arrays; every statistic is then a handful of vectorized
+sorts and ``bincount`` calls rather than a Python loop per answer. Results
+are written to ``QuizItemStats`` for the admin to display.
+"""
+import numpy as np
+from django.db import connection, transaction
+
+from .models import AnswerRecord, QuizAttempt, QuizItemStats
+
+# Share of attempts per lesson counted as the upper and lower groups for discrimination.
+GROUP_FRACTION = 0.27
+# Flag thresholds.
+MIN_RESPONSES = 20
+TOO_EASY = 0.9
+TOO_HARD = 0.3
+LOW_DISCRIMINATION = 0.2
+
+
+def fetch_array(sql, columns, chunk_size=50_000):
+    """Run ``sql`` and stack the integer rows into a (rows, columns) array, one chunk at a time."""
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunks.append(np.array(rows, dtype=np.int64))
+    if not chunks:
+        return np.empty((0, columns), dtype=np.int64)
+    return np.concatenate(chunks)
+
+
+def load_answers(chunk_size=50_000):
+    """Return (attempts, answers): [id, lesson_id, score] and [attempt_id, quiz_id, selected, correct]."""
+    attempt_table = QuizAttempt._meta.db_table
+    answer_table = AnswerRecord._meta.db_table
+    with transaction.atomic():
+        attempts = fetch_array(f"SELECT id, lesson_id, score FROM {attempt_table}", 3, chunk_size)
+        answers = fetch_array(
+            f"SELECT attempt_id, quiz_id, COALESCE(selected_index, 0), "
+            f"CASE WHEN is_correct THEN 1 ELSE 0 END FROM {answer_table}",
+            4, chunk_size,
+        )
+    return attempts, answers
+
+
+def attempt_groups(attempts):
+    """+1 for attempts in the top GROUP_FRACTION of their lesson by score, -1 for the bottom, else 0."""
+    count = len(attempts)
+    groups = np.zeros(count, dtype=np.int8)
+    if not count:
+        return groups
+    order = np.lexsort((attempts[:, 0], attempts[:, 2], attempts[:, 1]))
+    _, starts, sizes = np.unique(attempts[order, 1], return_index=True, return_counts=True)
+    group_size = np.repeat(sizes, sizes)
+    rank = np.arange(count) - np.repeat(starts, sizes)
+    cut = np.ceil(group_size * GROUP_FRACTION)
+    ranked = group_size >= 2
+    groups[order[ranked & (rank >= group_size - cut)]] = 1
+    groups[order[ranked & (rank < cut)]] = -1
+    return groups
+
+
+def compute_item_stats(attempts, answers):
+    """
+    Per-question statistics from the arrays returned by ``load_answers``.
+
+    Returns a dict of parallel arrays keyed by quiz_id, response_count,
+    difficulty, discrimination (NaN where a group is empty) and option_rates
+    (one row per question: options 1-4, then blank).
+    """
+    if not len(answers) or not len(attempts):
+        return {'quiz_id': np.empty(0, dtype=np.int64), 'response_count': np.empty(0, dtype=np.int64),
+                'difficulty': np.empty(0), 'discrimination': np.empty(0), 'option_rates': np.empty((0, 5))}
+
+    # Line every answer up with its attempt's group; answers without a matching attempt are dropped.
+    by_id = np.argsort(attempts[:, 0])
+    sorted_ids = attempts[by_id, 0]
+    position = np.minimum(np.searchsorted(sorted_ids, answers[:, 0]), len(sorted_ids) - 1)
+    matched = sorted_ids[position] == answers[:, 0]
+    answers = answers[matched]
+    answer_group = attempt_groups(attempts)[by_id[position[matched]]]
+
+    quiz_ids, question = np.unique(answers[:, 1], return_inverse=True)
+    size = len(quiz_ids)
+    correct = answers[:, 3]
+    responses = np.bincount(question, minlength=size)
+    correct_count = np.bincount(question, weights=correct, minlength=size)
+
+    upper, lower = answer_group == 1, answer_group == -1
+    with np.errstate(divide='ignore', invalid='ignore'):
+        upper_rate = (np.bincount(question[upper], weights=correct[upper], minlength=size)
+                      / np.bincount(question[upper], minlength=size))
+        lower_rate = (np.bincount(question[lower], weights=correct[lower], minlength=size)
+                      / np.bincount(question[lower], minlength=size))
+
+    options = np.bincount(question * 5 + answers[:, 2], minlength=size * 5).reshape(size, 5)
+    return {
+        'quiz_id': quiz_ids,
+        'response_count': responses,
+        'difficulty': correct_count / responses,
+        'discrimination': upper_rate - lower_rate,
+        'option_rates': options[:, [1, 2, 3, 4, 0]] / responses[:, None],
+    }
+
+
+def save_item_stats(stats, batch_size=1000):
+    """Replace every QuizItemStats row with ``stats``. Returns the number of rows written."""
+    def clean(value):
+        return None if np.isnan(value) else round(float(value), 4)
+
+    rows = [
+        QuizItemStats(
+            quiz_id=int(quiz_id),
+            response_count=int(responses),
+            difficulty=clean(difficulty),
+            discrimination=clean(discrimination),
+            option_rates=[round(float(rate), 4) for rate in rates],
+        )
+        for quiz_id, responses, difficulty, discrimination, rates in zip(
+            stats['quiz_id'], stats['response_count'], stats['difficulty'],
+            stats['discrimination'], stats['option_rates'],
+        )
+    ]
+    with transaction.atomic():
+        QuizItemStats.objects.all().delete()
+        QuizItemStats.objects.bulk_create(rows, batch_size=batch_size)
+    return len(rows)
+
+
+def refresh_item_stats(chunk_size=50_000):
+    """Recompute and store item statistics for every answered question."""
+    return save_item_stats(compute_item_stats(*load_answers(chunk_size)))
+
+
+def item_flags(stats, correct_index):
+    """Short labels for questions worth reviewing, given their QuizItemStats."""
+    if stats is None or stats.response_count < MIN_RESPONSES:
+        return []
+    flags = []
+    if stats.difficulty is not None and stats.difficulty >= TOO_EASY:
+        flags.append('too easy')
+    if stats.difficulty is not None and stats.difficulty <= TOO_HARD:
+        flags.append('too hard')
+    if stats.discrimination is not None and stats.discrimination < LOW_DISCRIMINATION:
+        flags.append('low discrimination')
+    rates = stats.option_rates[:4]
+    if len(rates) == 4 and any(rate > rates[correct_index - 1]
+                               for index, rate in enumerate(rates, 1) if index != correct_index):
+        flags.append('misleading distractor')
+    return flags
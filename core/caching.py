@@ -0,0 +1,54 @@
+"""
+Versioned cache keys for pages and fragments built from course content.
+
+Each namespace has a counter in the cache that is folded into every key
+built from it. The signal handlers in ``core/signals.py`` bump the counter
+whenever a Lesson, Quiz or HomePageContent changes, which orphans every
+older entry at once without having to know which keys exist. Counters
+only reach other worker processes through a shared cache (``CACHE_URL``);
+with per-process memory, ``PAGE_CACHE_TIMEOUT`` bounds how stale they get.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import HomePageContent
+
+LESSONS = 'lessons'
+HOMEPAGE = 'homepage'
+
+_MISSING = object()
+
+
+def get_version(namespace):
+    key = f"version:{namespace}"
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, 1, None)
+        version = cache.get(key, 1)
+    return version
+
+
+def bump(namespace):
+    key = f"version:{namespace}"
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 2, None)
+        return cache.get(key, 2)
+
+
+def versioned_key(name, *namespaces):
+    versions = '.'.join(str(get_version(ns)) for ns in namespaces)
+    return f"{name}:v{versions}"
+
+
+def get_or_set(key, default_func):
+    value = cache.get(key, _MISSING)
+    if value is _MISSING:
+        value = default_func()
+        cache.set(key, value, settings.PAGE_CACHE_TIMEOUT)
+    return value
+
+
+def homepage_content():
+    return get_or_set(versioned_key('homepage-content', HOMEPAGE), HomePageContent.objects.first)
@@ -0,0 +1,252 @@
+"""
+Lessons, quizzes and lesson images as a streaming tar archive.
+
+``manage.py export_course`` / ``import_course`` move a catalog between
+environments. The archive starts with ``manifest.json``; lesson images follow
+as ``images/<sha256><ext>``, each written once however many lessons share it,
+and the lessons themselves go in ``lessons-NNNNN.jsonl`` members of up to
+``chunk_size`` lines, one lesson with its quizzes per line. Both directions
+walk the archive one member at a time through generators, so memory is
+bounded by a chunk whatever the size of the catalog, and the tar can be piped.
+
+Import deduplicates by content hash. A lesson whose title and content already
+exist is reused and only gets the quizzes it is missing, and an image whose
+bytes are already stored (under its hash name, or as an upload recorded in
+``ResponsiveImage``) is not written again. Rows are added with
+``bulk_create``, which sends no signals, so the search index and lesson cache
+version are updated here instead; derivatives for new images are left to
+``manage.py build_image_derivatives``. The whole import is one transaction,
+and the image files it wrote are deleted again if it fails.
+"""
+import hashlib
+import io
+import json
+import posixpath
+import re
+import tarfile
+import tempfile
+import time
+from itertools import islice
+
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from . import caching, images, search
+from .models import Lesson, Quiz, ResponsiveImage
+
+FORMAT = 'eden-course'
+VERSION = 1
+MANIFEST = 'manifest.json'
+IMAGE_MEMBER = re.compile(r'^images/(?P<digest>[0-9a-f]{64})(?P<ext>\.[a-z0-9]{1,5})?$')
+IMAGE_DIR = 'lesson_images'
+SPOOL_BYTES = 1024 * 1024  # images larger than this are staged on disk while their hash is checked
+
+
+class ArchiveError(ValueError):
+    pass
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def lesson_hash(title, content):
+    return hashlib.sha256(f"{title}\0{content}".encode()).hexdigest()
+
+
+def add_bytes(tar, name, data):
+    info = tarfile.TarInfo(name)
+    info.size, info.mtime = len(data), int(time.time())
+    tar.addfile(info, io.BytesIO(data))
+
+
+# ---------------------------
+# EXPORT
+# ---------------------------
+def lessons_with_quizzes(chunk_size=500):
+    """Yield ``(lesson, quizzes)`` in id order, merging two streamed queries instead of prefetching."""
+    quizzes = Quiz.objects.order_by('lesson_id', 'id').values_list(
+        'lesson_id', 'question', 'option1', 'option2', 'option3', 'option4', 'correct_index',
+    ).iterator(chunk_size=chunk_size)
+    pending = next(quizzes, None)
+    lessons = Lesson.objects.order_by('id').only('id', 'title', 'content', 'image')
+    for lesson in lessons.iterator(chunk_size=chunk_size):
+        own = []
+        while pending is not None and pending[0] <= lesson.id:
+            if pending[0] == lesson.id:
+                own.append({'question': pending[1], 'options': list(pending[2:6]), 'correct_index': pending[6]})
+            pending = next(quizzes, None)
+        yield lesson, own
+
+
+def add_image(tar, name, written):
+    """Add the stored file ``name`` as ``images/<sha256><ext>`` unless that content is already in the archive."""
+    try:
+        digest, size = images.source_hash(name), default_storage.size(name)
+    except OSError:
+        return None
+    member = f"images/{digest}{posixpath.splitext(name)[1].lower()}"
+    if member not in written:
+        info = tarfile.TarInfo(member)
+        info.size, info.mtime = size, int(time.time())
+        with default_storage.open(name, 'rb') as f:
+            tar.addfile(info, f)
+        written.add(member)
+    return member
+
+
+def export_course(fileobj, chunk_size=500, compress=False):
+    """Write every lesson, quiz and lesson image to ``fileobj``. Returns counts of what was written."""
+    stats = {'lessons': 0, 'quizzes': 0, 'images': 0, 'missing_images': 0}
+    members = {}  # storage name -> archive member (None if the file could not be read)
+    written = set()
+    with tarfile.open(fileobj=fileobj, mode='w|gz' if compress else 'w|') as tar:
+        add_bytes(tar, MANIFEST, json.dumps({'format': FORMAT, 'version': VERSION}).encode())
+        for number, chunk in enumerate(chunked(lessons_with_quizzes(chunk_size), chunk_size), 1):
+            lines = []
+            for lesson, quizzes in chunk:
+                image = None
+                if lesson.image:
+                    if lesson.image.name not in members:
+                        members[lesson.image.name] = add_image(tar, lesson.image.name, written)
+                        stats['missing_images'] += members[lesson.image.name] is None
+                    image = members[lesson.image.name]
+                lines.append(json.dumps({'title': lesson.title, 'content': lesson.content, 'image': image,
+                                         'quizzes': quizzes}))
+                stats['quizzes'] += len(quizzes)
+            stats['lessons'] += len(chunk)
+            add_bytes(tar, f"lessons-{number:05d}.jsonl", ('\n'.join(lines) + '\n').encode())
+    stats['images'] = len(written)
+    return stats
+
+
+# ---------------------------
+# IMPORT
+# ---------------------------
+def store_image(member, f, stats, written):
+    """
+    Save an ``images/<sha256><ext>`` member to storage, or reuse a stored copy. Returns the storage name.
+
+    Names of newly written files are appended to ``written``.
+    """
+    match = IMAGE_MEMBER.match(member)
+    if not match:
+        raise ArchiveError(f"Unexpected image member {member!r}.")
+    digest = match['digest']
+    name = f"{IMAGE_DIR}/{digest}{match['ext'] or ''}"
+    existing = ResponsiveImage.objects.filter(source_hash=digest).values_list('source_name', flat=True).first()
+    for candidate in (name, existing):
+        if candidate and default_storage.exists(candidate):
+            stats['skipped_images'] += 1
+            return candidate
+
+    with tempfile.SpooledTemporaryFile(max_size=SPOOL_BYTES) as spool:
+        checksum = hashlib.sha256()
+        for block in iter(lambda: f.read(64 * 1024), b''):
+            checksum.update(block)
+            spool.write(block)
+        if checksum.hexdigest() != digest:
+            raise ArchiveError(f"{member} does not match its hash.")
+        spool.seek(0)
+        name = default_storage.save(name, File(spool))
+    written.append(name)
+    stats['images'] += 1
+    return name
+
+
+def read_records(f):
+    for number, line in enumerate(f, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            quizzes = record.get('quizzes') or []
+            valid = isinstance(record['title'], str) and isinstance(record['content'], str) and all(
+                len(quiz['options']) == 4 and quiz['correct_index'] in (1, 2, 3, 4) for quiz in quizzes
+            )
+        except (ValueError, KeyError, TypeError):
+            valid = False
+        if not valid:
+            raise ArchiveError(f"Line {number} is not a valid lesson record.")
+        yield record
+
+
+def import_batch(records, known, stored, stats, batch_size=500):
+    """Create the new lessons and quizzes in ``records``; ``known`` maps lesson hashes to lessons or ids."""
+    digests = [lesson_hash(record['title'], record['content']) for record in records]
+    matched_ids = {known[digest] for digest in digests if isinstance(known.get(digest), int)}
+    new_lessons = []
+    for record, digest in zip(records, digests):
+        if digest in known:
+            stats['skipped_lessons'] += 1
+            continue
+        image = stored.get(record.get('image')) if record.get('image') else None
+        if record.get('image') and image is None:
+            raise ArchiveError(f"Lesson {record['title']!r} refers to {record['image']}, which is not in the archive.")
+        known[digest] = lesson = Lesson(title=record['title'], content=record['content'],
+                                        excerpt=Lesson.make_excerpt(record['content']), image=image)
+        new_lessons.append(lesson)
+    Lesson.objects.bulk_create(new_lessons, batch_size=batch_size)
+    for lesson in new_lessons:
+        known[lesson_hash(lesson.title, lesson.content)] = lesson.id
+
+    existing = set(Quiz.objects.filter(lesson_id__in=matched_ids).values_list('lesson_id', 'question'))
+    new_quizzes = []
+    for record, digest in zip(records, digests):
+        lesson_id = known[digest]
+        for quiz in record.get('quizzes') or []:
+            if (lesson_id, quiz['question']) in existing:
+                stats['skipped_quizzes'] += 1
+                continue
+            existing.add((lesson_id, quiz['question']))
+            option1, option2, option3, option4 = quiz['options']
+            new_quizzes.append(Quiz(lesson_id=lesson_id, question=quiz['question'], option1=option1,
+                                    option2=option2, option3=option3, option4=option4,
+                                    correct_index=quiz['correct_index']))
+    Quiz.objects.bulk_create(new_quizzes, batch_size=batch_size)
+
+    search.save_documents([search.document_for(obj) for obj in (*new_lessons, *new_quizzes)])
+    stats['lessons'] += len(new_lessons)
+    stats['quizzes'] += len(new_quizzes)
+
+
+def import_course(fileobj, batch_size=500):
+    """Read an archive written by ``export_course``; plain or gzipped. Returns counts of what was added."""
+    stats = dict.fromkeys(('lessons', 'quizzes', 'images', 'skipped_lessons', 'skipped_quizzes',
+                           'skipped_images'), 0)
+    known = {
+        lesson_hash(title, content): lesson_id
+        for lesson_id, title, content in Lesson.objects.values_list('id', 'title', 'content').iterator(chunk_size=2000)
+    }
+    stored = {}  # archive member -> storage name
+    written = []  # files this import saved, removed again if it is rolled back
+    try:
+        tar = tarfile.open(fileobj=fileobj, mode='r|*')
+    except tarfile.TarError as e:
+        raise ArchiveError(f"Not a course archive: {e}") from e
+    try:
+        with tar, transaction.atomic():
+            manifest = None
+            for member in tar:
+                if not member.isfile():
+                    continue
+                f = tar.extractfile(member)
+                if manifest is None:
+                    manifest = json.load(f) if member.name == MANIFEST else {}
+                    if manifest.get('format') != FORMAT or manifest.get('version') != VERSION:
+                        raise ArchiveError(f"Not a {FORMAT} v{VERSION} archive.")
+                elif member.name.startswith('images/'):
+                    stored[member.name] = store_image(member.name, f, stats, written)
+                elif member.name.endswith('.jsonl'):
+                    for records in chunked(read_records(f), batch_size):
+                        import_batch(records, known, stored, stats, batch_size)
+    except BaseException:
+        for name in written:
+            default_storage.delete(name)
+        raise
+    if stats['lessons'] or stats['quizzes']:
+        caching.bump(caching.LESSONS)
+    return stats
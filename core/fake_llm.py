@@ -0,0 +1,122 @@
+"""
+A stand-in for the OpenAI chat-completions endpoint, for benchmarks.
+
+It answers ``POST /v1/chat/completions`` after a configurable delay with a
+valid quiz reply (streamed in small chunks over that delay when the request
+asks for ``stream``), so the app's real client code runs end to end without
+network access or API costs. Every reply has fresh question text, so nothing
+is skipped as a duplicate.
+"""
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_counter = itertools.count(1)
+# Characters per streamed chunk, roughly a couple of tokens.
+STREAM_PIECE_CHARS = 8
+
+
+def quiz_reply(number):
+    return json.dumps({"questions": [
+        {
+            "question": f"Generated question {number}.{i}?",
+            "options": ["Patience", "Pride", "Silence", "Anger"],
+            "correct_answer": "Patience",
+        }
+        for i in range(3)
+    ]})
+
+
+def completion(model, number):
+    content = quiz_reply(number)
+    return {
+        "id": f"chatcmpl-fake-{number}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {"prompt_tokens": 120, "completion_tokens": len(content) // 4,
+                  "total_tokens": 120 + len(content) // 4},
+    }
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    latency = 0.5
+    jitter = 0.0
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+        try:
+            request = json.loads(body or b'{}')
+        except ValueError:
+            self.send_json(400, {"error": {"message": "Body is not JSON"}})
+            return
+        delay = max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+        if request.get('stream'):
+            include_usage = bool((request.get('stream_options') or {}).get('include_usage'))
+            self.send_stream(request.get('model', 'fake'), next(_counter), delay, include_usage)
+            return
+        time.sleep(delay)
+        self.send_json(200, completion(request.get('model', 'fake'), next(_counter)))
+
+    def send_stream(self, model, number, delay, include_usage=False):
+        """Send the reply as ``chat.completion.chunk`` events, spread evenly over ``delay`` seconds."""
+        content = quiz_reply(number)
+        pieces = [content[i:i + STREAM_PIECE_CHARS] for i in range(0, len(content), STREAM_PIECE_CHARS)]
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+        for i, piece in enumerate(pieces):
+            time.sleep(delay / len(pieces))
+            chunk = {
+                "id": f"chatcmpl-fake-{number}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": piece},
+                             "finish_reason": "stop" if i == len(pieces) - 1 else None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        if include_usage:
+            chunk = {**completion(model, number), "object": "chat.completion.chunk", "choices": []}
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def send_json(self, status, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def make_server(host='127.0.0.1', port=8765, latency=0.5, jitter=0.0):
+    handler = type('Handler', (FakeLLMHandler,), {'latency': latency, 'jitter': jitter})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def start_in_thread(**kwargs):
+    """Start a server on a daemon thread and return it; call ``shutdown()`` when done."""
+    server = make_server(**kwargs)
+    threading.Thread(target=server.serve_forever, name='fake-llm', daemon=True).start()
+    return server
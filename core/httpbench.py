@@ -0,0 +1,129 @@
+"""
+Helpers for benchmarking the app over real HTTP.
+
+``manage.py bench_http`` uses these to start gunicorn (sync or uvicorn
+workers) against the configured database, log in a bench user through a
+session cookie, and hammer a set of URLs from a pool of threads.
+"""
+import http.client
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from importlib import import_module
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+
+
+def session_cookie(user):
+    """A ``Cookie`` header value for a fresh session logged in as ``user``."""
+    session = import_module(settings.SESSION_ENGINE).SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = 'django.contrib.auth.backends.ModelBackend'
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.save()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+def wait_for_port(port, host='127.0.0.1', timeout=30.0, process=None):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError(f"Server exited with status {process.returncode} before it started listening.")
+        try:
+            with socket.create_connection((host, port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on {host}:{port} after {timeout}s.")
+
+
+def start_gunicorn(mode, port, workers=2, env=None):
+    """Run gunicorn from the project root with ``SERVER_MODE=mode`` (see gunicorn.conf.py)."""
+    # STATIC_MANIFEST=False: pages must render without running collectstatic first.
+    process_env = {**os.environ, **(env or {}), 'SERVER_MODE': mode, 'PORT': str(port),
+                   'WEB_CONCURRENCY': str(workers), 'STATIC_MANIFEST': 'False'}
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', '--log-level', 'warning'],
+        cwd=settings.BASE_DIR, env=process_env,
+    )
+    try:
+        wait_for_port(port, process=process)
+    except Exception:
+        process.kill()
+        raise
+    return process
+
+
+def stop_process(process, timeout=10):
+    process.terminate()
+    try:
+        process.wait(timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_load(port, paths, headers, total, concurrency, ok_statuses=(200, 302), host='127.0.0.1'):
+    """
+    Issue ``total`` GET requests spread over ``paths`` from ``concurrency`` threads.
+
+    Each thread keeps one connection open where the server allows it.
+    Returns requests/second, latency percentiles in ms and the error count.
+    """
+    timings, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def worker():
+        connection = http.client.HTTPConnection(host, port, timeout=60)
+        while True:
+            with lock:
+                index = next(counter, None)
+            if index is None:
+                break
+            path = paths[index % len(paths)]
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                status = repr(e)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                timings.append(elapsed)
+                if status not in ok_statuses:
+                    errors.append(status)
+        connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(timings),
+        'errors': len(errors),
+        'error_samples': [str(e) for e in errors[:5]],
+        'seconds': round(wall, 2),
+        'rps': round(len(timings) / wall, 1) if wall else 0.0,
+        'p50_ms': round(percentile(timings, 0.5), 1),
+        'p95_ms': round(percentile(timings, 0.95), 1),
+        'mean_ms': round(statistics.fmean(timings), 1) if timings else 0.0,
+    }
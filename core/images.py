@@ -0,0 +1,137 @@
+"""
+Responsive derivatives for uploaded images.
+
+Every source image gets WebP and JPEG copies at a few widths, saved under a
+``derivatives/`` folder next to the original and named after the SHA-256 of
+the source file, so re-uploading identical bytes reuses the existing files.
+Uploads are processed on a background thread after the transaction commits;
+``manage.py build_image_derivatives`` does the same for existing media.
+"""
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+
+from . import caching
+from .models import ResponsiveImage
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (320, 640, 960, 1280)
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+CACHE_TIMEOUT = 60 * 60 * 24
+MISSING_CACHE_TIMEOUT = 60
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='image-derivatives')
+
+
+def cache_key(name):
+    return f"responsive-image:{hashlib.md5(name.encode()).hexdigest()}"
+
+
+def source_hash(name):
+    digest = hashlib.sha256()
+    with default_storage.open(name, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def derivative_name(name, digest, width, fmt):
+    return posixpath.join(posixpath.dirname(name), 'derivatives', f"{digest[:20]}-{width}w.{fmt}")
+
+
+def target_widths(source_width):
+    widths = [w for w in WIDTHS if w < source_width]
+    if source_width <= WIDTHS[-1]:
+        widths.append(source_width)
+    return widths or [WIDTHS[-1]]
+
+
+def encode(image, width, fmt):
+    from PIL import Image  # Pillow is only needed when derivatives are built, not at startup
+
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS)
+    pil_format, options = FORMATS[fmt]
+    if fmt == 'jpeg' and resized.mode != 'RGB':
+        background = Image.new('RGB', resized.size, (255, 255, 255))
+        background.paste(resized, mask=resized.getchannel('A') if 'A' in resized.getbands() else None)
+        resized = background
+    buffer = BytesIO()
+    resized.save(buffer, pil_format, **options)
+    return buffer.getvalue()
+
+
+def build_derivatives(name):
+    """Create any missing derivatives for the stored image ``name`` and record them."""
+    digest = source_hash(name)
+    existing = ResponsiveImage.objects.filter(source_name=name).first()
+    if existing and existing.source_hash == digest and all(
+        default_storage.exists(v['name']) for v in existing.variants
+    ):
+        return existing
+
+    from PIL import Image
+
+    with default_storage.open(name, 'rb') as f:
+        image = Image.open(f)
+        image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() or 'transparency' in image.info else 'RGB')
+
+    variants = []
+    for width in target_widths(image.width):
+        for fmt in FORMATS:
+            target = derivative_name(name, digest, width, fmt)
+            if not default_storage.exists(target):
+                default_storage.save(target, ContentFile(encode(image, width, fmt)))
+            variants.append({'width': width, 'format': fmt, 'name': target})
+
+    record, _ = ResponsiveImage.objects.update_or_create(
+        source_name=name,
+        defaults={'source_hash': digest, 'width': image.width, 'height': image.height, 'variants': variants},
+    )
+    cache.set(cache_key(name), variants, CACHE_TIMEOUT)
+    # Cached lesson cards and the home page embed the srcsets, so they must be rebuilt.
+    caching.bump(caching.LESSONS)
+    caching.bump(caching.HOMEPAGE)
+    return record
+
+
+def _build_in_background(name):
+    try:
+        build_derivatives(name)
+    except Exception:
+        logger.exception("Building derivatives for %s failed", name)
+    finally:
+        close_old_connections()
+
+
+def schedule_derivatives(name):
+    """Build derivatives for ``name`` off the request thread once the upload is committed."""
+    if getattr(settings, 'IMAGE_DERIVATIVES_SYNC', False):
+        transaction.on_commit(lambda: build_derivatives(name))
+    else:
+        transaction.on_commit(lambda: _executor.submit(_build_in_background, name))
+
+
+def variants_for(name):
+    """The recorded derivatives for ``name`` (cached), or an empty list if none are built yet."""
+    key = cache_key(name)
+    variants = cache.get(key)
+    if variants is None:
+        record = ResponsiveImage.objects.filter(source_name=name).only('variants').first()
+        variants = record.variants if record else []
+        cache.set(key, variants, CACHE_TIMEOUT if record else MISSING_CACHE_TIMEOUT)
+    return variants
@@ -0,0 +1,89 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+
+from . import ai
+from .models import QuizGenerationJob
+
+logger = logging.getLogger(__name__)
+
+
+def retry_delay(attempts):
+    """Exponential backoff: base, 2*base, 4*base ... capped at the configured maximum."""
+    base = getattr(settings, 'QUIZ_JOB_RETRY_BASE_SECONDS', 10)
+    cap = getattr(settings, 'QUIZ_JOB_RETRY_MAX_SECONDS', 600)
+    return timedelta(seconds=min(cap, base * 2 ** max(attempts - 1, 0)))
+
+
+def enqueue_quiz_generation(lesson, user=None):
+    """Queue AI quiz generation for ``lesson``, reusing a job that is still outstanding."""
+    job = QuizGenerationJob.objects.filter(
+        lesson=lesson, status__in=[QuizGenerationJob.PENDING, QuizGenerationJob.RUNNING]
+    ).first()
+    if job is None:
+        job = QuizGenerationJob.objects.create(lesson=lesson, requested_by=user)
+    return job
+
+
+def claim_next_job():
+    """
+    Atomically move the oldest due job from pending to running.
+
+    The claim is a conditional UPDATE, so several workers can poll the same
+    table without picking up the same job, on SQLite as well as Postgres.
+    """
+    while True:
+        job = QuizGenerationJob.objects.filter(
+            status=QuizGenerationJob.PENDING, run_after__lte=timezone.now()
+        ).order_by('run_after', 'id').first()
+        if job is None:
+            return None
+        claimed = QuizGenerationJob.objects.filter(
+            id=job.id, status=QuizGenerationJob.PENDING
+        ).update(status=QuizGenerationJob.RUNNING, attempts=F('attempts') + 1, updated_at=timezone.now())
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def run_job(job, api_client=None):
+    """Run a claimed job, scheduling a retry or recording the failure when the API call fails."""
+    try:
+        job.created_count = ai.generate_quizzes(job.lesson, api_client=api_client)
+    except Exception as e:
+        job.last_error = str(e)
+        if job.attempts < job.max_attempts:
+            job.status = QuizGenerationJob.PENDING
+            job.run_after = timezone.now() + retry_delay(job.attempts)
+            logger.warning("Quiz job %s failed (attempt %s), retrying: %s", job.id, job.attempts, e)
+        else:
+            job.status = QuizGenerationJob.FAILED
+            ai.save_fallback_quiz(job.lesson, e)
+            logger.error("Quiz job %s failed permanently: %s", job.id, e)
+    else:
+        job.status = QuizGenerationJob.SUCCEEDED
+        job.last_error = ''
+    job.save()
+    return job
+
+
+def run_pending_jobs(api_client=None, limit=None):
+    """Work through due jobs until the queue is empty or ``limit`` jobs have run."""
+    processed = 0
+    while limit is None or processed < limit:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_job(job, api_client=api_client)
+        processed += 1
+    return processed
+
+
+def requeue_stale_jobs(older_than=timedelta(minutes=15)):
+    """Put back jobs whose worker died while they were running."""
+    return QuizGenerationJob.objects.filter(
+        status=QuizGenerationJob.RUNNING, updated_at__lt=timezone.now() - older_than
+    ).update(status=QuizGenerationJob.PENDING, run_after=timezone.now())
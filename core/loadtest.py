@@ -0,0 +1,200 @@
+"""
+Scripted user journeys for capacity planning (``manage.py loadtest``).
+
+Each virtual user is a thread with its own cookie jar and keep-alive
+connection that walks the site the way a new member does: register, log in,
+open the dashboard, read a lesson, take its quiz, post in the forum and book
+a mentorship session. Every few journeys also ask for AI quizzes on a fresh
+lesson, which goes to the fake LLM (``core/fake_llm.py``). Form fields come
+from the pages themselves (quiz option names, free slot ids), and POSTs carry
+the CSRF cookie back in ``X-CSRFToken``, so the server runs its real code
+paths. Results are grouped by method and URL name from ``core/urls.py``.
+"""
+import http.client
+import random
+import re
+import statistics
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+from django.urls import reverse
+
+from .httpbench import percentile
+
+QUIZ_OPTION = re.compile(r'name="option_(\d+)"')
+SLOT_OPTION = re.compile(r'<option value="(\d+)"')
+PASSWORD = 'load-test-Passw0rd!'
+
+
+class StepFailed(Exception):
+    pass
+
+
+class Recorder:
+    """Timings and failures per ``(method, url name)``, shared by every virtual user."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.timings = {}
+        self.errors = {}
+        self.journeys = {'completed': 0, 'failed': 0}
+
+    def record(self, key, elapsed_ms, error=None):
+        with self.lock:
+            self.timings.setdefault(key, []).append(elapsed_ms)
+            if error is not None:
+                self.errors.setdefault(key, []).append(error)
+
+    def finish_journey(self, ok):
+        with self.lock:
+            self.journeys['completed' if ok else 'failed'] += 1
+
+    def summary(self, seconds):
+        rows = []
+        for (method, name), timings in sorted(self.timings.items(), key=lambda item: (item[0][1], item[0][0])):
+            errors = self.errors.get((method, name), [])
+            rows.append({
+                'url_name': name,
+                'method': method,
+                'requests': len(timings),
+                'errors': len(errors),
+                'error_rate': round(len(errors) / len(timings), 4),
+                'error_samples': errors[:5],
+                'rps': round(len(timings) / seconds, 2) if seconds else 0.0,
+                'p50_ms': round(percentile(timings, 0.5), 1),
+                'p95_ms': round(percentile(timings, 0.95), 1),
+                'p99_ms': round(percentile(timings, 0.99), 1),
+                'max_ms': round(max(timings), 1),
+                'mean_ms': round(statistics.fmean(timings), 1),
+            })
+        return rows
+
+
+class VirtualUser:
+    def __init__(self, port, recorder, host='127.0.0.1', think_time=0.0):
+        self.recorder, self.think_time = recorder, think_time
+        self.connection = http.client.HTTPConnection(host, port, timeout=120)
+        self.cookies = {}
+
+    def close(self):
+        self.connection.close()
+
+    def request(self, method, name, path, data=None, expect=(200,)):
+        """Send one request, record it under ``(method, name)`` and return the body (redirects are not followed)."""
+        headers = {}
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f"{key}={value}" for key, value in self.cookies.items())
+        body = None
+        if data is not None:
+            body = urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get('csrftoken', '')
+        started = time.perf_counter()
+        try:
+            self.connection.request(method, path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            content = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException) as e:
+            self.connection.close()
+            self.recorder.record((method, name), (time.perf_counter() - started) * 1000, repr(e))
+            raise StepFailed(f"{method} {name}: {e!r}") from e
+        elapsed = (time.perf_counter() - started) * 1000
+        self.store_cookies(response.headers.get_all('Set-Cookie') or [])
+        error = None if status in expect else str(status)
+        if status == 302 and urlsplit(response.getheader('Location', '')).path == reverse('login'):
+            error = '302 to login'  # the session was lost
+        self.recorder.record((method, name), elapsed, error)
+        if error:
+            raise StepFailed(f"{method} {name} returned {error}")
+        if self.think_time:
+            time.sleep(random.uniform(0, 2 * self.think_time))
+        return content.decode('utf-8', 'replace')
+
+    def store_cookies(self, headers):
+        for header in headers:
+            for key, morsel in SimpleCookie(header).items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[key] = morsel.value
+                else:
+                    self.cookies.pop(key, None)
+
+    def journey(self, lesson_id, ai_lesson_id=None):
+        """One new member's first visit. Raises StepFailed at the first unexpected response."""
+        username = f"load-{uuid.uuid4().hex[:12]}"
+        self.cookies.clear()
+
+        self.request('GET', 'register', reverse('register'))
+        self.request('POST', 'register', reverse('register'),
+                     {'username': username, 'password1': PASSWORD, 'password2': PASSWORD}, expect=(302,))
+        self.request('GET', 'login', reverse('login'))
+        self.request('POST', 'login', reverse('login'), {'username': username, 'password': PASSWORD}, expect=(302,))
+        self.request('GET', 'dashboard', reverse('dashboard'))
+        self.request('GET', 'lesson_detail', reverse('lesson_detail', args=[lesson_id]))
+
+        if ai_lesson_id is not None:
+            self.request('GET', 'generate_quiz_ai', reverse('generate_quiz_ai', args=[ai_lesson_id]), expect=(302,))
+
+        page = self.request('GET', 'quiz_page', reverse('quiz_page', args=[lesson_id]))
+        answers = {f"option_{quiz_id}": random.choice('1234') for quiz_id in dict.fromkeys(QUIZ_OPTION.findall(page))}
+        self.request('POST', 'quiz_page', reverse('quiz_page', args=[lesson_id]), answers, expect=(302,))
+
+        self.request('GET', 'forum', reverse('forum'))
+        self.request('POST', 'forum', reverse('forum'),
+                     {'title': f"Hello from {username}", 'content': 'How do we pray together?'}, expect=(302,))
+
+        page = self.request('GET', 'mentorship_booking', reverse('mentorship_booking'))
+        slots = SLOT_OPTION.findall(page)
+        if not slots:
+            self.recorder.record(('POST', 'mentorship_booking'), 0.0, 'no free slots')
+            raise StepFailed("No free mentorship slots left.")
+        # Users race for the same early slots; losing one is a normal "slot taken" redirect.
+        self.request('POST', 'mentorship_booking', reverse('mentorship_booking'),
+                     {'slot': random.choice(slots[:20])}, expect=(302,))
+
+
+def run_journeys(port, lesson_ids, ai_lesson_ids, journeys, concurrency, think_time=0.0, ai_every=0):
+    """
+    Run ``journeys`` journeys from ``concurrency`` virtual users against the server on ``port``.
+
+    Every ``ai_every``-th journey (0 for none) also generates quizzes for the
+    next unused lesson in ``ai_lesson_ids``. Returns the per-URL summary and
+    the journey counts.
+    """
+    recorder = Recorder()
+    lock = threading.Lock()
+    counter = iter(range(journeys))
+    ai_lessons = iter(ai_lesson_ids)
+
+    def worker():
+        user = VirtualUser(port, recorder, think_time=think_time)
+        while True:
+            with lock:
+                index = next(counter, None)
+                ai_lesson = next(ai_lessons, None) if index is not None and ai_every and index % ai_every == 0 else None
+            if index is None:
+                break
+            try:
+                user.journey(lesson_ids[index % len(lesson_ids)], ai_lesson)
+            except StepFailed:
+                recorder.finish_journey(False)
+            else:
+                recorder.finish_journey(True)
+        user.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, name=f'virtual-user-{i}') for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - started
+    return {
+        'seconds': round(seconds, 2),
+        'journeys': dict(recorder.journeys),
+        'journeys_per_second': round(recorder.journeys['completed'] / seconds, 2) if seconds else 0.0,
+        'urls': recorder.summary(seconds),
+    }
@@ -0,0 +1,90 @@
+import json
+import uuid
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+
+from core import fake_llm, httpbench
+from core.models import Lesson
+
+ROUTES = ('generate_quiz_ai', 'forum', 'dashboard')
+
+
+class Command(BaseCommand):
+    help = (
+        "Start gunicorn with sync (wsgi) and uvicorn (asgi) workers in turn, point it at a local fake LLM "
+        "and report requests/second and latency for the I/O-bound views. Uses the configured database; "
+        "the lessons it creates are deleted afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=('wsgi', 'asgi'),
+                            help="Server mode to measure (repeatable, default both).")
+        parser.add_argument('--route', action='append', dest='routes', choices=ROUTES,
+                            help="Route to load (repeatable, default all).")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per route and mode.")
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--workers', type=int, default=2, help="Gunicorn worker processes.")
+        parser.add_argument('--port', type=int, default=8011)
+        parser.add_argument('--llm-port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.5, help="Fake LLM reply delay in seconds.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        modes = options['modes'] or ['wsgi', 'asgi']
+        routes = options['routes'] or list(ROUTES)
+        user, _ = User.objects.get_or_create(username='http-bench')
+        headers = {'Cookie': httpbench.session_cookie(user)}
+        env = {
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{options['llm_port']}/v1",
+            'OPENAI_API_KEY': 'bench',
+            'AI_QUIZ_INLINE': 'True',
+        }
+
+        llm = fake_llm.start_in_thread(port=options['llm_port'], latency=options['latency'])
+        results = []
+        try:
+            for mode in modes:
+                self.stdout.write(f"Starting gunicorn ({mode}, {options['workers']} workers)...")
+                server = httpbench.start_gunicorn(mode, options['port'], options['workers'], env)
+                try:
+                    for route in routes:
+                        results.append(self.measure(mode, route, headers, options))
+                finally:
+                    httpbench.stop_process(server)
+        finally:
+            llm.shutdown()
+            llm.server_close()
+
+        self.stdout.write(f"\n{'mode':<5} {'route':<17} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<5} {row['route']:<17} {row['rps']:>8} {row['p50_ms']:>9} "
+                f"{row['p95_ms']:>9} {row['errors']:>7}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        if any(row['requests'] and row['errors'] == row['requests'] for row in results):
+            raise CommandError("Every request to at least one route failed; see error_samples in the results.")
+
+    def measure(self, mode, route, headers, options):
+        lessons = []
+        if route == 'generate_quiz_ai':
+            # One fresh lesson per request, so every request misses the quiz cache and calls the model.
+            run = uuid.uuid4().hex[:8]
+            lessons = Lesson.objects.bulk_create([
+                Lesson(title=f'HTTP bench {run} {i}', content=f'Bench lesson {run} {i}: love is patient.')
+                for i in range(options['requests'])
+            ])
+            paths = [reverse('generate_quiz_ai', args=[lesson.id]) for lesson in lessons]
+        else:
+            paths = [reverse(route)]
+        try:
+            stats = httpbench.run_load(options['port'], paths, headers, options['requests'], options['concurrency'])
+        finally:
+            Lesson.objects.filter(id__in=[lesson.id for lesson in lessons]).delete()
+        self.stdout.write(f"  {route}: {stats['rps']} req/s, p95 {stats['p95_ms']} ms, {stats['errors']} errors")
+        return {'mode': mode, 'route': route, **stats}
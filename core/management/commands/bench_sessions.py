@@ -0,0 +1,113 @@
+import json
+import statistics
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from core import perf
+
+CACHED_BACKENDS = ['core.sessions.CachedUserBackend', 'django.contrib.auth.backends.ModelBackend']
+MODES = {
+    # Django's defaults: every page view reads the session row and the user row.
+    'baseline': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.db',
+        'AUTHENTICATION_BACKENDS': ['django.contrib.auth.backends.ModelBackend'],
+        'MESSAGE_STORAGE': 'django.contrib.messages.storage.fallback.FallbackStorage',
+    },
+    # What settings.py picks with a shared CACHE_URL (one process here, so LocMem stands in for it).
+    'cached_db': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+        'AUTHENTICATION_BACKENDS': CACHED_BACKENDS,
+    },
+    'signed_cookies': {
+        'SESSION_ENGINE': 'django.contrib.sessions.backends.signed_cookies',
+        'AUTHENTICATION_BACKENDS': CACHED_BACKENDS,
+    },
+}
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Log in once, then browse dashboard -> course -> lesson -> quiz submission -> dashboard with each "
+        "session setup and report database round trips per page view, and how many of them went to the "
+        "session and user tables. Seeded rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=sorted(MODES),
+                            help="Session setup to measure (repeatable, default all).")
+        parser.add_argument('--rounds', type=int, default=20, help="Times to walk the pages.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def handle(self, *args, **options):
+        results = []
+        try:
+            with transaction.atomic():
+                fixtures = perf.seed(10)
+                for mode in options['modes'] or list(MODES):
+                    cache.clear()
+                    with override_settings(**MODES[mode]):
+                        results.append(self.measure(mode, fixtures, options['rounds']))
+                raise Rollback
+        except Rollback:
+            pass
+
+        self.stdout.write(f"\n{'mode':<15} {'views':>6} {'queries':>8} {'session':>8} {'user':>6} {'ms':>7}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<15} {row['page_views']:>6} {row['queries_per_view']:>8} "
+                f"{row['session_queries_per_view']:>8} {row['user_queries_per_view']:>6} {row['median_ms']:>7}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def measure(self, mode, fixtures, rounds):
+        lesson = fixtures['lesson']
+        answers = {f'option_{quiz_id}': '1' for quiz_id in lesson.quiz_set.values_list('id', flat=True)}
+        pages = [
+            ('get', reverse('dashboard'), None),
+            ('get', reverse('course'), None),
+            ('get', reverse('lesson_detail', args=[lesson.id]), None),
+            ('post', reverse('quiz_page', args=[lesson.id]), answers),
+            ('get', reverse('dashboard'), None),  # shows the "You scored" message
+        ]
+        client = Client()  # SessionMiddleware picks its engine when the client's handler is built
+        client.force_login(fixtures['user'])
+        client.get(pages[0][1])  # fill the caches, as an earlier page view would have
+
+        queries, session_queries, user_queries, timings = 0, 0, 0, []
+        for _ in range(rounds):
+            for method, path, data in pages:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = getattr(client, method)(path, data)
+                    timings.append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    raise RuntimeError(f"{method.upper()} {path} returned {response.status_code} in {mode} mode.")
+                sql = [query['sql'] for query in captured.captured_queries]
+                queries += len(sql)
+                session_queries += sum('"django_session"' in statement for statement in sql)
+                user_queries += sum('FROM "auth_user"' in statement or 'UPDATE "auth_user"' in statement
+                                    for statement in sql)
+
+        views = len(timings)
+        self.stdout.write(f"  {mode}: {views} page views, {queries} queries")
+        return {
+            'mode': mode,
+            'page_views': views,
+            'queries_per_view': round(queries / views, 2),
+            'session_queries_per_view': round(session_queries / views, 2),
+            'user_queries_per_view': round(user_queries / views, 2),
+            'median_ms': round(statistics.median(timings), 2),
+        }
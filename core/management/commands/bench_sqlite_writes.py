@@ -0,0 +1,157 @@
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.urls import reverse
+
+from core import httpbench, mentoring
+from core.models import Lesson, MentorSlot, Quiz
+
+BENCH_LESSON = 'SQLite write bench'
+KINDS = ('quiz', 'forum', 'booking')
+
+
+class Command(BaseCommand):
+    help = (
+        "Run the quiz_page, forum and mentorship_booking writes from several processes at once against a "
+        "scratch SQLite file, with the tuned settings (SQLITE_TUNING=True, SQLITE_WAL=True) and Django's "
+        "defaults, and report writes/second, latency and 'database is locked' failures. The configured "
+        "database is not used."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--mode', action='append', dest='modes', choices=('default', 'tuned'),
+                            help="SQLite setup to measure (repeatable, default both).")
+        parser.add_argument('--processes', type=int, default=8)
+        parser.add_argument('--writes', type=int, default=150, help="Requests per process.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        # Internal: the scratch database setup and the per-process load run in child processes.
+        parser.add_argument('--prepare', action='store_true', help="(internal)")
+        parser.add_argument('--worker', type=int, help="(internal)")
+        parser.add_argument('--start-at', type=float, default=0.0, help="(internal)")
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            return self.prepare(options['processes'])
+        if options['worker'] is not None:
+            return self.run_worker(options['worker'], options['writes'], options['start_at'])
+
+        results = []
+        for mode in options['modes'] or ['default', 'tuned']:
+            directory = tempfile.mkdtemp(prefix='eden-sqlite-bench-')
+            try:
+                results.append(self.measure(mode, directory, options))
+            finally:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        self.stdout.write(f"\n{'mode':<8} {'writes/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'max ms':>9} {'errors':>7}")
+        for row in results:
+            self.stdout.write(
+                f"{row['mode']:<8} {row['rps']:>9} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+                f"{row['max_ms']:>9} {row['errors']:>7}"
+            )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+    def child(self, env, *arguments):
+        return subprocess.Popen(
+            [sys.executable, 'manage.py', 'bench_sqlite_writes', *arguments],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.PIPE, text=True,
+        )
+
+    def measure(self, mode, directory, options):
+        env = {
+            **os.environ,
+            'DATABASE_URL': f"sqlite:///{os.path.join(directory, 'bench.sqlite3')}",
+            'SQLITE_TUNING': str(mode == 'tuned'),
+            'SQLITE_WAL': str(mode == 'tuned'),
+            'REQUEST_LOG_SAMPLE_RATE': '0',
+            'REQUEST_LOG_SLOW_MS': '600000',
+        }
+        self.stdout.write(f"Preparing a scratch database ({mode})...")
+        prepare = self.child(env, '--prepare', '--processes', str(options['processes']))
+        prepare.communicate()
+        if prepare.returncode:
+            raise CommandError(f"Preparing the {mode} database failed.")
+
+        # Children take a second or two to import Django; start them all at the same moment.
+        start_at = time.time() + 3 + options['processes'] * 0.2
+        workers = [
+            self.child(env, '--worker', str(index), '--writes', str(options['writes']), '--start-at', str(start_at))
+            for index in range(options['processes'])
+        ]
+        timings, errors = [], []
+        for worker in workers:
+            output, _ = worker.communicate()
+            lines = output.strip().splitlines()
+            if worker.returncode or not lines:
+                errors.append(f"worker exited with status {worker.returncode}")
+                continue
+            result = json.loads(lines[-1])
+            timings.extend(result['timings'])
+            errors.extend(result['errors'])
+        wall = max(time.time() - start_at, 1e-9)
+        self.stdout.write(f"  {mode}: {len(timings)} requests, {len(errors)} errors")
+        return {
+            'mode': mode,
+            'processes': options['processes'],
+            'requests': len(timings),
+            'errors': len(errors),
+            'error_samples': errors[:5],
+            'seconds': round(wall, 2),
+            'rps': round(len(timings) / wall, 1),
+            'p50_ms': round(httpbench.percentile(timings, 0.5), 1),
+            'p95_ms': round(httpbench.percentile(timings, 0.95), 1),
+            'max_ms': round(max(timings, default=0.0), 1),
+        }
+
+    def prepare(self, processes):
+        call_command('migrate', verbosity=0)
+        User.objects.bulk_create([User(username=f'write-bench-{index}') for index in range(processes)])
+        lesson = Lesson.objects.create(title=BENCH_LESSON, content='Love is patient, love is kind.')
+        Quiz.objects.bulk_create([
+            Quiz(lesson=lesson, question=f'Question {i}?', option1='Patience', option2='Pride',
+                 option3='Silence', option4='Anger', correct_index=1)
+            for i in range(5)
+        ])
+        mentoring.generate_slots()
+
+    def run_worker(self, index, writes, start_at):
+        client = Client()
+        client.force_login(User.objects.get(username=f'write-bench-{index}'))
+        lesson = Lesson.objects.get(title=BENCH_LESSON)
+        answers = {f'option_{quiz_id}': '1' for quiz_id in lesson.quiz_set.values_list('id', flat=True)}
+        slot_ids = list(MentorSlot.objects.values_list('id', flat=True))
+        random.Random(index).shuffle(slot_ids)
+        requests = {
+            'quiz': lambda i: (reverse('quiz_page', args=[lesson.id]), answers),
+            'forum': lambda i: (reverse('forum'), {'title': f'Worker {index} post {i}', 'content': 'Amen.'}),
+            # Workers race for the same slots; losing one is a normal "slot taken" redirect.
+            'booking': lambda i: (reverse('mentorship_booking'), {'slot': slot_ids[i % len(slot_ids)]}),
+        }
+
+        timings, errors = [], []
+        time.sleep(max(0.0, start_at - time.time()))
+        for i in range(writes):
+            path, data = requests[KINDS[i % len(KINDS)]](i)
+            started = time.perf_counter()
+            try:
+                status = client.post(path, data).status_code
+            except Exception as e:
+                status = repr(e)
+            timings.append((time.perf_counter() - started) * 1000)
+            if status != 302:
+                errors.append(str(status))
+        self.stdout.write(json.dumps({'timings': timings, 'errors': errors}))
@@ -0,0 +1,73 @@
+import json
+import platform
+import subprocess
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.test import Client
+from django.utils import timezone
+
+from core import perf
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed synthetic data at one or more scales, request every route in core.urls and "
+        "compare query counts and wall time against the budgets in core/perf.py. "
+        "All seeded rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, action='append', dest='scales',
+                            help=f"Rows per high-volume table (repeatable, default {perf.SCALES}).")
+        parser.add_argument('--repeat', type=int, default=3, help="Requests per route; the median is reported.")
+        parser.add_argument('--output', help="Write the JSON report to this file.")
+        parser.add_argument('--check', action='store_true', help="Exit non-zero if any route is over budget.")
+
+    def handle(self, *args, **options):
+        report = {
+            'commit': self.git_commit(),
+            'created_at': timezone.now().isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'results': [],
+        }
+        for scale in options['scales'] or perf.SCALES:
+            self.stdout.write(f"Seeding scale {scale}...")
+            try:
+                with transaction.atomic():
+                    fixtures = perf.seed(scale)
+                    results = perf.measure_routes(Client(), fixtures, repeat=options['repeat'])
+                    raise Rollback
+            except Rollback:
+                pass
+            for row in results:
+                row['scale'] = scale
+                flag = '' if row['ok'] else '  OVER BUDGET'
+                self.stdout.write(
+                    f"  {row['route']:<22} {row['status']} {row['queries']:>3}/{row['query_budget']} queries "
+                    f"{row['ms']:>9.1f}/{row['ms_budget']} ms{flag}"
+                )
+            report['results'].extend(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(f"Report written to {options['output']}")
+
+        failed = [r for r in report['results'] if not r['ok']]
+        if options['check'] and failed:
+            raise CommandError(f"{len(failed)} route measurement(s) over budget.")
+
+    def git_commit(self):
+        try:
+            return subprocess.run(
+                ['git', 'rev-parse', 'HEAD'], cwd=settings.BASE_DIR, capture_output=True, text=True, check=True
+            ).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
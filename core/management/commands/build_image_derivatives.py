@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import HomePageContent, Lesson
+
+
+class Command(BaseCommand):
+    help = "Build responsive WebP/JPEG derivatives for every lesson and homepage image."
+
+    def handle(self, *args, **options):
+        names = set(Lesson.objects.exclude(image='').exclude(image=None).values_list('image', flat=True))
+        names |= set(
+            HomePageContent.objects.exclude(hero_image='').exclude(hero_image=None).values_list('hero_image', flat=True)
+        )
+        for name in sorted(names):
+            try:
+                record = images.build_derivatives(name)
+            except (OSError, ValueError) as e:
+                self.stderr.write(f"{name}: {e}")
+                continue
+            self.stdout.write(f"{name}: {len(record.variants)} derivatives")
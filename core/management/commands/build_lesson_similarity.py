@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import recommendations
+
+
+class Command(BaseCommand):
+    help = "Rebuild the TF-IDF lesson-similarity table behind the dashboard's recommended lesson."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=recommendations.TOP_K,
+                            help="Similar lessons kept per lesson.")
+        parser.add_argument('--stale', action='store_true',
+                            help="Only update the lessons changed since the last update (run_quiz_worker does "
+                                 "this on every pass).")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if options['stale']:
+            total = recommendations.update_stale(k=options['top_k'])
+            self.stdout.write(f"Updated {total} changed lessons in {time.perf_counter() - started:.2f}s.")
+            return
+        total = recommendations.rebuild(k=options['top_k'])
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"Indexed {total} lessons in {elapsed:.2f}s.")
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from core import sessions
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired rows from the session table in small batches (run it from cron). "
+        "Nothing to do when SESSION_STORE is signed_cookies or cache."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--pause', type=float, default=0.0, help="Seconds to sleep between batches.")
+
+    def handle(self, *args, **options):
+        deleted = sessions.clear_expired(batch_size=options['batch_size'], pause=options['pause'])
+        self.stdout.write(f"Deleted {deleted} expired sessions.")
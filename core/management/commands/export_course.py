@@ -0,0 +1,36 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import course_archive
+
+
+class Command(BaseCommand):
+    help = (
+        "Write every lesson, quiz and lesson image to a tar archive (JSONL lesson chunks plus images), "
+        "gzipped when the path ends in .gz or .tgz. Use '-' to write to stdout."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--chunk-size', type=int, default=500, help="Lessons per JSONL member and query chunk.")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        compress = path.endswith(('.gz', '.tgz'))
+        started = time.perf_counter()
+        if path == '-':
+            stats = course_archive.export_course(sys.stdout.buffer, options['chunk_size'])
+            report = self.stderr
+        else:
+            with open(path, 'wb') as f:
+                stats = course_archive.export_course(f, options['chunk_size'], compress=compress)
+            report = self.stdout
+        elapsed = time.perf_counter() - started
+        report.write(
+            f"Exported {stats['lessons']} lessons, {stats['quizzes']} quizzes and {stats['images']} images "
+            f"in {elapsed:.2f}s."
+        )
+        if stats['missing_images']:
+            self.stderr.write(f"{stats['missing_images']} lesson images could not be read and were left out.")
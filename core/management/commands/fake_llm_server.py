@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from core import fake_llm
+
+
+class Command(BaseCommand):
+    help = (
+        "Serve a fake OpenAI chat-completions API for local benchmarks. "
+        "Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--host', default='127.0.0.1')
+        parser.add_argument('--port', type=int, default=8765)
+        parser.add_argument('--latency', type=float, default=0.5, help="Seconds to wait before each reply.")
+        parser.add_argument('--jitter', type=float, default=0.0, help="Random +/- seconds added to the latency.")
+
+    def handle(self, *args, **options):
+        server = fake_llm.make_server(options['host'], options['port'], options['latency'], options['jitter'])
+        self.stdout.write(
+            f"Fake LLM listening on http://{options['host']}:{options['port']}/v1 "
+            f"(latency {options['latency']}s). Ctrl+C to stop."
+        )
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            server.server_close()
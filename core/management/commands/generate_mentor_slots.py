@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from core import mentoring
+
+
+class Command(BaseCommand):
+    help = "Create bookable mentorship slots from each mentor's weekly availability."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--weeks', type=int, help="How many weeks ahead (default settings.MENTOR_SLOT_WEEKS).")
+
+    def handle(self, *args, **options):
+        created = mentoring.generate_slots(weeks=options['weeks'])
+        self.stdout.write(f"Created {created} mentor slots.")
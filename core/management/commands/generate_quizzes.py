@@ -0,0 +1,123 @@
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core import ai
+from core.models import Lesson
+
+
+class RateLimiter:
+    """Spaces out calls so no more than ``rate`` start per second across all threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self.lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Command(BaseCommand):
+    help = "Generate AI quizzes for every lesson (or a filtered subset) with bounded concurrency."
+    stealth_options = ('api_client',)
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lesson', type=int, action='append', dest='lesson_ids',
+                            help="Only this lesson id (repeatable).")
+        parser.add_argument('--title', help="Only lessons whose title contains this text.")
+        parser.add_argument('--missing-only', action='store_true',
+                            help="Skip lessons that already have quizzes.")
+        parser.add_argument('--concurrency', type=int, default=4,
+                            help="Maximum API requests in flight.")
+        parser.add_argument('--rate', type=float, default=2.0,
+                            help="Maximum API requests started per second (0 = unlimited).")
+        parser.add_argument('--base-url',
+                            help="Chat-completions endpoint to use instead of OPENAI_BASE_URL.")
+
+    def handle(self, *args, **options):
+        api_client = options.get('api_client')
+        if api_client is None and options['base_url']:
+            api_client = ai.make_client(base_url=options['base_url'])
+
+        lessons = Lesson.objects.order_by('id')
+        if options['lesson_ids']:
+            lessons = lessons.filter(id__in=options['lesson_ids'])
+        if options['title']:
+            lessons = lessons.filter(title__icontains=options['title'])
+        if options['missing_only']:
+            lessons = lessons.filter(quiz__isnull=True).distinct()
+        lessons = list(lessons)
+
+        limiter = RateLimiter(options['rate'])
+
+        def fetch(lesson):
+            limiter.wait()
+            started = time.perf_counter()
+            raw_text = ai.request_quiz_text(lesson, api_client=api_client)
+            quiz_list = [q for q in ai.parse_quiz_list(raw_text, lesson) if ai.is_valid_quiz(q)]
+            return quiz_list, time.perf_counter() - started
+
+        self.created_total = 0
+        self.failures = 0
+        started = time.perf_counter()
+
+        # Cache lookups and writes stay on this thread; workers only do network I/O.
+        to_fetch = []
+        for lesson in lessons:
+            cached = ai.get_cached_quiz_list(lesson)
+            if cached is None:
+                to_fetch.append(lesson)
+            else:
+                self.write_quizzes(lesson, cached, 0.0, options['verbosity'])
+
+        latencies = []
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as pool:
+            futures = {pool.submit(fetch, lesson): lesson for lesson in to_fetch}
+            for future in as_completed(futures):
+                lesson = futures[future]
+                try:
+                    quiz_list, latency = future.result()
+                except Exception as e:
+                    self.failures += 1
+                    self.stderr.write(f"{lesson.title}: failed ({e})")
+                    continue
+                latencies.append(latency)
+                if not quiz_list:
+                    self.failures += 1
+                    self.stderr.write(f"{lesson.title}: failed (no valid quizzes in the response)")
+                    continue
+                ai.store_quiz_list(lesson, quiz_list)
+                self.write_quizzes(lesson, quiz_list, latency, options['verbosity'])
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            f"{len(lessons)} lessons ({len(lessons) - len(to_fetch)} cached, {self.failures} failed), "
+            f"{self.created_total} quizzes created in {elapsed:.2f}s "
+            f"({len(lessons) / elapsed if elapsed else 0:.1f} lessons/s)"
+        )
+        if latencies:
+            latencies.sort()
+            p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+            self.stdout.write(
+                f"API latency per lesson: p50 {statistics.median(latencies) * 1000:.0f} ms, "
+                f"p95 {p95 * 1000:.0f} ms, max {latencies[-1] * 1000:.0f} ms"
+            )
+
+    def write_quizzes(self, lesson, quiz_list, latency, verbosity):
+        with transaction.atomic():
+            created = ai.save_quizzes(lesson, quiz_list)
+        self.created_total += created
+        if verbosity >= 2:
+            self.stdout.write(f"{lesson.title}: {created} new quizzes in {latency * 1000:.0f} ms")
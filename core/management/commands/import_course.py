@@ -0,0 +1,39 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import course_archive, recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Load lessons, quizzes and images from an archive written by export_course ('-' reads stdin). "
+        "Lessons and images that already exist, by content hash, are skipped."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--batch-size', type=int, default=500, help="Lessons per bulk insert.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        try:
+            if options['path'] == '-':
+                stats = course_archive.import_course(sys.stdin.buffer, options['batch_size'])
+            else:
+                with open(options['path'], 'rb') as f:
+                    stats = course_archive.import_course(f, options['batch_size'])
+        except (OSError, course_archive.ArchiveError) as e:
+            raise CommandError(str(e))
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Imported {stats['lessons']} lessons, {stats['quizzes']} quizzes and {stats['images']} images "
+            f"in {elapsed:.2f}s; skipped {stats['skipped_lessons']} lessons, {stats['skipped_quizzes']} quizzes "
+            f"and {stats['skipped_images']} images already present."
+        )
+        if stats['lessons']:
+            # bulk_create skipped the per-lesson similarity updates; one rebuild is cheaper anyway.
+            recommendations.rebuild()
+        if stats['images']:
+            self.stdout.write("Run `manage.py build_image_derivatives` to build responsive copies of the new images.")
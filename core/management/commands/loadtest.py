@@ -0,0 +1,160 @@
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+
+from core import fake_llm, httpbench, loadtest, mentoring
+from core.models import Lesson, Mentor, MentorAvailability, Quiz
+
+LOAD_LESSON = 'Load test lesson'
+AI_LESSON = 'Load test AI lesson'
+
+
+class Command(BaseCommand):
+    help = (
+        "Drive scripted user journeys (register, login, dashboard, lesson, quiz, forum post, mentorship "
+        "booking) from concurrent virtual users against a local gunicorn, with quiz generation answered "
+        "by a fake LLM, and report throughput, latency percentiles and error rates per URL name. Runs on a "
+        "scratch SQLite database unless --database-url is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=8, help="Concurrent virtual users.")
+        parser.add_argument('--journeys', type=int, default=40, help="Journeys in total.")
+        parser.add_argument('--think-time', type=float, default=0.0,
+                            help="Mean pause between a user's requests, in seconds.")
+        parser.add_argument('--ai-every', type=int, default=5,
+                            help="Every Nth journey also generates AI quizzes for a fresh lesson (0 for none).")
+        parser.add_argument('--mode', choices=('wsgi', 'asgi'), default='wsgi', help="Gunicorn SERVER_MODE.")
+        parser.add_argument('--workers', type=int, default=2, help="Gunicorn worker processes.")
+        parser.add_argument('--port', type=int, default=8012)
+        parser.add_argument('--llm-port', type=int, default=8766)
+        parser.add_argument('--latency', type=float, default=0.5, help="Fake LLM reply delay in seconds.")
+        parser.add_argument('--jitter', type=float, default=0.1, help="Random +/- seconds on the LLM delay.")
+        parser.add_argument('--database-url',
+                            help="Database the server uses (default: a fresh SQLite file, deleted afterwards). "
+                                 "Migrated and seeded; the rows the journeys create are left in place.")
+        parser.add_argument('--max-error-rate', type=float,
+                            help="Fail if any URL's error rate is above this fraction, e.g. 0.01.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+        # Internal: migrating and seeding happen in a child process on the target database.
+        parser.add_argument('--prepare', action='store_true', help="(internal)")
+
+    def handle(self, *args, **options):
+        if options['prepare']:
+            return self.prepare(options['journeys'], options['ai_every'])
+
+        directory = None
+        database_url = options['database_url']
+        if not database_url:
+            directory = tempfile.mkdtemp(prefix='eden-loadtest-')
+            database_url = f"sqlite:///{os.path.join(directory, 'loadtest.sqlite3')}"
+        env = {
+            **os.environ,
+            'DATABASE_URL': database_url,
+            'OPENAI_BASE_URL': f"http://127.0.0.1:{options['llm_port']}/v1",
+            'OPENAI_API_KEY': 'load-test',
+            'AI_QUIZ_INLINE': 'True',
+            'REQUEST_LOG_SAMPLE_RATE': '0',
+            'REQUEST_LOG_SLOW_MS': '600000',
+        }
+        try:
+            fixtures = self.run_prepare(env, options)
+            llm = fake_llm.start_in_thread(port=options['llm_port'], latency=options['latency'],
+                                           jitter=options['jitter'])
+            try:
+                self.stdout.write(f"Starting gunicorn ({options['mode']}, {options['workers']} workers)...")
+                server = httpbench.start_gunicorn(options['mode'], options['port'], options['workers'], env)
+                try:
+                    self.stdout.write(f"Running {options['journeys']} journeys from {options['users']} users...")
+                    results = loadtest.run_journeys(
+                        options['port'], fixtures['lessons'], fixtures['ai_lessons'], options['journeys'],
+                        options['users'], think_time=options['think_time'], ai_every=options['ai_every'],
+                    )
+                finally:
+                    httpbench.stop_process(server)
+            finally:
+                llm.shutdown()
+                llm.server_close()
+        finally:
+            if directory:
+                shutil.rmtree(directory, ignore_errors=True)
+
+        results.update({key: options[key] for key in ('mode', 'workers', 'users', 'latency', 'ai_every')})
+        self.report(results)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+
+        limit = options['max_error_rate']
+        over = [row for row in results['urls'] if limit is not None and row['error_rate'] > limit]
+        if over:
+            names = ', '.join(f"{row['method']} {row['url_name']} ({row['error_rate']:.1%})" for row in over)
+            raise CommandError(f"Error rate above {limit:.1%}: {names}")
+
+    def run_prepare(self, env, options):
+        self.stdout.write("Migrating and seeding the load-test database...")
+        result = subprocess.run(
+            [sys.executable, 'manage.py', 'loadtest', '--prepare', '--journeys', str(options['journeys']),
+             '--ai-every', str(options['ai_every'])],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        lines = result.stdout.strip().splitlines()
+        if result.returncode or not lines:
+            raise CommandError(f"Preparing the load-test database failed:\n{result.stderr[-2000:]}")
+        return json.loads(lines[-1])
+
+    def prepare(self, journeys, ai_every):
+        call_command('migrate', verbosity=0)
+        lessons = list(Lesson.objects.filter(title__startswith=LOAD_LESSON).order_by('id').values_list('id', flat=True))
+        if not lessons:
+            for number in range(1, 11):
+                lesson = Lesson.objects.create(
+                    title=f'{LOAD_LESSON} {number}',
+                    content=' '.join(['Love is patient, love is kind. It keeps no record of wrongs.'] * 30),
+                )
+                Quiz.objects.bulk_create([
+                    Quiz(lesson=lesson, question=f'Question {number}.{i}?', option1='Patience', option2='Pride',
+                         option3='Silence', option4='Anger', correct_index=1)
+                    for i in range(5)
+                ])
+                lessons.append(lesson.id)
+        # Every AI journey needs a lesson without cached quizzes, or it would never reach the model.
+        ai_count = -(-journeys // ai_every) if ai_every else 0
+        ai_lessons = [
+            Lesson.objects.create(title=f'{AI_LESSON} {i}', content=f'Lesson {i} on forgiving one another.').id
+            for i in range(ai_count)
+        ]
+        mentor, created = Mentor.objects.get_or_create(name='Load Test Mentor')
+        if created:
+            # Saving availability generates the mentor's slots.
+            for weekday in range(7):
+                MentorAvailability.objects.create(mentor=mentor, weekday=weekday, start_time='06:00', end_time='22:00')
+        else:
+            mentoring.generate_slots()
+        self.stdout.write(json.dumps({'lessons': lessons, 'ai_lessons': ai_lessons}))
+
+    def report(self, results):
+        journeys = results['journeys']
+        self.stdout.write(
+            f"\n{journeys['completed']} journeys completed, {journeys['failed']} failed in {results['seconds']}s "
+            f"({results['journeys_per_second']} journeys/s)"
+        )
+        self.stdout.write(
+            f"{'method':<6} {'url name':<20} {'requests':>8} {'req/s':>7} {'p50 ms':>8} {'p95 ms':>8} "
+            f"{'p99 ms':>8} {'errors':>7}"
+        )
+        for row in results['urls']:
+            self.stdout.write(
+                f"{row['method']:<6} {row['url_name']:<20} {row['requests']:>8} {row['rps']:>7} {row['p50_ms']:>8} "
+                f"{row['p95_ms']:>8} {row['p99_ms']:>8} {row['error_rate']:>7.1%}"
+            )
+            for sample in row['error_samples']:
+                self.stdout.write(f"{'':<28}{sample}")
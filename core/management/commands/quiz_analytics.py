@@ -0,0 +1,41 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db.models import F
+
+from core import analytics
+from core.models import QuizItemStats
+
+
+class Command(BaseCommand):
+    help = (
+        "Compute difficulty, discrimination and distractor rates for every answered quiz "
+        "question and store them in QuizItemStats."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=50_000, help="Rows fetched per database round trip.")
+        parser.add_argument('--show', type=int, default=10, help="List this many flagged questions.")
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        attempts, answers = analytics.load_answers(options['chunk_size'])
+        loaded = time.perf_counter()
+        stats = analytics.compute_item_stats(attempts, answers)
+        computed = time.perf_counter()
+        saved = analytics.save_item_stats(stats)
+        finished = time.perf_counter()
+        self.stdout.write(
+            f"Analysed {len(answers)} answers from {len(attempts)} attempts for {saved} questions "
+            f"(load {loaded - started:.2f}s, compute {computed - loaded:.2f}s, save {finished - computed:.2f}s)."
+        )
+
+        shown = 0
+        rows = QuizItemStats.objects.filter(response_count__gte=analytics.MIN_RESPONSES).select_related('quiz')
+        for item in rows.order_by(F('discrimination').asc(nulls_last=True)).iterator(chunk_size=500):
+            if shown >= options['show']:
+                break
+            flags = analytics.item_flags(item, item.quiz.correct_index)
+            if flags:
+                shown += 1
+                self.stdout.write(f"  #{item.quiz_id} {item.quiz.question[:60]!r}: {', '.join(flags)}")
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import jobs, mentoring, recommendations
+
+
+class Command(BaseCommand):
+    help = (
+        "Process queued AI quiz generation jobs, refresh the similarity rows of changed lessons, and keep "
+        "the mentorship slot window topped up."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Drain the queue once and exit.")
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help="Seconds to sleep when the queue is empty.")
+
+    def handle(self, *args, **options):
+        requeued = jobs.requeue_stale_jobs()
+        if requeued:
+            self.stdout.write(f"Requeued {requeued} stale job(s).")
+
+        while True:
+            processed = jobs.run_pending_jobs()
+            if processed:
+                self.stdout.write(f"Processed {processed} job(s).")
+            stale = recommendations.update_stale()
+            if stale:
+                self.stdout.write(f"Updated lesson similarity for {stale} changed lesson(s).")
+            slots = mentoring.top_up_slots()
+            if slots:
+                self.stdout.write(f"Created {slots} mentorship slot(s).")
+            if options['once']:
+                break
+            time.sleep(options['poll_interval'])
@@ -0,0 +1,78 @@
+import json
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+IMPORT_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Start fresh Python processes and report how long the app takes to load, to serve its first request "
+        "and which heavy packages (openai, numpy, ...) that pulled in, plus the slowest top-level imports. "
+        "Use --max-ms in CI to fail on cold-start regressions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/login/', help="URL of the first request (default needs no database).")
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--top', type=int, default=8, help="Slowest top-level imports to list (0 to skip).")
+        parser.add_argument('--max-ms', type=float,
+                            help="Fail if the median load + first response time is above this.")
+        parser.add_argument('--output', help="Write the JSON results to this file.")
+
+    def probe(self, path, importtime=False):
+        command = [sys.executable, *(['-X', 'importtime'] if importtime else []), '-m', 'core.startup_probe', path]
+        started = time.perf_counter()
+        result = subprocess.run(command, cwd=settings.BASE_DIR, capture_output=True, text=True)
+        process_ms = (time.perf_counter() - started) * 1000
+        if result.returncode:
+            raise CommandError(f"Startup probe failed:\n{result.stderr[-2000:]}")
+        return {**json.loads(result.stdout.strip().splitlines()[-1]), 'process_ms': round(process_ms, 1)}, result.stderr
+
+    def handle(self, *args, **options):
+        runs = [self.probe(options['path'])[0] for _ in range(max(1, options['runs']))]
+        summary = {
+            key: round(statistics.median(run[key] for run in runs), 1)
+            for key in ('process_ms', 'load_ms', 'first_response_ms')
+        }
+        summary.update({
+            'path': options['path'],
+            'runs': len(runs),
+            'status': runs[-1]['status'],
+            'modules': runs[-1]['modules'],
+            'heavy_modules': runs[-1]['heavy_modules'],
+        })
+
+        self.stdout.write(f"Cold start of {options['path']} (median of {len(runs)} runs):")
+        self.stdout.write(f"  process (interpreter + app + request)  {summary['process_ms']:>8} ms")
+        self.stdout.write(f"  load WSGI application                  {summary['load_ms']:>8} ms")
+        self.stdout.write(f"  first response (status {summary['status']})          {summary['first_response_ms']:>8} ms")
+        self.stdout.write(f"  modules imported                       {summary['modules']:>8}")
+        self.stdout.write(f"  heavy packages imported: {', '.join(summary['heavy_modules']) or 'none'}")
+
+        if options['top']:
+            _, stderr = self.probe(options['path'], importtime=True)
+            imports = []
+            for line in stderr.splitlines():
+                match = IMPORT_LINE.match(line)
+                if match and len(match[3]) == 1:  # one space of indent: imported directly, not by another module
+                    imports.append((int(match[2]) / 1000, match[4]))
+            summary['top_imports'] = [{'module': name, 'ms': round(ms, 1)}
+                                      for ms, name in sorted(imports, reverse=True)[:options['top']]]
+            self.stdout.write("Slowest top-level imports:")
+            for row in summary['top_imports']:
+                self.stdout.write(f"  {row['ms']:>8} ms  {row['module']}")
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+            self.stdout.write(f"Results written to {options['output']}")
+        total = summary['load_ms'] + summary['first_response_ms']
+        if options['max_ms'] is not None and total > options['max_ms']:
+            raise CommandError(f"Cold start took {total:.0f} ms, over the {options['max_ms']:.0f} ms budget.")
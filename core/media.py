@@ -0,0 +1,161 @@
+"""
+Uploaded media in production: content-hashed names and an efficient view.
+
+``HashedMediaStorage`` (the default storage, see ``STORAGES``) saves uploads
+as ``<name>.<sha256[:12]><ext>``. A name then always means the same bytes,
+so identical uploads share one file and browsers may cache them for a year
+without revalidating. Names that are already content-addressed, such as the
+responsive derivatives and course-archive images, are kept as they are.
+
+``serve`` answers ``MEDIA_URL`` requests with ``ETag``/``Last-Modified``
+validators (304s and 412s come from Django's ``get_conditional_response``),
+single byte ranges (206/416, honouring ``If-Range``), and an immutable
+``Cache-Control`` for hashed names. Files are streamed in ``BLOCK_SIZE``
+pieces, so memory stays flat however large the image; full responses are
+plain ``FileResponse``s, which gunicorn hands to ``sendfile()``. With
+``MEDIA_OFFLOAD`` set to ``x-accel-redirect`` (nginx) or ``x-sendfile``
+(Apache, lighttpd) the view only checks the file and its validators and
+leaves the transfer to the front-end server.
+"""
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, SuspiciousFileOperation
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.http import require_safe
+
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# Stems of the names this project writes, and nothing looser (camera names like IMG_20240101123456 are
+# digits too): ``photo.<sha256[:12]>`` from HashedMediaStorage, a bare ``<sha256>`` from course archives
+# and ``<sha256[:20]>-<width>w`` for responsive derivatives.
+HASHED_NAME = re.compile(r'.+\.[0-9a-f]{12}|[0-9a-f]{64}|[0-9a-f]{20}-\d+w')
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def is_hashed(name):
+    return bool(HASHED_NAME.fullmatch(posixpath.splitext(posixpath.basename(name))[0]))
+
+
+class HashedMediaStorage(FileSystemStorage):
+    """FileSystemStorage that names each upload after a hash of its content."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        if not is_hashed(name):
+            digest = hashlib.sha256()
+            for chunk in content.chunks(BLOCK_SIZE):
+                digest.update(chunk)
+            content.seek(0)
+            root, ext = posixpath.splitext(name)
+            name = f"{root}.{digest.hexdigest()[:12]}{ext.lower()}"
+            if self.exists(name):
+                return name  # same bytes already stored
+        return super().save(name, content, max_length)
+
+
+def etag_for(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def byte_range(request, size, etag, last_modified):
+    """``(start, end)`` of a satisfiable single ``Range``, ``None`` to send everything, or ``False`` for a 416."""
+    header = request.headers.get('Range')
+    if not header or request.method != 'GET':
+        return None
+    if_range = request.headers.get('If-Range')
+    if if_range and if_range != etag and parse_http_date_safe(if_range) != last_modified:
+        return None  # the client's copy is stale; it needs the whole new file
+    match = RANGE.match(header.replace(' ', ''))
+    if not match or match.groups() == ('', ''):
+        return None  # multiple or malformed ranges: a 200 with the whole file is always allowed
+    first, last = match.groups()
+    if first:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    else:
+        start, end = max(0, size - int(last)), size - 1  # suffix range: the last N bytes
+    if start >= size or start > end:
+        return False
+    return start, end
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            block = f.read(min(BLOCK_SIZE, length))
+            if not block:
+                return
+            length -= len(block)
+            yield block
+
+
+@require_safe
+def serve(request, path):
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(full_path)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404("No such media file.")
+    if not os.path.isfile(full_path):
+        raise Http404("No such media file.")
+
+    etag, last_modified = etag_for(stat), int(stat.st_mtime)  # HTTP dates have whole seconds
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(last_modified),
+        'Cache-Control': IMMUTABLE if is_hashed(path) else f"public, max-age={settings.MEDIA_MAX_AGE}",
+        'Accept-Ranges': 'bytes',
+    }
+    not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified[header] = value
+        return not_modified
+
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+    offload = settings.MEDIA_OFFLOAD
+    if offload:
+        response = HttpResponse(content_type=content_type, headers=headers)
+        if offload == 'x-accel-redirect':
+            # An ``internal`` nginx location aliased to MEDIA_ROOT; nginx handles ranges itself.
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + path
+        elif offload == 'x-sendfile':
+            response['X-Sendfile'] = full_path
+        else:
+            raise ImproperlyConfigured(f"MEDIA_OFFLOAD must be 'x-accel-redirect' or 'x-sendfile', not {offload!r}")
+        return response
+
+    span = byte_range(request, stat.st_size, etag, last_modified)
+    if span is False:
+        response = HttpResponse(status=416, headers=headers)
+        response['Content-Range'] = f"bytes */{stat.st_size}"
+        return response
+    if request.method == 'HEAD':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['Content-Length'] = stat.st_size
+        return response
+    if span is None:
+        response = FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+        response.block_size = BLOCK_SIZE
+        return response
+
+    start, end = span
+    response = StreamingHttpResponse(read_range(full_path, start, end - start + 1), status=206,
+                                     content_type=content_type, headers=headers)
+    response['Content-Range'] = f"bytes {start}-{end}/{stat.st_size}"
+    response['Content-Length'] = end - start + 1
+    return response
@@ -0,0 +1,103 @@
+"""
+Mentor slots and race-free booking.
+
+Weekly ``MentorAvailability`` windows are cut into ``MentorSlot`` rows a few
+weeks ahead (``generate_slots``, run on deploy by ``manage.py
+generate_mentor_slots`` and whenever availability changes). ``top_up_slots``
+moves the window forward as the days pass; the quiz worker and the booking
+page call it, and it does real work at most once per
+``MENTOR_SLOT_TOP_UP_INTERVAL``. A booking points
+at its slot through a unique one-to-one column, so when two requests race
+for the same slot the database rejects the second insert instead of
+double-booking the mentor.
+"""
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import Mentor, MentorSlot, MentorshipBooking
+
+TOP_UP_KEY = 'mentor-slots:topped-up'
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def slot_starts(mentor, windows, start_date, days):
+    """Yield (start, end) for every slot the mentor's windows produce over ``days`` days."""
+    tz = timezone.get_current_timezone()
+    length = timedelta(minutes=mentor.slot_minutes)
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        for window in windows:
+            if window.weekday != day.weekday():
+                continue
+            start = timezone.make_aware(datetime.combine(day, window.start_time), tz)
+            window_end = timezone.make_aware(datetime.combine(day, window.end_time), tz)
+            while start + length <= window_end:
+                yield start, start + length
+                start += length
+
+
+def generate_slots(weeks=None, mentors=None):
+    """
+    Create the missing slots for the next ``weeks`` weeks and drop unbooked
+    future slots that no longer fall inside an availability window.
+    Returns the number of slots created.
+    """
+    weeks = weeks or settings.MENTOR_SLOT_WEEKS
+    now = timezone.now()
+    today = timezone.localdate(now)
+    if mentors is None:
+        mentors = Mentor.objects.filter(is_active=True)
+    created = 0
+    for mentor in mentors.prefetch_related('availability'):
+        wanted = [
+            MentorSlot(mentor=mentor, start=start, end=end)
+            for start, end in slot_starts(mentor, list(mentor.availability.all()), today, weeks * 7)
+            if start > now
+        ]
+        with transaction.atomic():
+            MentorSlot.objects.filter(mentor=mentor, start__gt=now, booking__isnull=True).exclude(
+                start__in=[slot.start for slot in wanted]
+            ).delete()
+            existing = MentorSlot.objects.filter(mentor=mentor).count()
+            MentorSlot.objects.bulk_create(wanted, batch_size=500, ignore_conflicts=True)
+            created += MentorSlot.objects.filter(mentor=mentor).count() - existing
+    return created
+
+
+def top_up_slots():
+    """Run ``generate_slots`` unless it already ran within ``MENTOR_SLOT_TOP_UP_INTERVAL`` seconds."""
+    if not cache.add(TOP_UP_KEY, True, settings.MENTOR_SLOT_TOP_UP_INTERVAL):
+        return 0
+    return generate_slots()
+
+
+def free_slots(weeks=2, mentor_id=None):
+    """Unbooked future slots of active mentors in the next ``weeks`` weeks, soonest first (one query)."""
+    now = timezone.now()
+    slots = MentorSlot.objects.filter(
+        start__gt=now, start__lt=now + timedelta(weeks=weeks), booking__isnull=True, mentor__is_active=True,
+    )
+    if mentor_id is not None:
+        slots = slots.filter(mentor_id=mentor_id)
+    return slots.select_related('mentor').order_by('start', 'mentor_id')
+
+
+def book_slot(user, slot_id):
+    """Book ``slot_id`` for ``user``, or raise SlotUnavailable if it is taken, past or unknown."""
+    slot = MentorSlot.objects.select_related('mentor').filter(
+        id=slot_id, start__gt=timezone.now(), mentor__is_active=True,
+    ).first()
+    if slot is None:
+        raise SlotUnavailable("That session is no longer available.")
+    try:
+        with transaction.atomic():
+            return MentorshipBooking.objects.create(user=user, mentor=slot.mentor.name, date=slot.start, slot=slot)
+    except IntegrityError:
+        raise SlotUnavailable("Someone has just booked that session. Please pick another time.")
@@ -0,0 +1,268 @@
+"""
+Request, database and LLM instrumentation.
+
+``MetricsMiddleware`` times every request and counts the SQL it runs (a
+database execute wrapper reports into a per-request context variable, which
+also follows async views into their ``sync_to_async`` threads). Results feed
+in-process counters and histograms, rendered in the Prometheus text format
+by the ``/metrics`` view, and a sampled one-line JSON log per request.
+
+Metrics live in each worker process; with several gunicorn workers every
+scrape sees the worker that answered it, so sum or average across scrapes.
+"""
+import bisect
+import contextvars
+import hmac
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+request_logger = logging.getLogger('core.requests')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class Counter:
+    def __init__(self, name, help_text, labels=()):
+        self.name, self.help, self.labels = name, help_text, labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help_text, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels, self.buckets = name, help_text, labels, buckets
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self.lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            series = self.series.setdefault(key, [0] * (len(self.buckets) + 2))
+            series[bisect.bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def quantile(self, q, **labels):
+        """Estimate the ``q`` quantile by interpolating inside the bucket it falls in."""
+        key = tuple(labels[name] for name in self.labels)
+        with self.lock:
+            counts = list(self.series.get(key, [])[:-1])
+        total = sum(counts)
+        if not total:
+            return None
+        rank, seen = q * total, 0
+        for index, count in enumerate(counts):
+            if count and seen + count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                upper = self.buckets[index] if index < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            snapshot = sorted((key, list(series)) for key, series in self.series.items())
+        for key, series in snapshot:
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), series[:-1]):
+                cumulative += count
+                labels = format_labels((*self.labels, 'le'), (*key, bound))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(self.labels, key)} {series[-1]:.6f}")
+            lines.append(f"{self.name}_count{format_labels(self.labels, key)} {cumulative}")
+        return lines
+
+    def render_quantiles(self, name, help_text):
+        lines = [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        with self.lock:
+            keys = sorted(self.series)
+        for key in keys:
+            for q in QUANTILES:
+                value = self.quantile(q, **dict(zip(self.labels, key)))
+                labels = format_labels((*self.labels, 'quantile'), (*key, q))
+                lines.append(f"{name}{labels} {value:.6f}")
+        return lines
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        escaped = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{escaped}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+REQUESTS = Counter('eden_http_requests_total', 'Requests handled.', ('view', 'method', 'status'))
+REQUEST_SECONDS = Histogram('eden_http_request_duration_seconds', 'Request latency by view.', ('view',))
+DB_QUERIES = Histogram('eden_db_queries_per_request', 'SQL queries per request.', ('view',), COUNT_BUCKETS)
+DB_SECONDS = Counter('eden_db_query_seconds_total', 'Time spent in SQL by view.', ('view',))
+LLM_SECONDS = Histogram('eden_llm_request_duration_seconds', 'Chat-completions call latency.',
+                        ('operation', 'outcome'))
+LLM_TOKENS = Counter('eden_llm_tokens_total', 'Tokens reported by the chat-completions API.', ('kind',))
+
+
+class RequestRecord:
+    __slots__ = ('queries', 'db_seconds')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_seconds = 0.0
+
+
+_current = contextvars.ContextVar('core_metrics_request', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper; installed on every connection by ``install_query_recorder``."""
+    record = _current.get()
+    if record is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        record.queries += 1
+        record.db_seconds += time.perf_counter() - started
+
+
+def install_query_recorder(sender, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def llm_call(operation):
+    """Time a chat-completions call; ``record_usage`` the response inside the block to count tokens."""
+    started = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        LLM_SECONDS.observe(time.perf_counter() - started, operation=operation, outcome=outcome)
+
+
+def record_usage(usage):
+    if usage is not None:
+        LLM_TOKENS.inc(getattr(usage, 'prompt_tokens', 0) or 0, kind='prompt')
+        LLM_TOKENS.inc(getattr(usage, 'completion_tokens', 0) or 0, kind='completion')
+
+
+class MetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        record, started = RequestRecord(), time.perf_counter()
+        token = _current.set(record)
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, record, started)
+        return response
+
+    async def __acall__(self, request):
+        record, started = RequestRecord(), time.perf_counter()
+        token = _current.set(record)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        self.finish(request, response, record, started)
+        return response
+
+    def finish(self, request, response, record, started):
+        elapsed = time.perf_counter() - started
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        REQUESTS.inc(view=view, method=request.method, status=response.status_code)
+        REQUEST_SECONDS.observe(elapsed, view=view)
+        DB_QUERIES.observe(record.queries, view=view)
+        DB_SECONDS.inc(record.db_seconds, view=view)
+
+        slow = elapsed * 1000 >= settings.REQUEST_LOG_SLOW_MS
+        if response.status_code >= 500 or slow or random.random() < settings.REQUEST_LOG_SAMPLE_RATE:
+            request_logger.info('request', extra={
+                'view': view,
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 2),
+                'db_queries': record.queries,
+                'db_ms': round(record.db_seconds * 1000, 2),
+                'slow': slow,
+            })
+
+
+def render():
+    lines = []
+    for metric in (REQUESTS, REQUEST_SECONDS, DB_QUERIES, DB_SECONDS, LLM_SECONDS, LLM_TOKENS):
+        lines.extend(metric.render())
+    lines.extend(REQUEST_SECONDS.render_quantiles(
+        'eden_http_request_duration_quantile_seconds', 'Estimated p50/p95/p99 request latency by view.'))
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """
+    Prometheus scrape endpoint. Needs ``Authorization: Bearer <METRICS_TOKEN>``;
+    without a token it is only served with DEBUG or METRICS_PUBLIC, and 404s otherwise.
+    """
+    token = settings.METRICS_TOKEN
+    if token:
+        if not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+            return HttpResponseForbidden()
+    elif not (settings.DEBUG or settings.METRICS_PUBLIC):
+        raise Http404("Set METRICS_TOKEN to enable /metrics.")
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: the standard fields plus anything passed via ``extra``."""
+
+    RESERVED = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+    def format(self, record):
+        payload = {
+            'time': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in self.RESERVED})
+        if record.exc_info:
+            payload['exception'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
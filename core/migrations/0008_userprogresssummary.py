@@ -0,0 +1,47 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:07
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_summaries(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    Progress = apps.get_model('core', 'Progress')
+    UserProgressSummary = apps.get_model('core', 'UserProgressSummary')
+    user_ids = Progress.objects.values_list('user_id', flat=True).distinct()
+    for user_id in user_ids:
+        progress_qs = Progress.objects.filter(user_id=user_id)
+        totals = progress_qs.aggregate(
+            completed_count=models.Count('id', filter=models.Q(completed=True)),
+            lowest_score=models.Min('score'),
+        )
+        next_lesson = None
+        if totals['lowest_score'] is not None and totals['lowest_score'] < 70:
+            next_lesson = Lesson.objects.exclude(
+                id__in=progress_qs.filter(completed=True).values('lesson_id')
+            ).order_by('id').first()
+        UserProgressSummary.objects.create(user_id=user_id, next_lesson=next_lesson, **totals)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_quizcacheentry'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserProgressSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('completed_count', models.PositiveIntegerField(default=0)),
+                ('lowest_score', models.IntegerField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('next_lesson', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='core.lesson')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='progress_summary', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
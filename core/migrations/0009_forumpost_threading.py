@@ -0,0 +1,49 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:09
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_paths(apps, schema_editor):
+    ForumPost = apps.get_model('core', 'ForumPost')
+    paths = {}
+    threads = {}
+    for post_id, parent_id in ForumPost.objects.order_by('id').values_list('id', 'parent_id').iterator():
+        if parent_id in paths:
+            paths[post_id] = f"{paths[parent_id]}{post_id:010d}/"
+            threads[post_id] = threads[parent_id] or parent_id
+        else:
+            paths[post_id] = f"{post_id:010d}/"
+            threads[post_id] = None
+        ForumPost.objects.filter(id=post_id).update(path=paths[post_id], thread_id=threads[post_id])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_userprogresssummary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='forumpost',
+            name='path',
+            field=models.CharField(blank=True, editable=False, max_length=255),
+        ),
+        migrations.AddField(
+            model_name='forumpost',
+            name='thread',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_posts', to='core.forumpost'),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(fields=['parent', '-created_at', '-id'], name='core_forum_page_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='forumpost',
+            index=models.Index(fields=['thread', 'path'], name='core_forum_thread_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:10
+
+from django.db import migrations, models
+
+FTS_TABLE = 'core_searchdocument_fts'
+
+SQLITE_SETUP = [
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    "title, body, content='core_searchdocument', content_rowid='id', tokenize='porter unicode61')",
+    f"CREATE TRIGGER core_searchdocument_ai AFTER INSERT ON core_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+    f"CREATE TRIGGER core_searchdocument_ad AFTER DELETE ON core_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); END",
+    f"CREATE TRIGGER core_searchdocument_au AFTER UPDATE ON core_searchdocument BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.id, old.title, old.body); "
+    f"INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.id, new.title, new.body); END",
+]
+SQLITE_TEARDOWN = [
+    "DROP TRIGGER IF EXISTS core_searchdocument_ai",
+    "DROP TRIGGER IF EXISTS core_searchdocument_ad",
+    "DROP TRIGGER IF EXISTS core_searchdocument_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+POSTGRES_SETUP = [
+    "ALTER TABLE core_searchdocument ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(body, '')), 'B')) STORED",
+    "CREATE INDEX core_searchdocument_vector_idx ON core_searchdocument USING GIN (search_vector)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS core_searchdocument_vector_idx",
+    "ALTER TABLE core_searchdocument DROP COLUMN IF EXISTS search_vector",
+]
+
+
+def run_for_vendor(sqlite, postgres):
+    def run(apps, schema_editor):
+        statements = {'sqlite': sqlite, 'postgresql': postgres}.get(schema_editor.connection.vendor, [])
+        for statement in statements:
+            schema_editor.execute(statement)
+    return run
+
+
+def backfill_documents(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    Quiz = apps.get_model('core', 'Quiz')
+    ForumPost = apps.get_model('core', 'ForumPost')
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    documents = [
+        SearchDocument(kind='lesson', object_id=lesson.id, title=lesson.title, body=lesson.content,
+                       url=f'/lesson/{lesson.id}/')
+        for lesson in Lesson.objects.iterator()
+    ]
+    documents += [
+        SearchDocument(kind='quiz', object_id=quiz.id, title=quiz.question[:255],
+                       body=' '.join([quiz.option1, quiz.option2, quiz.option3, quiz.option4]),
+                       url=f'/lesson/{quiz.lesson_id}/')
+        for quiz in Quiz.objects.iterator()
+    ]
+    documents += [
+        SearchDocument(kind='post', object_id=post.id, title=post.title, body=post.content,
+                       url=f'/forum/#post-{post.thread_id or post.id}')
+        for post in ForumPost.objects.iterator()
+    ]
+    SearchDocument.objects.bulk_create(documents, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_forumpost_threading'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchDocument',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('lesson', 'Lesson'), ('quiz', 'Quiz'), ('post', 'Forum post')], max_length=10)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('title', models.CharField(max_length=255)),
+                ('body', models.TextField()),
+                ('url', models.CharField(max_length=255)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('kind', 'object_id'), name='core_searchdocument_unique_object')],
+            },
+        ),
+        migrations.RunPython(
+            run_for_vendor(SQLITE_SETUP, POSTGRES_SETUP), run_for_vendor(SQLITE_TEARDOWN, POSTGRES_TEARDOWN)
+        ),
+        migrations.RunPython(backfill_documents, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:17
+
+from django.db import migrations, models
+from django.utils.text import Truncator
+
+
+def backfill_excerpts(apps, schema_editor):
+    Lesson = apps.get_model('core', 'Lesson')
+    lessons = list(Lesson.objects.only('id', 'content'))
+    for lesson in lessons:
+        lesson.excerpt = Truncator(lesson.content).words(30)
+    Lesson.objects.bulk_update(lessons, ['excerpt'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_responsiveimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='excerpt',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(backfill_excerpts, migrations.RunPython.noop),
+    ]
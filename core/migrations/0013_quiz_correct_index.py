@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:18
+
+from django.db import migrations, models
+
+
+def copy_correct_option_to_index(apps, schema_editor):
+    Quiz = apps.get_model('core', 'Quiz')
+    quizzes = list(Quiz.objects.only('id', 'option1', 'option2', 'option3', 'option4', 'correct_option'))
+    for quiz in quizzes:
+        options = [quiz.option1, quiz.option2, quiz.option3, quiz.option4]
+        # Answers that match no option (bad legacy data) fall back to the first one.
+        quiz.correct_index = options.index(quiz.correct_option) + 1 if quiz.correct_option in options else 1
+    Quiz.objects.bulk_update(quizzes, ['correct_index'], batch_size=500)
+
+
+def copy_correct_index_to_option(apps, schema_editor):
+    Quiz = apps.get_model('core', 'Quiz')
+    quizzes = list(Quiz.objects.only('id', 'option1', 'option2', 'option3', 'option4', 'correct_index'))
+    for quiz in quizzes:
+        quiz.correct_option = [quiz.option1, quiz.option2, quiz.option3, quiz.option4][quiz.correct_index - 1]
+    Quiz.objects.bulk_update(quizzes, ['correct_option'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_lesson_excerpt'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quiz',
+            name='correct_index',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Option 1'), (2, 'Option 2'), (3, 'Option 3'), (4, 'Option 4')], default=1),
+        ),
+        migrations.AlterField(
+            model_name='quiz',
+            name='correct_option',
+            field=models.CharField(max_length=100, default=''),
+        ),
+        migrations.RunPython(copy_correct_option_to_index, copy_correct_index_to_option),
+        migrations.RemoveField(
+            model_name='quiz',
+            name='correct_option',
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_quiz_correct_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizAttempt',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.PositiveSmallIntegerField(default=0)),
+                ('correct_count', models.PositiveSmallIntegerField(default=0)),
+                ('question_count', models.PositiveSmallIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to='core.lesson')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_attempts', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AnswerRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('selected_index', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('is_correct', models.BooleanField(default=False)),
+                ('quiz', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answer_records', to='core.quiz')),
+                ('attempt', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='answers', to='core.quizattempt')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['user', 'lesson', '-created_at'], name='core_attempt_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='quizattempt',
+            index=models.Index(fields=['lesson', '-created_at'], name='core_attempt_lesson_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='answerrecord',
+            index=models.Index(fields=['quiz', 'selected_index'], name='core_answer_quiz_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='answerrecord',
+            constraint=models.UniqueConstraint(fields=('attempt', 'quiz'), name='core_answer_unique_question'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0015_quizitemstats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Mentor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('bio', models.TextField(blank=True)),
+                ('slot_minutes', models.PositiveSmallIntegerField(default=60)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='MentorSlot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start', models.DateTimeField()),
+                ('end', models.DateTimeField()),
+                ('mentor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='core.mentor')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='mentorshipbooking',
+            name='slot',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='booking', to='core.mentorslot'),
+        ),
+        migrations.CreateModel(
+            name='MentorAvailability',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('mentor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability', to='core.mentor')),
+            ],
+            options={
+                'verbose_name_plural': 'mentor availability',
+                'constraints': [models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='core_availability_ends_after_start')],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='mentorslot',
+            index=models.Index(fields=['start', 'mentor'], name='core_slot_start_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='mentorslot',
+            constraint=models.UniqueConstraint(fields=('mentor', 'start'), name='core_slot_unique_start'),
+        ),
+    ]
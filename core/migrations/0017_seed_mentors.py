@@ -0,0 +1,37 @@
+import datetime
+
+from django.db import migrations
+
+# The mentors that used to be hard-coded in views.mentorship_booking, with
+# weekday-evening and Saturday-morning hours that admins can change later.
+MENTORS = ['Pastor James', 'Mrs. Adaobi', 'Dr. Olakunle']
+WINDOWS = [(weekday, datetime.time(18), datetime.time(21)) for weekday in range(5)] + [
+    (5, datetime.time(9), datetime.time(12)),
+]
+
+
+def seed_mentors(apps, schema_editor):
+    Mentor = apps.get_model('core', 'Mentor')
+    MentorAvailability = apps.get_model('core', 'MentorAvailability')
+    for name in MENTORS:
+        mentor, created = Mentor.objects.get_or_create(name=name)
+        if created:
+            MentorAvailability.objects.bulk_create([
+                MentorAvailability(mentor=mentor, weekday=weekday, start_time=start, end_time=end)
+                for weekday, start, end in WINDOWS
+            ])
+
+
+def remove_mentors(apps, schema_editor):
+    apps.get_model('core', 'Mentor').objects.filter(name__in=MENTORS).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0016_mentor_slots'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_mentors, remove_mentors),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0017_seed_mentors'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='mentorshipbooking',
+            index=models.Index(fields=['user', '-date'], name='core_booking_user_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='progress',
+            index=models.Index(fields=['user', 'completed'], name='core_progress_done_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.5 on 2026-10-18 07:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0018_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LessonSimilarity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similar_lessons', to='core.lesson')),
+                ('similar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='core.lesson')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['lesson', 'similar', 'score'], name='core_similarity_lookup_idx')],
+                'constraints': [models.UniqueConstraint(fields=('lesson', 'similar'), name='core_similarity_unique_pair')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0019_lessonsimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='similarity_stale_at',
+            field=models.DateTimeField(blank=True, db_index=True, editable=False, null=True),
+        ),
+    ]
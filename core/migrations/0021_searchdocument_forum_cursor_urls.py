@@ -0,0 +1,31 @@
+# Generated by Django 5.2.5 on 2026-10-18 08:58
+
+from django.db import migrations
+
+from core.pagination import encode_cursor
+
+
+def link_posts_to_their_page(apps, schema_editor):
+    """Rewrite forum hits from the first page (``/forum/#post-N``) to the page holding the thread."""
+    ForumPost = apps.get_model('core', 'ForumPost')
+    SearchDocument = apps.get_model('core', 'SearchDocument')
+    posts = ForumPost.objects.select_related('thread').only('id', 'created_at', 'thread__id', 'thread__created_at')
+    roots = {post.id: post.thread or post for post in posts.iterator()}
+    documents = list(SearchDocument.objects.filter(kind='post').only('id', 'object_id'))
+    for document in documents:
+        root = roots.get(document.object_id)
+        if root is not None:
+            # Mirrors core.search.forum_url: the cursor just past the root lists it first.
+            document.url = f"/forum/?before={encode_cursor(root.created_at, root.id + 1)}#post-{root.id}"
+    SearchDocument.objects.bulk_update(documents, ['url'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0020_lesson_similarity_stale_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(link_posts_to_their_page, migrations.RunPython.noop),
+    ]
@@ -1,16 +1,59 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+from django.utils.text import Truncator
 
 User = get_user_model()
 
-class Lesson(models.Model):
+
+class TracksImageMixin:
+    """Remembers the stored name of ``IMAGE_FIELD`` as last loaded or saved, in ``loaded_image``."""
+    IMAGE_FIELD = 'image'
+    loaded_image = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Still the raw string here; None if the field was deferred.
+        instance.loaded_image = instance.__dict__.get(cls.IMAGE_FIELD)
+        return instance
+
+    def image_changed(self):
+        return getattr(self, self.IMAGE_FIELD).name != self.loaded_image
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.loaded_image = getattr(self, self.IMAGE_FIELD).name
+
+class Lesson(TracksImageMixin, models.Model):
+    EXCERPT_WORDS = 30
+
     title = models.CharField(max_length=200)
     content = models.TextField()
     image = models.ImageField(upload_to='lesson_images/', blank=True, null=True)
+    # First EXCERPT_WORDS words of `content`, kept in sync on save so list pages can skip `content`.
+    excerpt = models.TextField(blank=True, editable=False)
+    # Set when the lesson or its quizzes change; `core.recommendations.update_stale` clears it.
+    similarity_stale_at = models.DateTimeField(null=True, blank=True, editable=False, db_index=True)
 
     def __str__(self):
         return self.title
 
+    @classmethod
+    def make_excerpt(cls, content):
+        return Truncator(content).words(cls.EXCERPT_WORDS)
+
+    @classmethod
+    def mark_similarity_stale(cls, lesson_ids):
+        cls.objects.filter(id__in=lesson_ids).update(similarity_stale_at=timezone.now())
+
+    def save(self, *args, **kwargs):
+        self.excerpt = self.make_excerpt(self.content)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'content' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'excerpt'}
+        super().save(*args, **kwargs)
+
 class Quiz(models.Model):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     question = models.CharField(max_length=255)
@@ -18,7 +61,9 @@ class Quiz(models.Model):
     option2 = models.CharField(max_length=100)
     option3 = models.CharField(max_length=100)
     option4 = models.CharField(max_length=100)
-    correct_option = models.CharField(max_length=100)
+    correct_index = models.PositiveSmallIntegerField(
+        choices=[(1, 'Option 1'), (2, 'Option 2'), (3, 'Option 3'), (4, 'Option 4')], default=1
+    )
 
     def __str__(self):
         return f"{self.lesson.title} - {self.question}"
@@ -27,6 +72,10 @@ class Quiz(models.Model):
     def options_list(self):
         return [self.option1, self.option2, self.option3, self.option4]
 
+    @property
+    def correct_option(self):
+        return self.options_list[self.correct_index - 1]
+
 class Progress(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
@@ -35,33 +84,353 @@ class Progress(models.Model):
 
     class Meta:
         unique_together = ('user', 'lesson')
+        indexes = [
+            # UserProgressSummary.refresh_for: a user's completed lessons.
+            models.Index(fields=['user', 'completed'], name='core_progress_done_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.lesson.title} - {'Completed' if self.completed else 'Pending'}"
 
+class UserProgressSummary(models.Model):
+    """Denormalized dashboard figures per user, refreshed whenever one of their Progress rows changes."""
+    # Recommendations are ranked by similarity to this many of the user's lowest-scoring lessons.
+    WEAKEST_LESSONS = 3
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='progress_summary')
+    completed_count = models.PositiveIntegerField(default=0)
+    lowest_score = models.IntegerField(null=True, blank=True)
+    next_lesson = models.ForeignKey(Lesson, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Progress summary for user {self.user_id}"
+
+    @classmethod
+    def refresh_for(cls, user_id, create=True):
+        progress_qs = Progress.objects.filter(user_id=user_id)
+        totals = progress_qs.aggregate(
+            completed_count=models.Count('id', filter=models.Q(completed=True)),
+            lowest_score=models.Min('score'),
+        )
+        next_lesson_id = None
+        if totals['lowest_score'] is not None and totals['lowest_score'] < 70:
+            completed = progress_qs.filter(completed=True).values('lesson_id')
+            weakest = progress_qs.filter(score__lt=70).order_by('score', 'lesson_id').values('lesson_id')
+            next_lesson_id = LessonSimilarity.best_match(weakest[:cls.WEAKEST_LESSONS], completed)
+            if next_lesson_id is None:
+                # No similarity index yet: fall back to the first lesson not completed.
+                next_lesson_id = Lesson.objects.exclude(id__in=completed).order_by('id').values_list(
+                    'id', flat=True).first()
+        values = {
+            'completed_count': totals['completed_count'],
+            'lowest_score': totals['lowest_score'],
+            'next_lesson_id': next_lesson_id,
+        }
+        if not create:
+            # Deletes may be cascading from the user itself, so never recreate the row here.
+            cls.objects.filter(user_id=user_id).update(**values)
+            return None
+        summary, _ = cls.objects.update_or_create(user_id=user_id, defaults=values)
+        return summary
+
+    @classmethod
+    def refresh_many(cls, summaries):
+        """Recompute every summary in the ``summaries`` queryset. Returns how many were refreshed."""
+        user_ids = list(summaries.values_list('user_id', flat=True).distinct())
+        for user_id in user_ids:
+            cls.refresh_for(user_id, create=False)
+        return len(user_ids)
+
+    @classmethod
+    def needing_recommendation(cls):
+        """Summaries with a lesson scored below the pass mark, the only ones ``refresh_for`` recommends for."""
+        return cls.objects.filter(lowest_score__lt=70)
+
+class LessonSimilarity(models.Model):
+    """A lesson's top-k most similar lessons (TF-IDF cosine), precomputed by ``core.recommendations``."""
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='similar_lessons')
+    similar = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='+')
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lesson', 'similar'], name='core_similarity_unique_pair'),
+        ]
+        indexes = [
+            # Covers best_match: rows found by lesson, similar and score read from the index alone.
+            models.Index(fields=['lesson', 'similar', 'score'], name='core_similarity_lookup_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.lesson_id} ~ {self.similar_id}: {self.score:.3f}"
+
+    @classmethod
+    def best_match(cls, lesson_ids, exclude_ids):
+        """The lesson most similar, summed over ``lesson_ids``, that is not in ``exclude_ids``; one query."""
+        row = (
+            cls.objects.filter(lesson_id__in=lesson_ids).exclude(similar_id__in=exclude_ids)
+            .values('similar_id').annotate(total=models.Sum('score')).order_by('-total', 'similar_id').first()
+        )
+        return row['similar_id'] if row else None
+
+class QuizAttempt(models.Model):
+    """One submission of a lesson's quiz; Progress only keeps the latest score."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='quiz_attempts')
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='quiz_attempts')
+    score = models.PositiveSmallIntegerField(default=0)
+    correct_count = models.PositiveSmallIntegerField(default=0)
+    question_count = models.PositiveSmallIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'lesson', '-created_at'], name='core_attempt_user_idx'),
+            models.Index(fields=['lesson', '-created_at'], name='core_attempt_lesson_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - lesson {self.lesson_id} - {self.score}%"
+
+class AnswerRecord(models.Model):
+    """The option picked for one question in one attempt, stored as small integers only."""
+    attempt = models.ForeignKey(QuizAttempt, on_delete=models.CASCADE, related_name='answers')
+    quiz = models.ForeignKey(Quiz, on_delete=models.CASCADE, related_name='answer_records')
+    # 1-4, or null when the question was left blank.
+    selected_index = models.PositiveSmallIntegerField(null=True, blank=True)
+    is_correct = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['attempt', 'quiz'], name='core_answer_unique_question'),
+        ]
+        indexes = [
+            models.Index(fields=['quiz', 'selected_index'], name='core_answer_quiz_idx'),
+        ]
+
+    def __str__(self):
+        return f"Attempt {self.attempt_id} - quiz {self.quiz_id}: {self.selected_index}"
+
+class QuizItemStats(models.Model):
+    """Item analysis for one question, recomputed by ``manage.py quiz_analytics``."""
+    quiz = models.OneToOneField(Quiz, on_delete=models.CASCADE, related_name='item_stats')
+    response_count = models.PositiveIntegerField(default=0)
+    # Share of answers that were correct (the classical p-value; higher means easier).
+    difficulty = models.FloatField(null=True, blank=True)
+    # Correct rate in the top 27% of attempts minus the bottom 27%, ranked by attempt score.
+    discrimination = models.FloatField(null=True, blank=True)
+    # Share of answers picking options 1-4, then the share left blank.
+    option_rates = models.JSONField(default=list)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Item stats for quiz {self.quiz_id}"
+
+class Mentor(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    bio = models.TextField(blank=True)
+    slot_minutes = models.PositiveSmallIntegerField(default=60)
+    is_active = models.BooleanField(default=True)
+
+    def __str__(self):
+        return self.name
+
+class MentorAvailability(models.Model):
+    """A weekly window (in the site's time zone) that is cut into bookable slots."""
+    WEEKDAY_CHOICES = [
+        (0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'),
+        (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday'),
+    ]
+
+    mentor = models.ForeignKey(Mentor, on_delete=models.CASCADE, related_name='availability')
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        verbose_name_plural = 'mentor availability'
+        constraints = [
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')),
+                                   name='core_availability_ends_after_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.mentor} {self.get_weekday_display()} {self.start_time:%H:%M}-{self.end_time:%H:%M}"
+
+class MentorSlot(models.Model):
+    """One bookable session, generated ahead of time from MentorAvailability by ``core.mentoring``."""
+    mentor = models.ForeignKey(Mentor, on_delete=models.CASCADE, related_name='slots')
+    start = models.DateTimeField()
+    end = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['mentor', 'start'], name='core_slot_unique_start'),
+        ]
+        indexes = [
+            models.Index(fields=['start', 'mentor'], name='core_slot_start_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.mentor} at {self.start}"
+
 class MentorshipBooking(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     mentor = models.CharField(max_length=100)
     date = models.DateTimeField()
     status = models.CharField(max_length=20, default='pending')
+    # The unique one-to-one is what stops two bookings landing on the same slot.
+    slot = models.OneToOneField(MentorSlot, on_delete=models.SET_NULL, null=True, blank=True,
+                                related_name='booking')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', '-date'], name='core_booking_user_idx'),
+        ]
 
     def __str__(self):
         return f"{self.user.username} - {self.mentor} on {self.date}"
 
 class ForumPost(models.Model):
+    MAX_DEPTH = 20  # path segments are 11 chars, so this keeps `path` under 255
+
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     title = models.CharField(max_length=200)
     content = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     parent = models.ForeignKey('self', null=True, blank=True, on_delete=models.CASCADE)
+    # Materialized path ("0000000012/0000000034/") and root post, filled in on first save.
+    thread = models.ForeignKey('self', null=True, blank=True, editable=False,
+                               on_delete=models.CASCADE, related_name='thread_posts')
+    path = models.CharField(max_length=255, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['parent', '-created_at', '-id'], name='core_forum_page_idx'),
+            models.Index(fields=['thread', 'path'], name='core_forum_thread_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+    @property
+    def depth(self):
+        return max(self.path.count('/') - 1, 0)
+
+    def save(self, *args, **kwargs):
+        creating = self.pk is None
+        if creating and self.parent_id:
+            # Very deep replies are attached to the deepest allowed ancestor.
+            while self.parent.depth >= self.MAX_DEPTH:
+                self.parent = self.parent.parent
+            self.thread_id = self.parent.thread_id or self.parent_id
+        super().save(*args, **kwargs)
+        if creating and not self.path:
+            if self.parent_id:
+                parent_path = self.parent.path or f"{self.parent_id:010d}/"
+                self.path = f"{parent_path}{self.pk:010d}/"
+            else:
+                self.path = f"{self.pk:010d}/"
+            ForumPost.objects.filter(pk=self.pk).update(path=self.path)
     
-class HomePageContent(models.Model):
+class HomePageContent(TracksImageMixin, models.Model):
+    IMAGE_FIELD = 'hero_image'
+
     hero_image = models.ImageField(upload_to='home_images/', blank=True, null=True)
     welcome_title = models.CharField(max_length=200, default='Welcome to Eden Marriage')
     welcome_subtitle = models.TextField(default='Discover the biblical blueprint for a fulfilling marriage.')
 
     def __str__(self):
-        return "Homepage Content"
\ No newline at end of file
+        return "Homepage Content"
+
+class QuizGenerationJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (SUCCEEDED, 'Succeeded'),
+        (FAILED, 'Failed'),
+    ]
+
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name='quiz_jobs')
+    requested_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=3)
+    run_after = models.DateTimeField(default=timezone.now)
+    created_count = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after'], name='core_quizjob_status_run_idx'),
+        ]
+
+    def __str__(self):
+        return f"Quiz job #{self.id} for {self.lesson_id} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in (self.SUCCEEDED, self.FAILED)
+
+
+class QuizCacheEntry(models.Model):
+    """AI quiz replies keyed by a hash of the lesson content, prompt template and model name."""
+    key = models.CharField(max_length=64, unique=True)
+    model_name = models.CharField(max_length=100)
+    response = models.TextField()
+    size_bytes = models.PositiveIntegerField(default=0)
+    hits = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    last_used_at = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f"{self.model_name} {self.key[:12]}"
+
+
+class SearchDocument(models.Model):
+    """
+    One searchable row per lesson, quiz or forum post.
+
+    The full-text index over it is database specific and lives outside the
+    ORM: an FTS5 table kept in sync by triggers on SQLite, a generated
+    tsvector column with a GIN index on Postgres (see migration 0010).
+    """
+    LESSON = 'lesson'
+    QUIZ = 'quiz'
+    POST = 'post'
+    KIND_CHOICES = [(LESSON, 'Lesson'), (QUIZ, 'Quiz'), (POST, 'Forum post')]
+
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    title = models.CharField(max_length=255)
+    body = models.TextField()
+    url = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['kind', 'object_id'], name='core_searchdocument_unique_object'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.object_id}: {self.title}"
+
+
+class ResponsiveImage(models.Model):
+    """Resized WebP/JPEG copies of an uploaded image, built by ``core.images``."""
+    source_name = models.CharField(max_length=255, unique=True)
+    source_hash = models.CharField(max_length=64)
+    width = models.PositiveIntegerField(default=0)
+    height = models.PositiveIntegerField(default=0)
+    # [{"width": 640, "format": "webp", "name": "lesson_images/derivatives/<hash>-640w.webp"}, ...]
+    variants = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.source_name
@@ -0,0 +1,166 @@
+"""
+Synthetic data and per-route query/latency budgets.
+
+Shared by the budget tests in ``core/tests.py`` and ``manage.py bench_views``.
+"""
+import statistics
+import time
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import caching, mentoring, search
+from .models import (
+    ForumPost, Lesson, Mentor, MentorAvailability, MentorshipBooking, Progress, Quiz, QuizGenerationJob,
+)
+
+# url name -> (max queries, max milliseconds). Every named route in core.urls needs an entry.
+VIEW_BUDGETS = {
+    'register': (2, 250),
+    'login': (2, 250),
+    'logout': (4, 250),
+    'password_change': (2, 250),
+    'password_change_done': (2, 250),
+    'home': (4, 500),
+    'dashboard': (6, 500),
+    'course': (3, 500),
+    'lesson_detail': (5, 250),
+    'quiz_page': (4, 250),
+    'mentorship_booking': (3, 250),
+    'mentor_availability': (3, 250),
+    'forum': (4, 250),
+    'search': (3, 250),
+    'contact': (2, 250),
+    'support': (2, 250),
+    'take_quiz': (3, 250),
+    'generate_quiz_ai': (6, 250),
+    'generate_quiz_ai_stream': (3, 250),
+    'quiz_job_status': (3, 250),
+}
+
+# Routes that only accept POST.
+POST_ROUTES = {'logout'}
+# Query strings sent with GET routes.
+ROUTE_PARAMS = {'search': {'q': 'patient kind'}}
+# Routes that answer the (WSGI) test client with something other than a success.
+EXPECTED_STATUS = {'generate_quiz_ai_stream': 404}  # streams only under ASGI
+
+SCALES = (10, 1000, 100_000)
+
+
+def core_routes():
+    from . import urls
+    return [p for p in urls.urlpatterns if isinstance(p, URLPattern) and p.name]
+
+
+def seed(scale, users=20):
+    """
+    Fill the database with ``scale`` rows per high-volume table.
+
+    Forum posts, quizzes and bookings grow linearly with ``scale``; the lesson
+    catalogue grows more slowly (a course has tens to hundreds of lessons, not
+    millions). Returns the objects the routes need as URL arguments.
+    """
+    password = make_password('bench-password')
+    User.objects.bulk_create(
+        [User(username=f'bench-user-{i}', password=password) for i in range(users)],
+        batch_size=500,
+    )
+    user_list = list(User.objects.filter(username__startswith='bench-user-').order_by('id'))
+    user = user_list[0]
+
+    lesson_count = max(3, min(scale // 50, 200))
+    content = ' '.join(['Love is patient and kind.'] * 40)
+    Lesson.objects.bulk_create(
+        [Lesson(title=f'Lesson {i}', content=content, excerpt=Lesson.make_excerpt(content))
+         for i in range(lesson_count)],
+        batch_size=500,
+    )
+    lessons = list(Lesson.objects.order_by('id').only('id'))
+
+    Quiz.objects.bulk_create(
+        [Quiz(lesson=lessons[i % lesson_count], question=f'Question {i}?', option1='A',
+              option2='B', option3='C', option4='D', correct_index=1)
+         for i in range(scale)],
+        batch_size=2000,
+    )
+    Progress.objects.bulk_create(
+        [Progress(user=u, lesson=lesson, completed=(u.id + lesson.id) % 3 == 0, score=(u.id * lesson.id) % 101)
+         for u in user_list for lesson in lessons[: max(1, min(lesson_count, scale // users))]],
+        batch_size=2000,
+    )
+    now = timezone.now()
+    ForumPost.objects.bulk_create(
+        [ForumPost(user=user_list[i % users], title=f'Post {i}', content='How do we pray together?')
+         for i in range(scale)],
+        batch_size=2000,
+    )
+    for root in ForumPost.objects.filter(parent__isnull=True).order_by('-id')[:5]:
+        reply = ForumPost.objects.create(user=user, title=f'Re: {root.title}', content='Amen.', parent=root)
+        ForumPost.objects.create(user=user, title=f'Re: {root.title}', content='Agreed.', parent=reply)
+    MentorshipBooking.objects.bulk_create(
+        [MentorshipBooking(user=user_list[i % users], mentor='Pastor James', date=now + timedelta(hours=i))
+         for i in range(scale)],
+        batch_size=2000,
+    )
+    # Saving availability generates the mentor's slots.
+    mentor, created = Mentor.objects.get_or_create(name='Bench Mentor')
+    if created:
+        for weekday in range(7):
+            MentorAvailability.objects.create(mentor=mentor, weekday=weekday, start_time='08:00', end_time='20:00')
+    # The slots are fresh, as the quiz worker keeps them; page views should not pay for a top-up.
+    mentoring.top_up_slots()
+    # bulk_create sends no signals, so refresh what the signal handlers normally maintain.
+    search.rebuild_index()
+    caching.bump(caching.LESSONS)
+    job = QuizGenerationJob.objects.create(lesson=lessons[0], requested_by=user)
+    return {'user': user, 'lesson': lessons[0], 'job': job}
+
+
+def route_kwargs(pattern, fixtures):
+    values = {'id': fixtures['lesson'].id, 'lesson_id': fixtures['lesson'].id, 'job_id': fixtures['job'].id}
+    return {name: values[name] for name in pattern.pattern.converters}
+
+
+def status_ok(route, status):
+    expected = EXPECTED_STATUS.get(route)
+    return status == expected if expected else status < 400
+
+
+def measure_routes(client, fixtures, repeat=1):
+    """
+    Request every named route in core.urls as a logged-in user.
+
+    Returns one dict per route with the status code, query count and median
+    wall time, next to the budget it is checked against.
+    """
+    results = []
+    for pattern in core_routes():
+        path = reverse(pattern.name, kwargs=route_kwargs(pattern, fixtures))
+        method = 'post' if pattern.name in POST_ROUTES else 'get'
+        timings = []
+        for _ in range(repeat):
+            client.force_login(fixtures['user'])
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = getattr(client, method)(path, ROUTE_PARAMS.get(pattern.name))
+                timings.append((time.perf_counter() - started) * 1000)
+        max_queries, max_ms = VIEW_BUDGETS.get(pattern.name, (0, 0))
+        elapsed = statistics.median(timings)
+        results.append({
+            'route': pattern.name,
+            'method': method.upper(),
+            'path': path,
+            'status': response.status_code,
+            'queries': len(queries),
+            'query_budget': max_queries,
+            'ms': round(elapsed, 2),
+            'ms_budget': max_ms,
+            'ok': status_ok(pattern.name, response.status_code) and len(queries) <= max_queries and elapsed <= max_ms,
+        })
+    return results
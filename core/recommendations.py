@@ -0,0 +1,204 @@
+"""
+Content-based lesson similarity for the dashboard's recommended lesson.
+
+Each lesson becomes a TF-IDF vector over its title, content and quiz
+questions, held as a sparse CSR matrix in NumPy arrays with rows scaled to
+unit length, so a dot product is the cosine similarity. Scores for one
+lesson against all others come from the inverted (column) view of the same
+matrix: only lessons sharing a term are touched, never a dense
+lessons x vocabulary array. The TOP_K best matches per lesson are stored in
+``LessonSimilarity``; ``UserProgressSummary.refresh_for`` then ranks
+uncompleted lessons against a user's weakest ones with a single indexed
+query. Once rows change, the stored recommendation of every user whose
+low-scoring lessons they belong to is refreshed too.
+
+``manage.py build_lesson_similarity`` rebuilds the whole table. Saving a
+lesson, or adding, editing or deleting one of its quizzes, only flags it
+(``Lesson.similarity_stale_at``, see ``core/signals.py``) so that web
+requests never vectorize anything. Each pass of ``run_quiz_worker`` (or
+``build_lesson_similarity --stale``) then calls ``update_stale``, which
+builds the index once for every lesson flagged since the last pass and
+rewrites only the rows they can change: their own, the lessons that list
+them, and the lessons they now beat the k-th entry of. Term weights are
+recomputed for every update, but rows left alone keep the weights they were
+built with until the next full rebuild.
+"""
+import math
+import re
+from collections import Counter, namedtuple
+
+import numpy as np
+from django.db import transaction
+from django.db.models import Count, Min
+from django.utils import timezone
+
+from .models import Lesson, LessonSimilarity, Quiz, UserProgressSummary
+
+TOP_K = 10
+# Terms in more than this share of lessons say nothing about any one of them.
+MAX_DOCUMENT_FREQUENCY = 0.5
+TOKEN = re.compile(r"[a-z][a-z']+")
+STOP_WORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being both but by can could
+did do does doing down during each for from further had has have having he her here hers him his how i if
+in into is it its just me more most my no nor not now of off on once only or other our ours out over own
+same she should so some such than that the their theirs them then there these they this those through to
+too under until up very was we were what when where which while who whom why will with would you your yours
+""".split())
+
+SimilarityIndex = namedtuple('SimilarityIndex', 'lesson_ids indptr indices data col_ptr col_rows col_data')
+
+
+def tokenize(text):
+    return [token for token in TOKEN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+def lesson_texts(chunk_size=2000):
+    """Yield ``(lesson_id, text)`` for every lesson, with its quiz questions appended."""
+    questions = Quiz.objects.order_by('lesson_id', 'id').values_list('lesson_id', 'question').iterator(
+        chunk_size=chunk_size)
+    pending = next(questions, None)
+    lessons = Lesson.objects.order_by('id').values_list('id', 'title', 'content')
+    for lesson_id, title, content in lessons.iterator(chunk_size=chunk_size):
+        parts = [title, content]
+        while pending is not None and pending[0] <= lesson_id:
+            if pending[0] == lesson_id:
+                parts.append(pending[1])
+            pending = next(questions, None)
+        yield lesson_id, '\n'.join(parts)
+
+
+def build_index():
+    """Vectorize every lesson. Returns a SimilarityIndex (CSR rows plus the CSC view for lookups)."""
+    lesson_ids, counts, vocabulary, document_frequency = [], [], {}, Counter()
+    for lesson_id, text in lesson_texts():
+        terms = Counter(vocabulary.setdefault(token, len(vocabulary)) for token in tokenize(text))
+        document_frequency.update(terms.keys())
+        lesson_ids.append(lesson_id)
+        counts.append(terms)
+
+    n = len(lesson_ids)
+    idf = np.zeros(len(vocabulary))
+    for term, frequency in document_frequency.items():
+        if n < 3 or frequency <= MAX_DOCUMENT_FREQUENCY * n:
+            idf[term] = math.log((1 + n) / (1 + frequency)) + 1
+
+    indptr, indices, data = [0], [], []
+    for terms in counts:
+        ids = np.fromiter(terms.keys(), dtype=np.int64, count=len(terms))
+        weights = np.fromiter(terms.values(), dtype=np.float64, count=len(terms))
+        weights = (1 + np.log(weights)) * idf[ids]  # sublinear tf, so one repeated word cannot dominate
+        keep = weights > 0
+        ids, weights = ids[keep], weights[keep]
+        norm = np.sqrt(weights @ weights)
+        indices.append(ids)
+        data.append(weights / norm if norm else weights)
+        indptr.append(indptr[-1] + len(ids))
+    indices = np.concatenate(indices) if indices else np.empty(0, dtype=np.int64)
+    data = np.concatenate(data) if data else np.empty(0)
+    indptr = np.array(indptr, dtype=np.int64)
+
+    # Column (term -> lessons) view: sort the non-zeros by term.
+    rows = np.repeat(np.arange(n), np.diff(indptr))
+    order = np.argsort(indices, kind='stable')
+    col_ptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(indices, minlength=len(vocabulary)), out=col_ptr[1:])
+    return SimilarityIndex(np.array(lesson_ids, dtype=np.int64), indptr, indices, data,
+                           col_ptr, rows[order], data[order])
+
+
+def scores_for(index, row):
+    """Cosine similarity of lesson ``row`` (a position in the index) to every lesson."""
+    start, end = index.indptr[row], index.indptr[row + 1]
+    terms, weights = index.indices[start:end], index.data[start:end]
+    starts = index.col_ptr[terms]
+    lengths = index.col_ptr[terms + 1] - starts
+    if not lengths.sum():
+        return np.zeros(len(index.lesson_ids))
+    # Positions of every posting of every term in the row, gathered in one go.
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(lengths.sum())
+    return np.bincount(index.col_rows[offsets], weights=index.col_data[offsets] * np.repeat(weights, lengths),
+                       minlength=len(index.lesson_ids))
+
+
+def top_similar(index, row, k=TOP_K):
+    scores = scores_for(index, row)
+    scores[row] = 0
+    candidates = np.flatnonzero(scores > 0)
+    if len(candidates) > k:
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    candidates = candidates[np.argsort(-scores[candidates], kind='stable')]
+    return [(int(index.lesson_ids[c]), float(scores[c])) for c in candidates]
+
+
+def rows_for(index, positions, k=TOP_K):
+    return [
+        LessonSimilarity(lesson_id=int(index.lesson_ids[row]), similar_id=similar_id, score=score)
+        for row in positions
+        for similar_id, score in top_similar(index, row, k)
+    ]
+
+
+def rebuild(k=TOP_K, batch_size=2000):
+    """Recompute the whole LessonSimilarity table. Returns the number of lessons indexed."""
+    started = timezone.now()
+    index = build_index()
+    with transaction.atomic():
+        LessonSimilarity.objects.all().delete()
+        for start in range(0, len(index.lesson_ids), batch_size):
+            positions = range(start, min(start + batch_size, len(index.lesson_ids)))
+            LessonSimilarity.objects.bulk_create(rows_for(index, positions, k), batch_size=batch_size)
+        Lesson.objects.filter(similarity_stale_at__lte=started).update(similarity_stale_at=None)
+    UserProgressSummary.refresh_many(UserProgressSummary.needing_recommendation())
+    return len(index.lesson_ids)
+
+
+def affected_by(index, positions, lesson_id, k=TOP_K):
+    """The lessons whose top-k rows a change to ``lesson_id`` can alter, itself included."""
+    affected = {lesson_id}
+    affected.update(LessonSimilarity.objects.filter(similar_id=lesson_id).values_list('lesson_id', flat=True))
+    if lesson_id not in positions:
+        return affected
+    scores = scores_for(index, positions[lesson_id])
+    scores[positions[lesson_id]] = 0
+    related = {int(index.lesson_ids[row]): scores[row] for row in np.flatnonzero(scores > 0)}
+    current = {
+        row['lesson_id']: row
+        for row in LessonSimilarity.objects.filter(lesson_id__in=related).values('lesson_id')
+        .annotate(count=Count('id'), lowest=Min('score'))
+    }
+    for other, score in related.items():
+        row = current.get(other)
+        if row is None or row['count'] < k or score > row['lowest']:
+            affected.add(other)
+    return affected
+
+
+def update_lessons(lesson_ids, k=TOP_K):
+    """Refresh the rows changes to ``lesson_ids`` can affect, from one index. Returns how many were rewritten."""
+    index = build_index()
+    positions = {int(lesson): row for row, lesson in enumerate(index.lesson_ids)}
+    affected = set()
+    for lesson_id in lesson_ids:
+        affected |= affected_by(index, positions, lesson_id, k)
+    with transaction.atomic():
+        LessonSimilarity.objects.filter(lesson_id__in=affected).delete()
+        LessonSimilarity.objects.bulk_create(
+            rows_for(index, [positions[lesson] for lesson in affected if lesson in positions], k)
+        )
+    # Only users with a low score on a rewritten lesson rank candidates by its rows.
+    UserProgressSummary.refresh_many(UserProgressSummary.needing_recommendation().filter(
+        user__progress__lesson_id__in=affected, user__progress__score__lt=70))
+    return len(affected)
+
+
+def update_stale(k=TOP_K):
+    """Update every lesson flagged by ``Lesson.mark_similarity_stale``. Returns how many were flagged."""
+    started = timezone.now()
+    stale = list(Lesson.objects.filter(similarity_stale_at__isnull=False).values_list('id', flat=True))
+    if not stale:
+        return 0
+    update_lessons(stale, k)
+    # Lessons flagged again while the index was being built stay flagged for the next pass.
+    Lesson.objects.filter(id__in=stale, similarity_stale_at__lte=started).update(similarity_stale_at=None)
+    return len(stale)
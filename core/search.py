@@ -0,0 +1,157 @@
+"""
+Full-text search over lessons, quizzes and forum posts.
+
+Rows live in ``SearchDocument`` and are kept current by the signal handlers
+in ``core/signals.py``. Querying goes straight to the database's own
+inverted index (created by migration 0010): FTS5 with bm25 ranking on
+SQLite, ``tsvector``/GIN with ``ts_rank`` on Postgres. Other backends fall
+back to a ``LIKE`` scan.
+"""
+import re
+from collections import namedtuple
+
+from django.db import connection
+from django.db.models import Q
+from django.urls import reverse
+from django.utils.html import escape
+from django.utils.safestring import mark_safe
+
+from .models import ForumPost, Lesson, Quiz, SearchDocument
+from .pagination import encode_cursor
+
+SearchHit = namedtuple('SearchHit', 'kind object_id title url snippet rank')
+
+FTS_TABLE = 'core_searchdocument_fts'
+# Control characters that cannot appear in user text mark the matched terms in
+# snippets; they are turned into <mark> only after the text has been escaped.
+MARK_START, MARK_END = '\x02', '\x03'
+MAX_TERMS = 10
+KINDS = {Lesson: SearchDocument.LESSON, Quiz: SearchDocument.QUIZ, ForumPost: SearchDocument.POST}
+
+
+def document_for(instance):
+    """Build the (unsaved) SearchDocument for a Lesson, Quiz or ForumPost."""
+    if isinstance(instance, Lesson):
+        return SearchDocument(kind=SearchDocument.LESSON, object_id=instance.id, title=instance.title,
+                              body=instance.content, url=reverse('lesson_detail', args=[instance.id]))
+    if isinstance(instance, Quiz):
+        return SearchDocument(kind=SearchDocument.QUIZ, object_id=instance.id, title=instance.question[:255],
+                              body=' '.join(instance.options_list),
+                              url=reverse('lesson_detail', args=[instance.lesson_id]))
+    if isinstance(instance, ForumPost):
+        return SearchDocument(kind=SearchDocument.POST, object_id=instance.id, title=instance.title,
+                              body=instance.content,
+                              url=forum_url(instance))
+    return None
+
+
+def forum_url(post):
+    """Link to the forum page whose first thread is ``post``'s thread."""
+    root = post.thread if post.thread_id else post
+    # keyset_page starts strictly after the cursor, so point just past the root.
+    return f"{reverse('forum')}?before={encode_cursor(root.created_at, root.id + 1)}#post-{root.id}"
+
+
+def save_documents(documents):
+    SearchDocument.objects.bulk_create(
+        documents,
+        update_conflicts=True,
+        unique_fields=['kind', 'object_id'],
+        update_fields=['title', 'body', 'url', 'updated_at'],
+    )
+
+
+def index_object(instance):
+    document = document_for(instance)
+    if document is not None:
+        save_documents([document])
+
+
+def remove_object(instance):
+    # Not via document_for: a deleted reply's thread may already be gone.
+    kind = KINDS.get(type(instance))
+    if kind is not None:
+        SearchDocument.objects.filter(kind=kind, object_id=instance.id).delete()
+
+
+def rebuild_index(chunk_size=2000):
+    """Re-create every SearchDocument from scratch in chunks. Returns the number indexed."""
+    SearchDocument.objects.all().delete()
+    total = 0
+    for queryset in (Lesson.objects.all(), Quiz.objects.all(), ForumPost.objects.select_related('thread')):
+        batch = []
+        for instance in queryset.order_by('id').iterator(chunk_size=chunk_size):
+            batch.append(document_for(instance))
+            if len(batch) >= chunk_size:
+                save_documents(batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            save_documents(batch)
+            total += len(batch)
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')")
+    return total
+
+
+def search_terms(query):
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def highlight(text):
+    return mark_safe(escape(text).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>'))
+
+
+def search(query, limit=20):
+    """Ranked hits for ``query``, best first."""
+    terms = search_terms(query)
+    if not terms:
+        return []
+    if connection.vendor == 'sqlite':
+        rows = _search_sqlite(terms, limit)
+    elif connection.vendor == 'postgresql':
+        rows = _search_postgres(' '.join(terms), limit)
+    else:
+        rows = _search_like(terms, limit)
+    return [SearchHit(kind, object_id, title, url, highlight(snippet or ''), rank)
+            for kind, object_id, title, url, snippet, rank in rows]
+
+
+def _search_sqlite(terms, limit):
+    # Every term must match; a trailing * lets "pray" find "prayer".
+    match = ' '.join(f'"{term}"*' for term in terms)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT d.kind, d.object_id, d.title, d.url, "
+            f"snippet({FTS_TABLE}, 1, %s, %s, '…', 16), bm25({FTS_TABLE}, 10.0, 1.0) AS rank "
+            f"FROM {FTS_TABLE} JOIN core_searchdocument d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s ORDER BY rank LIMIT %s",
+            [MARK_START, MARK_END, match, limit],
+        )
+        return cursor.fetchall()
+
+
+def _search_postgres(query, limit):
+    # Headlines are expensive, so they are only built for the rows that made the cut.
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "WITH q AS (SELECT websearch_to_tsquery('english', %s) AS query), "
+            "hits AS (SELECT d.kind, d.object_id, d.title, d.url, d.body, "
+            "ts_rank(d.search_vector, q.query) AS rank FROM core_searchdocument d, q "
+            "WHERE d.search_vector @@ q.query ORDER BY rank DESC LIMIT %s) "
+            "SELECT hits.kind, hits.object_id, hits.title, hits.url, "
+            "ts_headline('english', hits.body, q.query, %s), hits.rank FROM hits, q ORDER BY hits.rank DESC",
+            [query, limit, f'StartSel={MARK_START}, StopSel={MARK_END}, MaxWords=30, MinWords=10'],
+        )
+        return cursor.fetchall()
+
+
+def _search_like(terms, limit):
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(body__icontains=term)
+    return [
+        (d.kind, d.object_id, d.title, d.url, d.body[:200], 0)
+        for d in SearchDocument.objects.filter(condition).order_by('-updated_at')[:limit]
+    ]
@@ -0,0 +1,72 @@
+"""
+Cheaper sessions and authentication for page views.
+
+``SESSION_STORE`` in settings picks the session engine: ``cached_db`` (the
+default with a shared ``CACHE_URL``) reads sessions from the cache and only
+falls back to the ``django_session`` table on a miss, ``signed_cookies``
+keeps them out of the database altogether, and ``db`` is Django's default
+(and ours when each worker has its own cache). Flash messages live in a
+signed cookie, so showing "You scored 80%" never writes the session.
+
+``CachedUserBackend`` (``AUTH_USER_CACHE``, on with a shared cache) is the
+read-only fast path for ``request.user``: the user row is kept in the cache
+and dropped whenever it is saved or deleted (see ``core/signals.py``), so an
+authenticated page view normally costs no session or user query at all.
+Bulk ``update()``s bypass those signals, and ``AUTH_USER_CACHE_TIMEOUT``
+bounds how long they can go unseen.
+
+``manage.py clear_expired_sessions`` deletes expired rows in small batches,
+for a cron job; Django's own ``clearsessions`` does it in one statement that
+locks the table for as long as it takes.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.utils import timezone
+
+
+def user_cache_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def forget_user(user_id):
+    cache.delete(user_cache_key(user_id))
+
+
+class CachedUserBackend(ModelBackend):
+    """ModelBackend whose ``get_user`` (run on every authenticated request) is served from the cache."""
+
+    def get_user(self, user_id):
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+    async def aget_user(self, user_id):
+        # request.auser() in the async views; ModelBackend.aget_user would bypass get_user.
+        key = user_cache_key(user_id)
+        user = await cache.aget(key)
+        if user is None:
+            user = await super().aget_user(user_id)
+            if user is not None:
+                await cache.aset(key, user, settings.AUTH_USER_CACHE_TIMEOUT)
+        return user
+
+
+def clear_expired(batch_size=1000, pause=0.0):
+    """Delete expired rows from the session table ``batch_size`` at a time. Returns how many went."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        keys = list(Session.objects.filter(expire_date__lt=now).values_list('session_key', flat=True)[:batch_size])
+        if not keys:
+            return deleted
+        deleted += Session.objects.filter(session_key__in=keys).delete()[0]
+        if pause:
+            time.sleep(pause)  # let the writers the batch was blocking through
@@ -0,0 +1,102 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import caching, images, mentoring, metrics, search, sessions
+from .models import (
+    ForumPost, HomePageContent, Lesson, LessonSimilarity, Mentor, MentorAvailability, Progress, Quiz,
+    UserProgressSummary,
+)
+
+
+@receiver(post_save, sender=Progress)
+def refresh_progress_summary(sender, instance, **kwargs):
+    UserProgressSummary.refresh_for(instance.user_id)
+
+
+@receiver(post_delete, sender=Progress)
+def refresh_progress_summary_after_delete(sender, instance, **kwargs):
+    UserProgressSummary.refresh_for(instance.user_id, create=False)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def refresh_recommendations_for_lesson(sender, instance, created=None, raw=False, **kwargs):
+    # A new lesson can suit users left without a recommendation; a deleted one must not stay recommended.
+    if raw or created is False:
+        return
+    summaries = Q(next_lesson__isnull=True)
+    if created is None:
+        # Deleting the lesson's Progress rows may have re-pointed summaries at it after SET_NULL ran.
+        summaries |= Q(next_lesson_id=instance.pk)
+    UserProgressSummary.refresh_many(UserProgressSummary.needing_recommendation().filter(summaries))
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=Quiz)
+@receiver(post_save, sender=ForumPost)
+def index_for_search(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_object(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Quiz)
+@receiver(post_delete, sender=ForumPost)
+def remove_from_search(sender, instance, **kwargs):
+    search.remove_object(instance)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver(post_save, sender=HomePageContent)
+def build_image_derivatives(sender, instance, raw=False, **kwargs):
+    field = getattr(instance, instance.IMAGE_FIELD)
+    # Hashing the source is the expensive part, so skip it for saves that kept an image already built.
+    if field and not raw and (instance.image_changed() or not images.variants_for(field.name)):
+        images.schedule_derivatives(field.name)
+
+
+@receiver(post_save, sender=Lesson)
+@receiver([post_save, post_delete], sender=Quiz)
+def mark_lesson_similarity_stale(sender, instance, raw=False, **kwargs):
+    # Only flagged here; run_quiz_worker re-vectorizes once for every lesson flagged since its last pass.
+    if not raw:
+        Lesson.mark_similarity_stale([instance.id if sender is Lesson else instance.lesson_id])
+
+
+@receiver(pre_delete, sender=Lesson)
+def mark_listing_lessons_stale(sender, instance, **kwargs):
+    # Their rows pointing at this lesson are about to cascade away, leaving them short of TOP_K.
+    Lesson.mark_similarity_stale(LessonSimilarity.objects.filter(similar=instance).values('lesson_id'))
+
+
+@receiver([post_save, post_delete], sender=Lesson)
+@receiver([post_save, post_delete], sender=Quiz)
+def invalidate_lesson_caches(sender, **kwargs):
+    caching.bump(caching.LESSONS)
+
+
+@receiver([post_save, post_delete], sender=HomePageContent)
+def invalidate_homepage_caches(sender, **kwargs):
+    caching.bump(caching.HOMEPAGE)
+
+
+@receiver([post_save, post_delete], sender=User)
+def forget_cached_user(sender, instance, **kwargs):
+    sessions.forget_user(instance.pk)
+
+
+@receiver(post_save, sender=Mentor)
+@receiver(post_save, sender=MentorAvailability)
+@receiver(post_delete, sender=MentorAvailability)
+def regenerate_mentor_slots(sender, instance, raw=False, origin=None, **kwargs):
+    if raw or isinstance(origin, Mentor):
+        # Fixture loads and cascades from deleting the mentor itself.
+        return
+    mentor_id = instance.id if sender is Mentor else instance.mentor_id
+    mentoring.generate_slots(mentors=Mentor.objects.filter(id=mentor_id, is_active=True))
+
+
+connection_created.connect(metrics.install_query_recorder)
@@ -0,0 +1,46 @@
+"""
+Measure one cold start: ``python -m core.startup_probe /login/``.
+
+Loads the WSGI application in this (fresh) interpreter, serves a single GET
+through it and prints one JSON line: the time to load the app, the time to
+answer the first request, and which of the heavy optional packages ended up
+imported. ``manage.py startup_profile`` runs it in new processes.
+"""
+import io
+import json
+import os
+import sys
+import time
+
+# Packages that should only be imported by the code paths that need them.
+HEAVY_MODULES = ('openai', 'httpx', 'pydantic', 'numpy', 'PIL.Image', 'psycopg')
+
+
+def main(path):
+    started = time.perf_counter()
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'eden_marriage.settings')
+    from django.core.wsgi import get_wsgi_application
+
+    application = get_wsgi_application()
+    loaded = time.perf_counter()
+    statuses = []
+    environ = {
+        'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '80', 'HTTP_HOST': 'localhost', 'wsgi.input': io.BytesIO(), 'wsgi.url_scheme': 'http',
+    }
+    response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    size = sum(len(chunk) for chunk in response)
+    getattr(response, 'close', lambda: None)()
+    responded = time.perf_counter()
+    print(json.dumps({
+        'load_ms': round((loaded - started) * 1000, 1),
+        'first_response_ms': round((responded - loaded) * 1000, 1),
+        'status': int(statuses[0].split()[0]) if statuses else None,
+        'bytes': size,
+        'modules': len(sys.modules),
+        'heavy_modules': [name for name in HEAVY_MODULES if name in sys.modules],
+    }))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else '/login/')
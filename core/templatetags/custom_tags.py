@@ -1,7 +1,48 @@
 from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from core import images
 
 register = template.Library()
 
 @register.filter
 def dictkey(dictionary, key):
-    return dictionary.get(key)
\ No newline at end of file
+    return dictionary.get(key)
+
+
+@register.simple_tag
+def responsive_image(image, alt='', css_class='', sizes='100vw'):
+    """
+    Usage: {% responsive_image lesson.image alt=lesson.title css_class="card-img-top" sizes="33vw" %}
+    Emits a <picture> with WebP and JPEG srcsets, or a plain <img> until derivatives exist.
+    """
+    if not image:
+        return ''
+    variants = images.variants_for(image.name)
+    if not variants:
+        return format_html('<img src="{}" class="{}" alt="{}" loading="lazy">', image.url, css_class, alt)
+
+    def srcset(fmt):
+        return ', '.join(
+            f"{default_storage.url(v['name'])} {v['width']}w" for v in variants if v['format'] == fmt
+        )
+
+    fallback = max((v for v in variants if v['format'] == 'jpeg'), key=lambda v: v['width'])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy"></picture>',
+        srcset('webp'), sizes, default_storage.url(fallback['name']), srcset('jpeg'), sizes, css_class, alt,
+    )
+
+
+@register.simple_tag
+def responsive_url(image, width=1280):
+    """URL of the smallest JPEG derivative at least ``width`` wide (for CSS backgrounds)."""
+    if not image:
+        return ''
+    jpegs = sorted((v for v in images.variants_for(image.name) if v['format'] == 'jpeg'), key=lambda v: v['width'])
+    for variant in jpegs:
+        if variant['width'] >= width:
+            return default_storage.url(variant['name'])
+    return default_storage.url(jpegs[-1]['name']) if jpegs else image.url
@@ -1,3 +1,1354 @@
-from django.test import TestCase
+import asyncio
+import importlib
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import timedelta
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.utils import ConnectionHandler
+from django.template import Context, Template
+from django.test import LiveServerTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+import numpy as np
+from PIL import Image
+
+from eden_marriage.database import database_config
+
+from . import (
+    ai, analytics, caching, course_archive, fake_llm, images, jobs, loadtest, media, mentoring, metrics, perf,
+    recommendations, search, sessions,
+)
+from .models import (
+    AnswerRecord, ForumPost, HomePageContent, Lesson, LessonSimilarity, Mentor, MentorAvailability, MentorshipBooking, MentorSlot,
+    Progress, Quiz, QuizAttempt, QuizCacheEntry, QuizGenerationJob, QuizItemStats, ResponsiveImage,
+    SearchDocument, UserProgressSummary,
+)
 
 # Create your tests here.
+
+QUIZ_REPLY = json.dumps({"questions": [
+    {"question": f"Question {i}?", "options": ["A", "B", "C", "D"], "correct_answer": "B"}
+    for i in range(3)
+]})
+
+
+class FakeOpenAI:
+    """Stands in for ``openai.OpenAI``; replies with canned text or raises queued errors."""
+
+    def __init__(self, reply=QUIZ_REPLY, errors=(), usage=None):
+        self.reply = reply
+        self.errors = list(errors)
+        self.usage = usage
+        self.calls = []
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    def _create(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.errors:
+            raise self.errors.pop(0)
+        message = SimpleNamespace(content=self.reply)
+        return SimpleNamespace(choices=[SimpleNamespace(message=message)], usage=self.usage)
+
+
+class QuizGenerationJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='pw')
+        self.lesson = Lesson.objects.create(title='Conflict', content='Speak gently.')
+
+    def test_view_enqueues_job_without_calling_api(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('generate_quiz_ai', args=[self.lesson.id]))
+        self.assertRedirects(response, reverse('lesson_detail', args=[self.lesson.id]))
+        job = QuizGenerationJob.objects.get()
+        self.assertEqual(job.status, QuizGenerationJob.PENDING)
+        self.assertFalse(Quiz.objects.exists())
+
+        # A second click reuses the outstanding job.
+        self.client.get(reverse('generate_quiz_ai', args=[self.lesson.id]))
+        self.assertEqual(QuizGenerationJob.objects.count(), 1)
+
+        detail = self.client.get(reverse('lesson_detail', args=[self.lesson.id]))
+        self.assertContains(detail, reverse('quiz_job_status', args=[self.lesson.id, job.id]))
+
+        status = self.client.get(reverse('quiz_job_status', args=[self.lesson.id, job.id])).json()
+        self.assertEqual(status['status'], 'pending')
+        self.assertFalse(status['finished'])
+
+    def test_worker_creates_quizzes(self):
+        job = jobs.enqueue_quiz_generation(self.lesson)
+        fake = FakeOpenAI()
+        self.assertEqual(jobs.run_pending_jobs(api_client=fake), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, QuizGenerationJob.SUCCEEDED)
+        self.assertEqual(job.created_count, 3)
+        self.assertEqual(self.lesson.quiz_set.count(), 3)
+        self.assertEqual(len(fake.calls), 1)
+
+    def test_failed_job_retries_with_backoff_then_gives_up(self):
+        job = jobs.enqueue_quiz_generation(self.lesson)
+        fake = FakeOpenAI(errors=[RuntimeError('timeout')] * 3)
+
+        with self.assertLogs('core.jobs', 'WARNING'):
+            jobs.run_pending_jobs(api_client=fake)
+        job.refresh_from_db()
+        self.assertEqual(job.status, QuizGenerationJob.PENDING)
+        self.assertEqual(job.attempts, 1)
+        self.assertGreater(job.run_after, timezone.now())
+        # Not due yet, so the worker leaves it alone.
+        self.assertEqual(jobs.run_pending_jobs(api_client=fake), 0)
+
+        with self.assertLogs('core.jobs', 'WARNING') as logs:
+            for _ in range(2):
+                QuizGenerationJob.objects.filter(id=job.id).update(run_after=timezone.now())
+                jobs.run_pending_jobs(api_client=fake)
+        self.assertEqual(logs.records[-1].levelname, 'ERROR')
+        job.refresh_from_db()
+        self.assertEqual(job.status, QuizGenerationJob.FAILED)
+        self.assertEqual(job.attempts, 3)
+        self.assertIn('timeout', job.last_error)
+        self.assertTrue(self.lesson.quiz_set.filter(question__startswith='Sample question').exists())
+
+    def test_claim_is_exclusive(self):
+        jobs.enqueue_quiz_generation(self.lesson)
+        self.assertIsNotNone(jobs.claim_next_job())
+        self.assertIsNone(jobs.claim_next_job())
+
+
+class StartupTests(TestCase):
+    def test_ai_client_is_created_on_first_use_and_shared(self):
+        with override_settings(OPENAI_API_KEY='', OPENAI_BASE_URL=None):
+            with self.assertRaises(ImproperlyConfigured):
+                ai.get_client()
+            self.assertEqual(ai.make_client('http://127.0.0.1:9/v1').api_key, 'unused')
+        with override_settings(OPENAI_API_KEY='', OPENAI_BASE_URL='http://127.0.0.1:9/v1'):
+            self.assertEqual(str(ai.get_client().base_url), 'http://127.0.0.1:9/v1/')
+        with override_settings(OPENAI_API_KEY='test', OPENAI_BASE_URL='http://127.0.0.1:9/v1'):
+            client = ai.get_client()
+            self.assertIs(ai.get_client(), client)
+            self.assertEqual(str(client.base_url), 'http://127.0.0.1:9/v1/')
+
+    def test_cold_start_skips_heavy_imports(self):
+        output = f"{tempfile.mkdtemp()}/startup.json"
+        self.addCleanup(shutil.rmtree, output.rsplit('/', 1)[0])
+        call_command('startup_profile', runs=1, top=0, output=output, stdout=StringIO())
+        with open(output) as f:
+            result = json.load(f)
+        self.assertEqual(result['status'], 200)
+        self.assertEqual(result['heavy_modules'], [])
+
+
+class InlineQuizGenerationTests(TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Listening', content='Listen before you answer.')
+        self.client.force_login(User.objects.create_user('async', password='pw'))
+        self.server = fake_llm.start_in_thread(port=0, latency=0)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.base_url = f"http://127.0.0.1:{self.server.server_address[1]}/v1"
+
+    def test_async_view_calls_model_without_queueing(self):
+        with override_settings(AI_QUIZ_INLINE=True, OPENAI_BASE_URL=self.base_url, OPENAI_API_KEY='test'):
+            response = self.client.get(reverse('generate_quiz_ai', args=[self.lesson.id]))
+        self.assertRedirects(response, reverse('lesson_detail', args=[self.lesson.id]))
+        self.assertEqual(self.lesson.quiz_set.count(), 3)
+        self.assertEqual(self.lesson.quiz_set.first().correct_option, 'Patience')
+        self.assertFalse(QuizGenerationJob.objects.exists())
+        self.assertIsNotNone(ai.get_cached_quiz_list(self.lesson))
+
+    def test_failed_inline_call_falls_back_to_queue(self):
+        with override_settings(AI_QUIZ_INLINE=True), self.assertLogs('core.views', 'WARNING'), \
+                mock.patch.object(ai, 'afetch_quiz_list', side_effect=RuntimeError('model down')):
+            self.client.get(reverse('generate_quiz_ai', args=[self.lesson.id]))
+        self.assertFalse(Quiz.objects.exists())
+        self.assertEqual(QuizGenerationJob.objects.get().status, QuizGenerationJob.PENDING)
+
+
+@override_settings(AI_QUIZ_INLINE=True)
+class QuizStreamTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('streamer', password='pw')
+        self.lesson = Lesson.objects.create(title='Gentleness', content='A gentle answer turns away wrath.')
+
+    def test_parser_yields_each_question_once_it_closes(self):
+        reply = json.dumps({"questions": [
+            {"question": 'Say "sorry" {first}?', "options": ["A", "B", "C", "D]"], "correct_answer": "A"},
+            {"question": "Second\\?", "options": ["A", "B", "C", "D"], "correct_answer": "B"},
+        ]})
+        parser = ai.QuizStreamParser()
+        seen = []
+        for i, char in enumerate(reply):
+            for q in parser.feed(char):
+                seen.append((q["question"], i))
+        self.assertEqual([question for question, _ in seen], ['Say "sorry" {first}?', 'Second\\?'])
+        self.assertLess(seen[0][1], reply.index('Second'))
+        self.assertEqual(ai.QuizStreamParser().feed('[{"question": "Q", "options": []}]'),
+                         [{"question": "Q", "options": []}])
+
+    async def read_events(self, url):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        body = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        events = []
+        for block in body.strip().split('\n\n'):
+            name, data = block.split('\n')
+            events.append((name.removeprefix('event: '), json.loads(data.removeprefix('data: '))))
+        return events
+
+    async def test_stream_saves_and_sends_each_question(self):
+        server = fake_llm.start_in_thread(port=0, latency=0.05)
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        url = reverse('generate_quiz_ai_stream', args=[self.lesson.id])
+        base_url = f"http://127.0.0.1:{server.server_address[1]}/v1"
+        with override_settings(OPENAI_BASE_URL=base_url, OPENAI_API_KEY='test'):
+            events = await self.read_events(url)
+        self.assertEqual([name for name, _ in events], ['quiz', 'quiz', 'quiz', 'done'])
+        self.assertEqual(events[-1][1], {'created': 3})
+        self.assertEqual(await self.lesson.quiz_set.acount(), 3)
+        self.assertEqual(events[0][1]['options'], ['Patience', 'Pride', 'Silence', 'Anger'])
+
+        # The full reply was cached, so a second run needs no model and adds nothing.
+        events = await self.read_events(url)
+        self.assertEqual(events, [('done', {'created': 0})])
+
+    async def test_failed_stream_queues_a_job(self):
+        async def broken(lesson):
+            raise RuntimeError('connection reset')
+            yield
+
+        with mock.patch.object(ai, 'astream_quizzes', broken), self.assertLogs('core.views', 'WARNING'):
+            events = await self.read_events(reverse('generate_quiz_ai_stream', args=[self.lesson.id]))
+        job = await QuizGenerationJob.objects.aget()
+        self.assertEqual(events, [('failed', {'message': 'Quiz generation was interrupted.', 'job_id': job.id})])
+
+    async def test_slow_stream_times_out_and_queues_a_job(self):
+        async def slow(lesson):
+            yield await Quiz.objects.acreate(lesson=lesson, question='First?', option1='A', option2='B',
+                                             option3='C', option4='D')
+            await asyncio.sleep(10)
+            yield None
+
+        with mock.patch.object(ai, 'astream_quizzes', slow), override_settings(AI_QUIZ_INLINE_TIMEOUT=0.2), \
+                self.assertLogs('core.views', 'WARNING') as logs:
+            events = await self.read_events(reverse('generate_quiz_ai_stream', args=[self.lesson.id]))
+        self.assertIn('TimeoutError', logs.output[0])
+        job = await QuizGenerationJob.objects.aget()
+        self.assertEqual([name for name, _ in events], ['quiz', 'failed'])
+        self.assertEqual(events[-1][1]['job_id'], job.id)
+
+    def test_stream_is_only_offered_under_asgi_with_inline_generation(self):
+        self.client.force_login(self.user)
+        url = reverse('generate_quiz_ai_stream', args=[self.lesson.id])
+        self.assertNotContains(self.client.get(reverse('lesson_detail', args=[self.lesson.id])), 'data-stream-url')
+        self.assertEqual(self.client.get(url).status_code, 404)  # WSGI would buffer the whole stream
+
+    @override_settings(AI_QUIZ_INLINE=False)
+    async def test_no_stream_without_inline_generation(self):
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(reverse('generate_quiz_ai_stream', args=[self.lesson.id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class QuizCacheTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('admin', password='pw')
+        self.lesson = Lesson.objects.create(title='Conflict', content='Speak gently.')
+
+    def test_repeat_generation_is_served_from_cache_without_duplicates(self):
+        fake = FakeOpenAI()
+        self.assertEqual(ai.generate_quizzes(self.lesson, api_client=fake), 3)
+        self.assertEqual(ai.generate_quizzes(self.lesson, api_client=fake), 0)
+        self.assertEqual(len(fake.calls), 1)
+        self.assertEqual(self.lesson.quiz_set.count(), 3)
+        self.assertEqual(QuizCacheEntry.objects.get().hits, 1)
+
+        # The view answers a cache hit inline instead of queueing a job.
+        self.client.force_login(self.user)
+        self.client.get(reverse('generate_quiz_ai', args=[self.lesson.id]))
+        self.assertFalse(QuizGenerationJob.objects.exists())
+        self.assertEqual(self.lesson.quiz_set.count(), 3)
+
+    def test_changed_content_misses_cache(self):
+        fake = FakeOpenAI()
+        ai.generate_quizzes(self.lesson, api_client=fake)
+        self.lesson.content = 'Listen first.'
+        self.lesson.save()
+        ai.generate_quizzes(self.lesson, api_client=fake)
+        self.assertEqual(len(fake.calls), 2)
+        self.assertEqual(QuizCacheEntry.objects.count(), 2)
+
+    def test_eviction_drops_least_recently_used(self):
+        fake = FakeOpenAI()
+        ai.generate_quizzes(self.lesson, api_client=fake)
+        other = Lesson.objects.create(title='Money', content='Budget together.')
+        ai.generate_quizzes(other, api_client=fake)
+        ai.get_cached_quiz_list(self.lesson)
+
+        size = QuizCacheEntry.objects.first().size_bytes
+        self.assertEqual(ai.evict_cache(max_bytes=size), 1)
+        self.assertIsNotNone(ai.get_cached_quiz_list(self.lesson))
+        self.assertIsNone(ai.get_cached_quiz_list(other))
+
+
+class GenerateQuizzesCommandTests(TestCase):
+    def test_generates_for_filtered_lessons_and_reports(self):
+        lessons = [Lesson.objects.create(title=f'Lesson {i}', content=f'Body {i}') for i in range(4)]
+        Lesson.objects.create(title='Other', content='Skip me')
+        fake = FakeOpenAI()
+        out = StringIO()
+        call_command('generate_quizzes', title='Lesson', concurrency=3, rate=0, api_client=fake, stdout=out)
+        self.assertEqual(len(fake.calls), 4)
+        self.assertEqual(Quiz.objects.count(), 12)
+        self.assertIn('4 lessons (0 cached, 0 failed), 12 quizzes created', out.getvalue())
+        self.assertIn('p95', out.getvalue())
+
+        # A second run is served from the cache and writes nothing new.
+        out = StringIO()
+        call_command('generate_quizzes', lesson_ids=[lessons[0].id], api_client=fake, stdout=out)
+        self.assertEqual(len(fake.calls), 4)
+        self.assertIn('1 lessons (1 cached, 0 failed), 0 quizzes created', out.getvalue())
+
+    def test_failures_are_reported(self):
+        Lesson.objects.create(title='Broken', content='x')
+        err = StringIO()
+        with self.assertLogs('core.ai', 'WARNING') as logs:
+            call_command('generate_quizzes', rate=0, api_client=FakeOpenAI(reply='nonsense'),
+                         stdout=StringIO(), stderr=err)
+        self.assertIn('Broken: failed', err.getvalue())
+        self.assertIn('JSON decode error', logs.output[0])
+        self.assertFalse(Quiz.objects.exists())
+
+
+class ProgressSummaryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('wife', password='pw')
+        self.lessons = [Lesson.objects.create(title=f'Lesson {i}', content='Body') for i in range(3)]
+        for lesson in self.lessons:
+            Quiz.objects.create(lesson=lesson, question='Q?', option1='A', option2='B',
+                                option3='C', option4='D', correct_index=1)
+        self.client.force_login(self.user)
+
+    def submit(self, lesson, answer):
+        quiz = lesson.quiz_set.get()
+        return self.client.post(reverse('quiz_page', args=[lesson.id]), {f'option_{quiz.id}': answer})
+
+    def test_quiz_submission_updates_summary(self):
+        self.submit(self.lessons[0], '1')
+        summary = UserProgressSummary.objects.get(user=self.user)
+        self.assertEqual((summary.completed_count, summary.lowest_score, summary.next_lesson), (1, 100, None))
+
+        self.submit(self.lessons[1], '2')
+        summary.refresh_from_db()
+        self.assertEqual((summary.completed_count, summary.lowest_score), (1, 0))
+        self.assertEqual(summary.next_lesson, self.lessons[1])
+
+        Progress.objects.filter(lesson=self.lessons[1]).delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.completed_count, summary.lowest_score, summary.next_lesson), (1, 100, None))
+
+        self.user.delete()
+        self.assertFalse(UserProgressSummary.objects.exists())
+
+    def test_adding_or_deleting_lessons_refreshes_the_recommendation(self):
+        self.submit(self.lessons[1], '2')
+        summary = UserProgressSummary.objects.get(user=self.user)
+        self.assertEqual(summary.next_lesson, self.lessons[0])
+
+        self.lessons[0].delete()
+        summary.refresh_from_db()
+        self.assertEqual(summary.next_lesson, self.lessons[1])
+        Progress.objects.filter(user=self.user).update(completed=True)
+        Progress.objects.create(user=self.user, lesson=self.lessons[2], completed=True, score=50)
+        summary.refresh_from_db()
+        self.assertIsNone(summary.next_lesson)
+
+        added = Lesson.objects.create(title='Lesson 3', content='Body')
+        summary.refresh_from_db()
+        self.assertEqual(summary.next_lesson, added)
+
+    def test_dashboard_query_count_is_independent_of_course_size(self):
+        self.submit(self.lessons[0], '2')
+        with CaptureQueriesContext(connection) as small:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['recommended_lesson'], self.lessons[0])
+        self.assertEqual(response.context['total_completed'], 0)
+
+        for i in range(20):
+            lesson = Lesson.objects.create(title=f'Extra {i}', content='Body')
+            Progress.objects.create(user=self.user, lesson=lesson, completed=True, score=90)
+        with CaptureQueriesContext(connection) as large:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['total_completed'], 20)
+        self.assertEqual(len(small), len(large))
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        texts = {
+            'Forgiveness after conflict': 'Forgiveness heals conflict. Offer an apology and rebuild trust.',
+            'Repairing trust': 'After conflict, a sincere apology and patience rebuild trust between spouses.',
+            'Budgeting together': 'Agree on a monthly budget, track spending and build savings together.',
+            'Saving for a home': 'Savings goals, a shared budget and a mortgage plan for your first home.',
+            'Praying as a couple': 'Set aside quiet time each evening to pray and read scripture side by side.',
+        }
+        self.lessons = {title: Lesson.objects.create(title=title, content=content) for title, content in texts.items()}
+        for lesson in self.lessons.values():
+            Quiz.objects.create(lesson=lesson, question=f'What does {lesson.title.lower()} teach?', option1='A',
+                                option2='B', option3='C', option4='D', correct_index=1)
+        self.user = User.objects.create_user('learner', password='pw')
+
+    def test_sparse_scores_match_dense_cosine(self):
+        index = recommendations.build_index()
+        dense = np.zeros((len(index.lesson_ids), index.col_ptr.size - 1))
+        for row in range(len(index.lesson_ids)):
+            start, end = index.indptr[row], index.indptr[row + 1]
+            dense[row, index.indices[start:end]] = index.data[start:end]
+        for row in range(len(index.lesson_ids)):
+            np.testing.assert_allclose(recommendations.scores_for(index, row), dense @ dense[row])
+
+    def test_recommends_the_lesson_closest_to_the_weakest(self):
+        recommendations.rebuild()
+        forgiveness, trust = self.lessons['Forgiveness after conflict'], self.lessons['Repairing trust']
+        self.assertEqual(LessonSimilarity.objects.filter(lesson=forgiveness).order_by('-score').first().similar, trust)
+
+        Progress.objects.create(user=self.user, lesson=self.lessons['Budgeting together'], completed=True, score=90)
+        Progress.objects.create(user=self.user, lesson=forgiveness, score=20)
+        self.assertEqual(UserProgressSummary.objects.get(user=self.user).next_lesson, trust)
+        with self.assertNumQueries(1):
+            best = LessonSimilarity.best_match([self.lessons['Saving for a home'].id], [self.lessons['Budgeting together'].id])
+        self.assertIsNone(best)
+
+    def test_saving_a_lesson_updates_only_related_rows(self):
+        recommendations.rebuild()
+        prayer = self.lessons['Praying as a couple']
+        apology = Lesson.objects.create(title='The art of apology',
+                                        content='A good apology names the hurt and asks forgiveness.')
+        self.assertFalse(LessonSimilarity.objects.filter(lesson=apology).exists())  # saving only flags it
+        self.assertEqual(recommendations.update_stale(), 1)
+        listed = set(LessonSimilarity.objects.filter(similar=apology).values_list('lesson__title', flat=True))
+        self.assertIn('Forgiveness after conflict', listed)
+        self.assertNotIn(prayer.title, listed)
+        self.assertTrue(LessonSimilarity.objects.filter(lesson=apology).exists())
+
+        apology.title, apology.content = 'Evening devotions', 'Quiet time to pray and read scripture each evening.'
+        apology.save()
+        call_command('build_lesson_similarity', stale=True, stdout=StringIO())
+        self.assertEqual(LessonSimilarity.objects.filter(lesson=apology).order_by('-score').first().similar, prayer)
+        self.assertFalse(LessonSimilarity.objects.filter(lesson__title='Forgiveness after conflict',
+                                                         similar=apology).exists())
+
+
+    def test_changes_are_batched_into_one_index_build(self):
+        recommendations.rebuild()
+        self.assertEqual(recommendations.update_stale(), 0)
+        forgiveness = self.lessons['Forgiveness after conflict']
+        forgiveness.content += ' Forgive quickly.'
+        forgiveness.save()
+        quiz = Quiz.objects.create(lesson=self.lessons['Repairing trust'], question='How is trust rebuilt?',
+                                   option1='A', option2='B', option3='C', option4='D')
+        quiz.delete()
+        ai.create_quizzes(self.lessons['Budgeting together'], json.loads(QUIZ_REPLY)['questions'])
+
+        with mock.patch.object(recommendations, 'build_index', wraps=recommendations.build_index) as build:
+            call_command('run_quiz_worker', once=True, stdout=StringIO())
+        self.assertEqual(build.call_count, 1)
+        self.assertFalse(Lesson.objects.filter(similarity_stale_at__isnull=False).exists())
+
+    def test_rebuilding_refreshes_stored_recommendations(self):
+        forgiveness, trust = self.lessons['Forgiveness after conflict'], self.lessons['Repairing trust']
+        Progress.objects.create(user=self.user, lesson=forgiveness, score=20)
+        # No index yet, so the summary fell back to the first lesson not completed.
+        self.assertEqual(UserProgressSummary.objects.get(user=self.user).next_lesson, forgiveness)
+        recommendations.rebuild()
+        self.assertEqual(UserProgressSummary.objects.get(user=self.user).next_lesson, trust)
+
+        apology = Lesson.objects.create(title='The art of apology',
+                                        content='Forgiveness heals conflict: a sincere apology after conflict '
+                                                'rebuilds trust. Offer forgiveness, apology and trust.')
+        recommendations.update_stale()
+        self.assertEqual(UserProgressSummary.objects.get(user=self.user).next_lesson, apology)
+
+    def test_deleting_a_lesson_flags_the_lessons_that_listed_it(self):
+        recommendations.rebuild()
+        trust = self.lessons['Repairing trust']
+        listing = set(LessonSimilarity.objects.filter(similar=trust).values_list('lesson_id', flat=True))
+        self.assertTrue(listing)
+        trust.delete()
+        stale = set(Lesson.objects.filter(similarity_stale_at__isnull=False).values_list('id', flat=True))
+        self.assertEqual(stale, listing)
+        self.assertEqual(recommendations.update_stale(), len(listing))
+        self.assertFalse(Lesson.objects.filter(similarity_stale_at__isnull=False).exists())
+
+
+class QueryBudgetTests(TestCase):
+    """Every route in core.urls must stay within its query budget in core/perf.py.
+
+    Wall-time budgets depend on the machine, so only ``manage.py bench_views --check`` enforces them.
+    """
+
+    def test_every_route_has_a_budget(self):
+        names = {p.name for p in perf.core_routes()}
+        self.assertEqual(names - set(perf.VIEW_BUDGETS), set())
+
+    def test_routes_stay_within_budget(self):
+        fixtures = perf.seed(10)
+        for row in perf.measure_routes(self.client, fixtures):
+            with self.subTest(route=row['route']):
+                self.assertTrue(perf.status_ok(row['route'], row['status']), row['status'])
+                self.assertLessEqual(row['queries'], row['query_budget'])
+
+    def test_query_counts_do_not_grow_with_data(self):
+        cache.clear()
+        small = {r['route']: r['queries'] for r in perf.measure_routes(self.client, perf.seed(10))}
+        Lesson.objects.all().delete()
+        User.objects.all().delete()
+        cache.clear()
+        large = {r['route']: r['queries'] for r in perf.measure_routes(self.client, perf.seed(300))}
+        self.assertEqual(small, large)
+
+
+class ForumTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('husband', password='pw')
+        self.client.force_login(self.user)
+
+    def test_replies_are_threaded_under_their_root(self):
+        self.client.post(reverse('forum'), {'title': 'Prayer', 'content': 'How do you pray together?'})
+        root = ForumPost.objects.get()
+        self.client.post(reverse('forum'), {'parent': root.id, 'content': 'Every evening.'})
+        reply = ForumPost.objects.get(parent=root)
+        nested = ForumPost.objects.create(user=self.user, title='x', content='Same here.', parent=reply)
+
+        self.assertEqual(reply.title, 'Re: Prayer')
+        self.assertEqual((reply.thread_id, nested.thread_id), (root.id, root.id))
+        self.assertEqual((root.depth, reply.depth, nested.depth), (0, 1, 2))
+        self.assertTrue(nested.path.startswith(reply.path))
+
+        response = self.client.get(reverse('forum'))
+        [thread] = response.context['threads']
+        self.assertEqual(thread['post'], root)
+        self.assertEqual(thread['replies'], [reply, nested])
+
+    def test_non_numeric_parent_is_rejected(self):
+        response = self.client.post(reverse('forum'), {'parent': 'abc', 'content': 'Hello'})
+        self.assertRedirects(response, reverse('forum'), fetch_redirect_response=False)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ["That post could not be found."])
+        self.assertFalse(ForumPost.objects.exists())
+
+    def test_keyset_pagination_walks_every_root_once(self):
+        posts = [ForumPost.objects.create(user=self.user, title=f'Post {i}', content='...') for i in range(45)]
+        seen = []
+        cursor = None
+        for _ in range(3):
+            response = self.client.get(reverse('forum'), {'before': cursor} if cursor else {})
+            seen += [t['post'].id for t in response.context['threads']]
+            cursor = response.context['next_cursor']
+        self.assertIsNone(cursor)
+        self.assertEqual(seen, [p.id for p in reversed(posts)])
+
+        # Garbage cursors fall back to the first page.
+        response = self.client.get(reverse('forum'), {'before': 'not-a-cursor'})
+        self.assertEqual(response.context['threads'][0]['post'], posts[-1])
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('seeker', password='pw')
+        self.lesson = Lesson.objects.create(title='Forgiveness', content='Forgive one another as you were forgiven.')
+        Lesson.objects.create(title='Money', content='Budget together and forgive debts.')
+        self.post = ForumPost.objects.create(user=self.user, title='Praying <b>together</b>',
+                                             content='We pray before bed.')
+
+    def test_signals_keep_index_current_and_rank_title_matches_first(self):
+        hits = search.search('forgive')
+        self.assertEqual([h.title for h in hits], ['Forgiveness', 'Money'])
+        self.assertIn('<mark>', hits[0].snippet)
+
+        self.lesson.title = 'Grace'
+        self.lesson.save()
+        self.assertEqual(search.search('forgiveness')[0].title, 'Grace')
+
+        self.post.delete()
+        self.assertEqual(search.search('pray'), [])
+
+    def test_generated_quizzes_are_indexed(self):
+        ai.save_quizzes(self.lesson, json.loads(QUIZ_REPLY)['questions'])
+        hits = search.search('question')
+        self.assertEqual(len(hits), 3)
+        self.assertEqual(hits[0].url, reverse('lesson_detail', args=[self.lesson.id]))
+
+    def test_view_escapes_user_content(self):
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('search'), {'q': 'together "'})
+        self.assertContains(response, 'Praying &lt;b&gt;together&lt;/b&gt;')
+        self.assertEqual([h.kind for h in response.context['results']], ['post', 'lesson'])
+
+    def test_forum_hits_link_to_the_page_holding_the_thread(self):
+        reply = ForumPost.objects.create(user=self.user, title='Re: Praying', content='We pray at dawn.',
+                                         parent=self.post)
+        for i in range(25):
+            ForumPost.objects.create(user=self.user, title=f'Newer thread {i}', content='Hello.')
+        self.client.force_login(self.user)
+        self.assertNotContains(self.client.get(reverse('forum')), f'id="post-{self.post.id}"')
+
+        url = search.search('dawn')[0].url
+        self.assertEqual(url, search.document_for(self.post).url)
+        self.assertContains(self.client.get(url), f'id="post-{self.post.id}"')
+        self.assertEqual(reply.thread_id, self.post.id)
+
+    def test_migration_links_existing_forum_hits_to_their_page(self):
+        from django.apps import apps
+        migration = importlib.import_module('core.migrations.0021_searchdocument_forum_cursor_urls')
+        reply = ForumPost.objects.create(user=self.user, title='Re: Praying', content='At dawn.', parent=self.post)
+        SearchDocument.objects.filter(kind='post').update(url=f'/forum/#post-{self.post.id}')
+        migration.link_posts_to_their_page(apps, None)
+        for post in (self.post, reply):
+            self.assertEqual(SearchDocument.objects.get(kind='post', object_id=post.id).url, search.forum_url(post))
+
+    def test_rebuild_matches_incremental_index(self):
+        before = [h.object_id for h in search.search('forgive')]
+        self.assertEqual(search.rebuild_index(), 3)
+        self.assertEqual([h.object_id for h in search.search('forgive')], before)
+
+
+class ResponsiveImageTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVES_SYNC=True)
+        override.enable()
+        self.addCleanup(override.disable)
+        cache.clear()
+
+    def upload(self, name='cover.png', size=(1000, 500), mode='RGBA'):
+        buffer = BytesIO()
+        Image.new(mode, size, (200, 100, 50, 128) if mode == 'RGBA' else (200, 100, 50)).save(buffer, 'PNG')
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/png')
+
+    def test_upload_builds_derivatives_next_to_original(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(title='Home', content='...', image=self.upload())
+        record = ResponsiveImage.objects.get(source_name=lesson.image.name)
+        self.assertEqual(sorted({v['width'] for v in record.variants}), [320, 640, 960, 1000])
+        self.assertEqual({v['format'] for v in record.variants}, {'webp', 'jpeg'})
+        for variant in record.variants:
+            self.assertTrue(variant['name'].startswith('lesson_images/derivatives/'))
+            with default_storage.open(variant['name']) as f:
+                self.assertEqual(Image.open(f).width, variant['width'])
+
+        html = Template('{% load custom_tags %}{% responsive_image lesson.image alt="Home" %}').render(
+            Context({'lesson': lesson})
+        )
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-320w.webp 320w', html)
+        self.assertIn('-1000w.jpeg', html)
+
+    def test_identical_source_reuses_derivatives(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = Lesson.objects.create(title='A', content='...', image=self.upload('a.png'))
+            second = Lesson.objects.create(title='B', content='...', image=self.upload('b.png'))
+        a = ResponsiveImage.objects.get(source_name=first.image.name)
+        b = ResponsiveImage.objects.get(source_name=second.image.name)
+        self.assertEqual(a.source_hash, b.source_hash)
+        self.assertEqual(a.variants, b.variants)
+
+    def test_saves_that_keep_the_image_skip_hashing(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            lesson = Lesson.objects.create(title='Home', content='...', image=self.upload())
+        with mock.patch.object(images, 'source_hash', wraps=images.source_hash) as source_hash:
+            with self.captureOnCommitCallbacks(execute=True):
+                lesson.title = 'Renamed'
+                lesson.save()
+                reloaded = Lesson.objects.get(id=lesson.id)
+                reloaded.content = 'Edited.'
+                reloaded.save()
+            self.assertEqual(source_hash.call_count, 0)
+
+            ResponsiveImage.objects.all().delete()
+            cache.clear()
+            with self.captureOnCommitCallbacks(execute=True):
+                reloaded.save()
+            self.assertEqual(source_hash.call_count, 1)  # no record for the name yet
+
+            with self.captureOnCommitCallbacks(execute=True):
+                reloaded.image = self.upload('other.png', size=(800, 400))
+                reloaded.save()
+            self.assertEqual(source_hash.call_count, 2)
+
+    def test_plain_img_until_derivatives_exist(self):
+        lesson = Lesson.objects.create(title='Home', content='...', image=self.upload())
+        html = Template('{% load custom_tags %}{% responsive_image lesson.image %}').render(Context({'lesson': lesson}))
+        self.assertTrue(html.startswith(f'<img src="{lesson.image.url}"'))
+
+
+class MediaTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.data = bytes(range(256)) * 400
+        self.name = default_storage.save('lesson_images/cover.png', ContentFile(self.data))
+        self.url = f"{settings.MEDIA_URL}{self.name}"
+
+    def get(self, url=None, **headers):
+        response = self.client.get(url or self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        response.close()
+        return response, body
+
+    def test_uploads_get_content_hashed_names(self):
+        self.assertRegex(self.name, r'^lesson_images/cover\.[0-9a-f]{12}\.png$')
+        self.assertEqual(default_storage.save('lesson_images/copy.png', ContentFile(self.data)),
+                         'lesson_images/copy.' + self.name.split('.')[1] + '.png')
+        self.assertEqual(default_storage.save('lesson_images/derivatives/0123456789abcdef0123-320w.webp',
+                                              ContentFile(b'x')),
+                         'lesson_images/derivatives/0123456789abcdef0123-320w.webp')
+
+    def test_only_our_own_hashed_names_count_as_immutable(self):
+        for name in ('lesson_images/cover.0123456789ab.png', f"images/{'ab' * 32}.jpg",
+                     'lesson_images/derivatives/0123456789abcdef0123-640w.webp'):
+            self.assertTrue(media.is_hashed(name), name)
+        for name in ('IMG_20240101123456.jpg', '1700000000000.jpg', 'cafebabe1234-final.png',
+                     'cover.0123456789abc.png', 'deadbeefcafe.png', f"{'ab' * 32}-copy.jpg"):
+            self.assertFalse(media.is_hashed(name), name)
+        self.assertRegex(default_storage.save('IMG_20240101123456.jpg', ContentFile(self.data)),
+                         r'^IMG_20240101123456\.[0-9a-f]{12}\.jpg$')
+
+    def test_serves_with_validators_and_immutable_caching(self):
+        response, body = self.get()
+        self.assertEqual((response.status_code, body), (200, self.data))
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+        self.assertEqual(self.get(**{'If-None-Match': response['ETag']})[0].status_code, 304)
+        self.assertEqual(self.get(**{'If-Modified-Since': response['Last-Modified']})[0].status_code, 304)
+
+        with open(os.path.join(self.media_root, 'plain.txt'), 'w') as f:
+            f.write('hello')
+        self.assertEqual(self.get(f"{settings.MEDIA_URL}plain.txt")[0]['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.get(f"{settings.MEDIA_URL}../settings.py")[0].status_code, 404)
+        self.assertEqual(self.get(f"{settings.MEDIA_URL}lesson_images/missing.png")[0].status_code, 404)
+
+    def test_byte_ranges(self):
+        response, body = self.get(Range='bytes=100-199')
+        self.assertEqual((response.status_code, body), (206, self.data[100:200]))
+        self.assertEqual(response['Content-Range'], f'bytes 100-199/{len(self.data)}')
+        self.assertEqual(self.get(Range='bytes=-10')[1], self.data[-10:])
+        self.assertEqual(self.get(Range='bytes=102000-')[1], self.data[102000:])
+
+        response, _ = self.get(Range=f'bytes={len(self.data)}-')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, f'bytes */{len(self.data)}'))
+
+        etag = self.get()[0]['ETag']
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': etag})[0].status_code, 206)
+        self.assertEqual(self.get(Range='bytes=0-9', **{'If-Range': '"stale"'})[0].status_code, 200)
+
+    def test_offload_to_the_front_end_server(self):
+        with override_settings(MEDIA_OFFLOAD='x-accel-redirect'):
+            response, body = self.get()
+        self.assertEqual((response['X-Accel-Redirect'], body), (f'/protected-media/{self.name}', b''))
+        with override_settings(MEDIA_OFFLOAD='x-sendfile'):
+            response, _ = self.get()
+        self.assertEqual(response['X-Sendfile'], os.path.join(self.media_root, self.name))
+
+    def test_memory_does_not_grow_with_file_size(self):
+        name = default_storage.save('lesson_images/large.png', ContentFile(os.urandom(8 * 1024 * 1024)))
+        for headers in ({}, {'Range': 'bytes=1000-'}):
+            response = self.client.get(f"{settings.MEDIA_URL}{name}", headers=headers)
+            tracemalloc.start()
+            size = sum(len(block) for block in response.streaming_content)
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            response.close()
+            self.assertGreater(size, 8 * 1024 * 1024 - 1000 - 1)
+            self.assertLess(peak, 1024 * 1024)
+
+
+class CourseArchiveTests(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        override = override_settings(MEDIA_ROOT=self.media_root, IMAGE_DERIVATIVES_SYNC=True)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        buffer = BytesIO()
+        Image.new('RGB', (40, 20), (200, 100, 50)).save(buffer, 'PNG')
+        cover = buffer.getvalue()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons = [
+                Lesson.objects.create(title=f'Lesson {i}', content=f'Love is patient {i}.',
+                                      image=SimpleUploadedFile(f'cover{i}.png', cover) if i < 2 else None)
+                for i in range(3)
+            ]
+        for lesson in self.lessons:
+            for n in range(2):
+                Quiz.objects.create(lesson=lesson, question=f'{lesson.title} question {n}?', option1='A',
+                                    option2='B', option3='C', option4='D', correct_index=n + 1)
+
+    def export(self, **kwargs):
+        archive = BytesIO()
+        stats = course_archive.export_course(archive, chunk_size=2, **kwargs)
+        archive.seek(0)
+        return archive, stats
+
+    def test_round_trip_into_an_empty_catalog(self):
+        archive, stats = self.export(compress=True)
+        # Both lessons share one cover, so the archive carries it once.
+        self.assertEqual((stats['lessons'], stats['quizzes'], stats['images']), (3, 6, 1))
+        Lesson.objects.all().delete()
+        ResponsiveImage.objects.all().delete()
+
+        stats = course_archive.import_course(archive, batch_size=2)
+        self.assertEqual((stats['lessons'], stats['quizzes'], stats['images']), (3, 6, 1))
+        lesson = Lesson.objects.get(title='Lesson 1')
+        self.assertEqual(lesson.excerpt, 'Love is patient 1.')
+        self.assertTrue(default_storage.exists(lesson.image.name))
+        self.assertEqual(Lesson.objects.get(title='Lesson 0').image.name, lesson.image.name)
+        self.assertEqual(sorted(lesson.quiz_set.values_list('correct_index', flat=True)), [1, 2])
+        self.assertEqual(SearchDocument.objects.filter(kind=SearchDocument.QUIZ).count(), 6)
+
+    def test_import_skips_content_already_present(self):
+        archive, _ = self.export()
+        Quiz.objects.filter(question='Lesson 2 question 1?').delete()
+        with self.assertNumQueries(8):  # 6 plus the import's own savepoint
+            stats = course_archive.import_course(archive, batch_size=2)
+        # The cover was uploaded under another name; its recorded hash finds it.
+        self.assertEqual((stats['lessons'], stats['quizzes'], stats['images'], stats['skipped_images']), (0, 1, 0, 1))
+        self.assertEqual((stats['skipped_lessons'], stats['skipped_quizzes']), (3, 5))
+        self.assertEqual(Lesson.objects.count(), 3)
+        self.assertTrue(Quiz.objects.filter(lesson=self.lessons[2], question='Lesson 2 question 1?').exists())
+
+    def test_failed_import_removes_the_images_it_wrote(self):
+        exported, _ = self.export()
+        imported_name = f"{course_archive.IMAGE_DIR}/{images.source_hash(self.lessons[0].image.name)}.png"
+        Lesson.objects.all().delete()
+        ResponsiveImage.objects.all().delete()
+        archive = BytesIO()
+        with tarfile.open(fileobj=exported, mode='r|') as source, tarfile.open(fileobj=archive, mode='w|') as tar:
+            for member in source:
+                if not member.name.endswith('.jsonl'):
+                    tar.addfile(member, source.extractfile(member))
+            course_archive.add_bytes(tar, 'lessons-00001.jsonl', b'{"title": "Broken"}\n')
+        archive.seek(0)
+
+        with self.assertRaises(course_archive.ArchiveError):
+            course_archive.import_course(archive)
+        self.assertFalse(default_storage.exists(imported_name))
+        self.assertFalse(Lesson.objects.exists())
+
+    def test_rejects_other_archives(self):
+        with self.assertRaises(course_archive.ArchiveError):
+            course_archive.import_course(BytesIO(b'not a tar file'))
+        call_command('export_course', f'{self.media_root}/course.tar', stdout=StringIO())
+        out = StringIO()
+        call_command('import_course', f'{self.media_root}/course.tar', stdout=out)
+        self.assertIn('Imported 0 lessons', out.getvalue())
+
+
+class CachingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.lesson = Lesson.objects.create(title='Patience', content='Love is patient.')
+
+    def test_anonymous_home_is_served_from_cache_until_content_changes(self):
+        self.client.get(reverse('home'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('home'))
+        self.assertContains(response, 'Patience')
+
+        self.lesson.title = 'Kindness'
+        self.lesson.save()
+        self.assertContains(self.client.get(reverse('home')), 'Kindness')
+
+        HomePageContent.objects.create(welcome_title='Welcome, couples')
+        self.assertContains(self.client.get(reverse('home')), 'Welcome, couples')
+
+    def test_lesson_cards_fragment_is_reused_and_invalidated_by_quizzes(self):
+        user = User.objects.create_user('reader', password='pw')
+        self.client.force_login(user)
+        self.client.get(reverse('course'))
+        with CaptureQueriesContext(connection) as warm:
+            self.client.get(reverse('course'))
+        self.assertFalse(any('core_lesson' in q['sql'] for q in warm.captured_queries))
+
+        version = caching.get_version(caching.LESSONS)
+        Quiz.objects.create(lesson=self.lesson, question='Q?', option1='A', option2='B',
+                            option3='C', option4='D', correct_index=1)
+        self.assertGreater(caching.get_version(caching.LESSONS), version)
+        with CaptureQueriesContext(connection) as cold:
+            self.client.get(reverse('course'))
+        self.assertTrue(any('core_lesson' in q['sql'] for q in cold.captured_queries))
+
+
+class LessonExcerptTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.body = ' '.join(f'word{i}' for i in range(500))
+        self.lesson = Lesson.objects.create(title='Long', content=self.body)
+
+    def test_excerpt_follows_content(self):
+        self.assertEqual(self.lesson.excerpt, Lesson.make_excerpt(self.body))
+        self.assertEqual(len(self.lesson.excerpt.split()), Lesson.EXCERPT_WORDS)
+        self.lesson.content = 'Short now.'
+        self.lesson.save(update_fields=['content'])
+        self.lesson.refresh_from_db()
+        self.assertEqual(self.lesson.excerpt, 'Short now.')
+
+    def test_list_pages_do_not_load_lesson_content(self):
+        self.client.force_login(User.objects.create_user('reader', password='pw'))
+        for name in ('home', 'course', 'dashboard'):
+            with self.subTest(page=name), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse(name))
+                self.assertContains(response, 'word0 word1')
+                self.assertNotContains(response, 'word25 ')
+            lesson_sql = [q['sql'] for q in queries.captured_queries if 'FROM "core_lesson"' in q['sql']]
+            self.assertTrue(lesson_sql)
+            self.assertFalse(any('"core_lesson"."content"' in sql for sql in lesson_sql))
+
+
+class QuizGradingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('grader', password='pw')
+        self.lesson = Lesson.objects.create(title='Forgiveness', content='Body')
+        self.quizzes = [
+            Quiz.objects.create(lesson=self.lesson, question=f'Q{i}?', option1='A', option2='B',
+                                option3='C', option4='D', correct_index=i + 1)
+            for i in range(4)
+        ]
+        self.client.force_login(self.user)
+
+    def post(self, answers):
+        data = {f'option_{quiz.id}': answer for quiz, answer in zip(self.quizzes, answers)}
+        return self.client.post(reverse('quiz_page', args=[self.lesson.id]), data)
+
+    def test_page_submits_option_numbers(self):
+        response = self.client.get(reverse('quiz_page', args=[self.lesson.id]))
+        self.assertContains(response, f'name="option_{self.quizzes[0].id}"')
+        self.assertContains(response, 'value="4"')
+        self.assertEqual(self.quizzes[2].correct_option, 'C')
+
+    def test_grading_reads_answer_key_once_and_upserts(self):
+        with CaptureQueriesContext(connection) as first:
+            self.post(['1', '2', '3', '1'])
+        progress = Progress.objects.get(user=self.user, lesson=self.lesson)
+        self.assertEqual((progress.score, progress.completed), (75, True))
+
+        for i in range(20):
+            Quiz.objects.create(lesson=self.lesson, question=f'Extra {i}?', option1='A', option2='B',
+                                option3='C', option4='D', correct_index=2)
+        with CaptureQueriesContext(connection) as second:
+            self.post(['1', '2', '3', '4'])
+        for queries in (first, second):
+            quiz_sql = [q['sql'] for q in queries.captured_queries if '"core_quiz"' in q['sql']]
+            self.assertEqual(len(quiz_sql), 1)
+            for table in ('core_progress', 'core_quizattempt', 'core_answerrecord'):
+                writes = [q['sql'] for q in queries.captured_queries if f'INTO "{table}"' in q['sql']]
+                self.assertEqual(len(writes), 1, table)
+        self.assertEqual(Progress.objects.filter(user=self.user).count(), 1)
+        progress.refresh_from_db()
+        self.assertEqual((progress.score, progress.completed), (16, False))
+        self.assertEqual(UserProgressSummary.objects.get(user=self.user).lowest_score, 16)
+
+    def test_every_attempt_is_recorded(self):
+        self.post(['1', '2', '4', ''])
+        self.post(['1', '2', '3', '4'])
+        attempts = list(QuizAttempt.objects.filter(user=self.user).order_by('created_at', 'id'))
+        self.assertEqual([(a.score, a.correct_count, a.question_count) for a in attempts], [(50, 2, 4), (100, 4, 4)])
+        first = attempts[0].answers.order_by('quiz_id')
+        self.assertEqual([(r.selected_index, r.is_correct) for r in first],
+                         [(1, True), (2, True), (4, False), (None, False)])
+        self.assertEqual(AnswerRecord.objects.filter(quiz=self.quizzes[2], selected_index=4).count(), 1)
+        self.assertEqual(Progress.objects.get(user=self.user, lesson=self.lesson).score, 100)
+
+
+class QuizAnalyticsTests(TestCase):
+    def setUp(self):
+        self.lesson = Lesson.objects.create(title='Conflict', content='Body')
+        self.easy = Quiz.objects.create(lesson=self.lesson, question='Easy?', option1='A', option2='B',
+                                        option3='C', option4='D', correct_index=1)
+        self.tricky = Quiz.objects.create(lesson=self.lesson, question='Tricky?', option1='A', option2='B',
+                                          option3='C', option4='D', correct_index=2)
+        user = User.objects.create_user('student', password='pw')
+        # Ten attempts with rising scores: everyone gets the easy one right, and only the
+        # strongest students get the tricky one right; the rest fall for option 3.
+        for i in range(10):
+            attempt = QuizAttempt.objects.create(user=user, lesson=self.lesson, score=i * 10,
+                                                 correct_count=1 + (i >= 7), question_count=2)
+            AnswerRecord.objects.bulk_create([
+                AnswerRecord(attempt=attempt, quiz=self.easy, selected_index=1, is_correct=True),
+                AnswerRecord(attempt=attempt, quiz=self.tricky, selected_index=2 if i >= 7 else 3,
+                             is_correct=i >= 7),
+            ])
+
+    def test_item_statistics(self):
+        self.assertEqual(analytics.refresh_item_stats(chunk_size=3), 2)
+        easy, tricky = self.easy.item_stats, self.tricky.item_stats
+        self.assertEqual((easy.response_count, easy.difficulty, easy.discrimination), (10, 1.0, 0.0))
+        self.assertEqual(easy.option_rates, [1.0, 0.0, 0.0, 0.0, 0.0])
+        self.assertEqual((tricky.difficulty, tricky.discrimination), (0.3, 1.0))
+        self.assertEqual(tricky.option_rates, [0.0, 0.3, 0.7, 0.0, 0.0])
+
+        with mock.patch.object(analytics, 'MIN_RESPONSES', 1):
+            self.assertEqual(analytics.item_flags(easy, 1), ['too easy', 'low discrimination'])
+            self.assertEqual(analytics.item_flags(tricky, 2), ['too hard', 'misleading distractor'])
+        self.assertEqual(analytics.item_flags(tricky, 2), [])
+
+    def test_command_replaces_stats_and_admin_lists_them(self):
+        QuizItemStats.objects.create(quiz=self.easy, response_count=99)
+        out = StringIO()
+        call_command('quiz_analytics', stdout=out)
+        self.assertIn('Analysed 20 answers from 10 attempts for 2 questions', out.getvalue())
+        self.assertEqual(QuizItemStats.objects.get(quiz=self.easy).response_count, 10)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+        response = self.client.get(reverse('admin:core_quiz_changelist'))
+        self.assertContains(response, '0.30')
+        response = self.client.get(reverse('admin:core_quiz_change', args=[self.tricky.id]))
+        self.assertContains(response, 'C: 70%')
+
+
+class MentorshipTests(TestCase):
+    def setUp(self):
+        self.mentor = Mentor.objects.create(name='Test Mentor', slot_minutes=30)
+        for weekday in range(7):
+            MentorAvailability.objects.create(mentor=self.mentor, weekday=weekday, start_time='09:00', end_time='11:00')
+        self.user = User.objects.create_user('husband', password='pw')
+        self.client.force_login(self.user)
+
+    def test_slots_follow_availability(self):
+        slots = MentorSlot.objects.filter(mentor=self.mentor)
+        self.assertGreaterEqual(slots.count(), 4 * 7 * 8 - 4)
+        self.assertTrue(all(slot.end - slot.start == timedelta(minutes=30) for slot in slots))
+        self.assertEqual(mentoring.generate_slots(mentors=Mentor.objects.filter(id=self.mentor.id)), 0)
+
+        booked = mentoring.book_slot(self.user, slots.order_by('start').first().id).slot
+        MentorAvailability.objects.filter(mentor=self.mentor).delete()
+        mentoring.generate_slots(mentors=Mentor.objects.filter(id=self.mentor.id))
+        self.assertEqual(list(MentorSlot.objects.filter(mentor=self.mentor)), [booked])
+
+    def test_worker_and_booking_page_extend_the_slot_window(self):
+        cache.clear()
+        slots = MentorSlot.objects.filter(mentor=self.mentor)
+        total = slots.count()
+        horizon = timezone.now() + timedelta(weeks=1)  # as if the window was generated weeks ago
+        slots.filter(start__gt=horizon).delete()
+        call_command('run_quiz_worker', once=True, stdout=StringIO())
+        self.assertEqual(slots.count(), total)
+
+        slots.filter(start__gt=horizon).delete()
+        self.client.get(reverse('mentorship_booking'))
+        self.assertLess(slots.count(), total)  # topped up within the interval already
+        cache.delete(mentoring.TOP_UP_KEY)
+        self.client.get(reverse('mentorship_booking'))
+        self.assertEqual(slots.count(), total)
+
+    def test_availability_api_is_one_query(self):
+        slot = MentorSlot.objects.filter(mentor=self.mentor).order_by('start').first()
+        mentoring.book_slot(self.user, slot.id)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('mentor_availability'), {'weeks': 1, 'mentor': self.mentor.id})
+        data = response.json()['slots']
+        self.assertEqual(len([q for q in queries.captured_queries if 'core_mentorslot' in q['sql']]), 1)
+        self.assertTrue(data)
+        self.assertNotIn(slot.id, [row['id'] for row in data])
+        self.assertEqual(data[0]['mentor'], 'Test Mentor')
+        self.assertEqual(self.client.get(reverse('mentor_availability'), {'weeks': 'x'}).status_code, 400)
+
+    def test_booking_page(self):
+        slot = MentorSlot.objects.filter(mentor=self.mentor).order_by('start').first()
+        self.assertContains(self.client.get(reverse('mentorship_booking')), f'value="{slot.id}"')
+
+        response = self.client.post(reverse('mentorship_booking'), {'slot': slot.id})
+        self.assertRedirects(response, reverse('dashboard'))
+        booking = MentorshipBooking.objects.get(slot=slot)
+        self.assertEqual((booking.user, booking.mentor, booking.date), (self.user, 'Test Mentor', slot.start))
+
+        response = self.client.post(reverse('mentorship_booking'), {'slot': slot.id}, follow=True)
+        self.assertContains(response, 'Someone has just booked that session')
+        self.assertEqual(MentorshipBooking.objects.count(), 1)
+
+        other = MentorSlot.objects.filter(mentor=self.mentor, booking__isnull=True).order_by('start').first()
+        MentorSlot.objects.filter(id=other.id).update(start=timezone.now() - timedelta(hours=1))
+        with self.assertRaises(mentoring.SlotUnavailable):
+            mentoring.book_slot(self.user, other.id)
+
+
+class MentorshipConcurrencyTests(TransactionTestCase):
+    def test_concurrent_bookings_never_double_book(self):
+        mentor = Mentor.objects.create(name='Busy Mentor')
+        MentorAvailability.objects.create(mentor=mentor, weekday=0, start_time='09:00', end_time='12:00')
+        slot_ids = list(MentorSlot.objects.filter(mentor=mentor).order_by('start').values_list('id', flat=True)[:2])
+        users = User.objects.bulk_create([User(username=f'couple-{i}') for i in range(16)])
+        barrier = threading.Barrier(len(users))
+        outcomes = []
+
+        def book(user, slot_id):
+            try:
+                barrier.wait()
+                for _ in range(50):
+                    try:
+                        mentoring.book_slot(user, slot_id)
+                        outcomes.append('booked')
+                        return
+                    except mentoring.SlotUnavailable:
+                        outcomes.append('rejected')
+                        return
+                    except OperationalError:
+                        # SQLite allows one writer at a time; a locked database is not a booking outcome.
+                        time.sleep(0.01)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=book, args=(user, slot_ids[i % 2])) for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(outcomes.count('booked'), 2)
+        self.assertEqual(outcomes.count('rejected'), len(users) - 2)
+        for slot_id in slot_ids:
+            self.assertEqual(MentorshipBooking.objects.filter(slot_id=slot_id).count(), 1)
+
+
+class LoadTestJourneyTests(LiveServerTestCase):
+    def test_journeys_run_end_to_end(self):
+        lesson = Lesson.objects.create(title='Patience', content='Love is patient.')
+        Quiz.objects.bulk_create([Quiz(lesson=lesson, question=f'Q{i}?', option1='Patient', option2='Proud',
+                                       option3='Loud', option4='Rude', correct_index=1) for i in range(3)])
+        mentor = Mentor.objects.create(name='Load Mentor')
+        MentorAvailability.objects.create(mentor=mentor, weekday=0, start_time='09:00', end_time='12:00')
+
+        results = loadtest.run_journeys(self.server_thread.port, [lesson.id], [], journeys=2, concurrency=1)
+
+        self.assertEqual(results['journeys'], {'completed': 2, 'failed': 0})
+        rows = {(row['method'], row['url_name']): row for row in results['urls']}
+        for key in [('POST', 'register'), ('POST', 'login'), ('GET', 'dashboard'), ('POST', 'quiz_page'),
+                    ('POST', 'forum'), ('POST', 'mentorship_booking')]:
+            self.assertEqual((rows[key]['requests'], rows[key]['errors']), (2, 0))
+        self.assertEqual(QuizAttempt.objects.filter(lesson=lesson).count(), 2)
+        self.assertEqual(MentorshipBooking.objects.filter(user__username__startswith='load-').count(), 2)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('observer', password='pw'))
+
+    def test_requests_are_timed_and_exported(self):
+        with override_settings(REQUEST_LOG_SAMPLE_RATE=1.0), self.assertLogs('core.requests') as logs:
+            self.client.get(reverse('dashboard'))
+        record = logs.records[-1]
+        self.assertEqual((record.view, record.status), ('dashboard', 200))
+        self.assertGreater(record.db_queries, 0)
+        line = json.loads(metrics.JsonFormatter().format(record))
+        self.assertEqual((line['message'], line['view']), ('request', 'dashboard'))
+
+        with override_settings(METRICS_PUBLIC=True):
+            body = self.client.get('/metrics').content.decode()
+        self.assertIn('eden_http_requests_total{view="dashboard",method="GET",status="200"}', body)
+        self.assertIn('eden_db_queries_per_request_count{view="dashboard"}', body)
+        self.assertIn('eden_http_request_duration_quantile_seconds{view="dashboard",quantile="0.95"}', body)
+
+    def test_metrics_need_a_token_unless_opted_out(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+        with override_settings(DEBUG=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 200)
+        with override_settings(METRICS_TOKEN='secret', METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer wrong').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+
+    def test_histogram_quantiles(self):
+        histogram = metrics.Histogram('test_seconds', 'Test.', ('view',), buckets=(1, 2, 4))
+        for value in [0.5] * 50 + [1.5] * 45 + [3] * 5:
+            histogram.observe(value, view='v')
+        self.assertAlmostEqual(histogram.quantile(0.5, view='v'), 1.0)
+        self.assertAlmostEqual(histogram.quantile(0.95, view='v'), 2.0)
+        self.assertIsNone(histogram.quantile(0.5, view='other'))
+        self.assertIn('test_seconds_bucket{view="v",le="+Inf"} 100', histogram.render())
+
+    def test_llm_calls_record_latency_and_tokens(self):
+        fake = FakeOpenAI(usage=SimpleNamespace(prompt_tokens=100, completion_tokens=40))
+        before = dict(metrics.LLM_TOKENS.values)
+        ai.request_quiz_text(Lesson(id=1, title='T', content='C'), api_client=fake)
+        self.assertEqual(metrics.LLM_TOKENS.values[('completion',)] - before.get(('completion',), 0), 40)
+        self.assertIn('eden_llm_request_duration_seconds_count{operation="quiz",outcome="ok"}', metrics.render())
+
+
+SHARED_CACHE_AUTH = {
+    'SESSION_ENGINE': 'django.contrib.sessions.backends.cached_db',
+    'AUTHENTICATION_BACKENDS': ['core.sessions.CachedUserBackend', 'django.contrib.auth.backends.ModelBackend'],
+}
+
+
+@override_settings(**SHARED_CACHE_AUTH)
+class SessionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('reader', password='pw')
+        self.lesson = Lesson.objects.create(title='Patience', content='Love is patient.')
+        self.client.force_login(self.user)
+
+    def session_and_user_queries(self, path):
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(path).status_code, 200)
+        return [q['sql'] for q in queries.captured_queries if 'django_session' in q['sql'] or 'auth_user' in q['sql']]
+
+    def test_page_views_skip_session_and_user_queries(self):
+        for path in (reverse('dashboard'), reverse('lesson_detail', args=[self.lesson.id])):
+            self.session_and_user_queries(path)  # first view after login loads the user
+            self.assertEqual(self.session_and_user_queries(path), [])
+
+    def test_saving_the_user_refreshes_the_cached_copy(self):
+        self.session_and_user_queries(reverse('dashboard'))
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(reverse('dashboard'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('dashboard')}", fetch_redirect_response=False)
+
+    def test_quiz_message_does_not_write_the_session(self):
+        Quiz.objects.create(lesson=self.lesson, question='Love is?', option1='Patient', option2='Proud',
+                            option3='Loud', option4='Rude', correct_index=1)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(reverse('quiz_page', args=[self.lesson.id]), {})
+        self.assertFalse([q for q in queries.captured_queries if 'django_session' in q['sql']])
+        self.assertIn('messages', response.cookies)
+        self.assertEqual([str(m) for m in get_messages(response.wsgi_request)], ['You scored 0% on Patience'])
+
+    def test_register_and_login_use_the_cached_backend(self):
+        self.client.logout()
+        response = self.client.post(reverse('register'), {'username': 'newcomer', 'password1': 'Patient-Kind-42',
+                                                          'password2': 'Patient-Kind-42'})
+        self.assertRedirects(response, reverse('dashboard'), fetch_redirect_response=False)
+        self.assertEqual(self.client.session['_auth_user_backend'], 'core.sessions.CachedUserBackend')
+        self.client.logout()
+        self.client.post(reverse('login'), {'username': 'newcomer', 'password': 'Patient-Kind-42'})
+        self.assertEqual(self.client.session['_auth_user_backend'], 'core.sessions.CachedUserBackend')
+
+    @override_settings(SESSION_ENGINE='django.contrib.sessions.backends.db',
+                       AUTHENTICATION_BACKENDS=['django.contrib.auth.backends.ModelBackend'])
+    def test_register_with_the_model_backend_alone(self):
+        self.client.logout()
+        self.client.post(reverse('register'), {'username': 'newcomer', 'password1': 'Patient-Kind-42',
+                                               'password2': 'Patient-Kind-42'})
+        self.assertEqual(self.client.session['_auth_user_backend'], 'django.contrib.auth.backends.ModelBackend')
+        self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+
+    def test_clear_expired_deletes_in_batches(self):
+        past, future = timezone.now() - timedelta(days=1), timezone.now() + timedelta(days=1)
+        Session.objects.bulk_create([Session(session_key=f'old{i:05d}', session_data='', expire_date=past)
+                                     for i in range(25)])
+        Session.objects.create(session_key='current', session_data='', expire_date=future)
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('clear_expired_sessions', batch_size=10, stdout=out)
+        self.assertIn('Deleted 25 expired sessions.', out.getvalue())
+        self.assertEqual(sum(q['sql'].startswith('DELETE') for q in queries.captured_queries), 3)
+        self.assertTrue(Session.objects.filter(session_key='current').exists())
+
+
+class PerProcessCacheSessionTests(TestCase):
+    """Two gunicorn workers with their own local-memory caches, serving one browser."""
+
+    def worker(self, name):
+        return override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+                                                     'LOCATION': f'worker-{name}'}})
+
+    def test_logout_in_one_worker_ends_the_session_in_the_other(self):
+        self.assertFalse(settings.CACHE_SHARED)
+        self.assertEqual(settings.SESSION_ENGINE, 'django.contrib.sessions.backends.db')
+        self.assertEqual(settings.AUTHENTICATION_BACKENDS, ['django.contrib.auth.backends.ModelBackend'])
+        self.client.force_login(User.objects.create_user('roamer', password='pw'))
+        with self.worker('a'):
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        with self.worker('b'):
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        session_key = self.client.cookies[settings.SESSION_COOKIE_NAME].value
+        with self.worker('a'):
+            self.client.post(reverse('logout'))
+        # Another tab (or whoever copied the cookie) still sends the old session key.
+        self.client.cookies[settings.SESSION_COOKIE_NAME] = session_key
+        with self.worker('b'):
+            response = self.client.get(reverse('dashboard'))
+        self.assertRedirects(response, f"{reverse('login')}?next={reverse('dashboard')}", fetch_redirect_response=False)
+
+
+class DatabaseConfigTests(TestCase):
+    def test_postgres_uses_the_psycopg_pool(self):
+        config = database_config('postgres://eden:pw@db:5432/eden', pool_max_size=20, statement_timeout_ms=5000)
+        self.assertEqual(config['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(config['OPTIONS']['pool']['max_size'], 20)
+        self.assertIn('check', config['OPTIONS']['pool'])
+        self.assertEqual(config['OPTIONS']['options'], '-c statement_timeout=5000')
+        self.assertEqual(config['CONN_MAX_AGE'], 0)
+
+        config = database_config('postgres://eden:pw@db:5432/eden', conn_max_age=300, pool=False)
+        self.assertNotIn('pool', config['OPTIONS'])
+        self.assertEqual((config['CONN_MAX_AGE'], config['CONN_HEALTH_CHECKS']), (300, True))
+
+    def test_sqlite_tuning(self):
+        config = database_config('sqlite:///eden.sqlite3', sqlite_busy_timeout_ms=2500)
+        pragmas = config['OPTIONS']['init_command'].split(';')
+        self.assertNotIn('PRAGMA journal_mode=WAL', pragmas)  # stored in the file, so opt-in
+        self.assertIn('PRAGMA synchronous=FULL', pragmas)
+        self.assertIn('PRAGMA busy_timeout=2500', pragmas)
+        pragmas = database_config('sqlite:///eden.sqlite3', sqlite_wal=True)['OPTIONS']['init_command'].split(';')
+        self.assertEqual(pragmas[:2], ['PRAGMA journal_mode=WAL', 'PRAGMA synchronous=NORMAL'])
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(database_config('sqlite:///eden.sqlite3', sqlite_tuning=False)['OPTIONS'], {})
+
+    def test_sqlite_writers_do_not_wait_for_readers(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        config = database_config(f'sqlite:///{directory}/wal.sqlite3', sqlite_wal=True)
+        config['OPTIONS']['timeout'] = 0.1
+        handler = ConnectionHandler({'default': config, 'writer': {**config}})
+        reader, writer = handler['default'], handler['writer']
+        self.addCleanup(handler.close_all)
+
+        with writer.cursor() as cursor:
+            self.assertEqual(cursor.execute('PRAGMA journal_mode').fetchone(), ('wal',))
+            cursor.execute('CREATE TABLE note (body TEXT)')
+        with reader.cursor() as cursor:
+            cursor.execute('BEGIN')
+            self.assertEqual(cursor.execute('SELECT count(*) FROM note').fetchone(), (0,))
+            # With a rollback journal this commit would fail with "database is locked".
+            with writer.cursor() as write:
+                write.execute("INSERT INTO note VALUES ('amen')")
+            self.assertEqual(cursor.execute('SELECT count(*) FROM note').fetchone(), (0,))
+            cursor.execute('COMMIT')
+            self.assertEqual(cursor.execute('SELECT count(*) FROM note').fetchone(), (1,))
+
+    def test_hot_queries_use_their_indexes(self):
+        user = User.objects.create_user('indexed', password='pw')
+        plan = MentorshipBooking.objects.filter(user=user).order_by('-date').explain()
+        self.assertIn('core_booking_user_idx', plan)
+        plan = Progress.objects.filter(user=user, completed=True).values('lesson_id').explain()
+        self.assertIn('core_progress_done_idx', plan)
@@ -16,12 +16,16 @@ urlpatterns = [
     # new
     path('lesson/<int:lesson_id>/quiz/', views.quiz_page, name='quiz_page'),
     path('mentorship/', views.mentorship_booking, name='mentorship_booking'),
+    path('mentorship/availability/', views.mentor_availability, name='mentor_availability'),
     path('forum/', views.forum, name='forum'),
+    path('search/', views.search, name='search'),
     path('contact/', views.contact, name='contact'),
     path('support/', views.support, name='support'),
     path('assessment/', views.assessment, name='take_quiz'),
     
     # THIS IS THE MISSING/INCORRECT LINE FOR AI QUIZ GENERATION
    path('lesson/<int:lesson_id>/generate_quiz_ai/', views.generate_quiz_ai, name='generate_quiz_ai'),
+    path('lesson/<int:lesson_id>/generate_quiz_ai/stream/', views.generate_quiz_ai_stream, name='generate_quiz_ai_stream'),
+    path('lesson/<int:lesson_id>/quiz_jobs/<int:job_id>/', views.quiz_job_status, name='quiz_job_status'),
 
 ]
\ No newline at end of file
@@ -1,115 +1,155 @@
 from django.contrib import messages
-from django.shortcuts import render, get_object_or_404, redirect
-from .models import Lesson, Quiz, Progress, ForumPost, MentorshipBooking, HomePageContent
+from django.conf import settings
+from django.db import transaction
+from django.core.cache import cache
+from django.core.handlers.asgi import ASGIRequest
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from .models import Lesson, Quiz, Progress, ForumPost, MentorshipBooking, HomePageContent, QuizGenerationJob, UserProgressSummary, QuizAttempt, AnswerRecord
+from . import ai, caching, mentoring
+from . import search as search_index
+from .pagination import keyset_page
+from .jobs import enqueue_quiz_generation
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.utils import timezone
-from django.conf import settings
+import asyncio
 import json
-from openai import OpenAI
+import logging
+import time
 
-#Initialize OpenAI client
-client = OpenAI(api_key=settings.OPENAI_API_KEY)
+from asgiref.sync import sync_to_async
 
-@login_required
-def generate_quiz_ai(request, lesson_id):
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+logger = logging.getLogger(__name__)
 
-    try:
-        prompt = f"""
-        Generate exactly 3 multiple-choice questions based on this lesson content: "{lesson.content}".
-
-        Return ONLY a JSON array with this exact structure:
-        [
-          {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option1"}},
-          {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option2"}},
-          {{"question": "question text", "options": ["option1", "option2", "option3", "option4"], "correct_answer": "option3"}}
-        ]
-        No additional text, explanations, or labels. Ensure questions and options are relevant to the lesson content.
-        """
-        print("Prompt Sent:", prompt)
-
-        response = client.chat.completions.create(
-            model="gpt-3.5-turbo",  # Use a suitable model (e.g., gpt-4 for better results, if available)
-            messages=[{"role": "user", "content": prompt}],
-            max_tokens=500,
-            response_format={"type": "json_object"}
-        )
-        print("Response:", response)
-        raw_text = response.choices[0].message.content.strip()
-        print("AI Raw Response:", raw_text)
+FORUM_PAGE_SIZE = 20
+MENTOR_BOOKING_WEEKS = 2
+# Lesson list pages render from the stored excerpt and never need the full `content`.
+LESSON_CARD_FIELDS = ('id', 'title', 'image', 'excerpt')
 
-        if not raw_text:
-            raise ValueError("Empty response from OpenAI API")
 
+async def _auser(request):
+    """
+    The logged-in user for an async view.
+
+    ``request.auser()`` and the lazy ``request.user`` cache separately, so the
+    resolved user is stored on ``request.user`` too; otherwise the template
+    (rendered in a thread) would load it from the database a second time.
+    """
+    request.user = await request.auser()
+    return request.user
+
+@login_required
+async def generate_quiz_ai(request, lesson_id):
+    lesson = await aget_object_or_404(Lesson, id=lesson_id)
+
+    quiz_list = await sync_to_async(ai.get_cached_quiz_list)(lesson)
+    if quiz_list is None and settings.AI_QUIZ_INLINE:
         try:
-            quiz_list = json.loads(raw_text)
-            print("Parsed Quiz List:", quiz_list)
-        except json.JSONDecodeError as e:
-            print("JSON Decode Error:", str(e), "Raw Text:", raw_text)
-            lines = [line.strip() for line in raw_text.splitlines() if line.strip()]
-            if len(lines) >= 5:
-                quiz_list = [{
-                    "question": lines[0] if lines else f"Sample question for {lesson.title}",
-                    "options": lines[1:5],
-                    "correct_answer": lines[1] if len(lines) > 1 else "Option A"
-                }]
-            else:
-                quiz_list = []
-
-        created_count = 0
-        for q in quiz_list:
-            if (
-                isinstance(q, dict)
-                and "question" in q
-                and "options" in q
-                and isinstance(q["options"], list)
-                and len(q["options"]) == 4
-                and "correct_answer" in q
-                and q["correct_answer"] in q["options"]
-            ):
-                Quiz.objects.create(
-                    lesson=lesson,
-                    question=q["question"],
-                    option1=q["options"][0],
-                    option2=q["options"][1],
-                    option3=q["options"][2],
-                    option4=q["options"][3],
-                    correct_option=q["correct_answer"]
-                )
-                created_count += 1
-            else:
-                print("Invalid quiz data:", q)
-
-        if created_count > 0:
+            quiz_list = await asyncio.wait_for(ai.afetch_quiz_list(lesson), settings.AI_QUIZ_INLINE_TIMEOUT)
+        except Exception as e:
+            # The queued job retries with backoff and records the failure.
+            logger.warning("Inline quiz generation for lesson %s failed, queueing: %r", lesson.id, e)
+
+    if quiz_list is not None:
+        created_count = await sync_to_async(ai.save_quizzes)(lesson, quiz_list)
+        if created_count:
             messages.success(request, f"{created_count} quizzes generated for {lesson.title}!")
         else:
-            raise ValueError("No valid quizzes generated from the response.")
-
-    except Exception as e:
-        messages.error(request, f"OpenAI API request failed: {str(e)} — added a sample quiz instead.")
-        print("API Error Details:", str(e))
-        Quiz.objects.create(
-            lesson=lesson,
-            question=f"Sample question for {lesson.title} (Fallback due to error: {str(e)[:50]})",
-            option1="Option A",
-            option2="Option B",
-            option3="Option C",
-            option4="Option D",
-            correct_option="Option A"
-        )
+            messages.info(request, f"Quizzes for {lesson.title} are already up to date.")
+        return redirect("lesson_detail", id=lesson_id)
 
+    job = await sync_to_async(enqueue_quiz_generation)(lesson, user=await _auser(request))
+    messages.info(request, f"Quiz generation for {lesson.title} is queued (job #{job.id}).")
     return redirect("lesson_detail", id=lesson_id)
 
+
+def _can_stream(request):
+    # Under WSGI, Django collects an async streaming response in full before sending any of it.
+    return settings.AI_QUIZ_INLINE and isinstance(request, ASGIRequest)
+
+
+@login_required
+async def generate_quiz_ai_stream(request, lesson_id):
+    """Server-Sent Events: a ``quiz`` event per question as soon as it is saved, then ``done`` (or ``failed``)."""
+    if not _can_stream(request):
+        raise Http404("Streaming quiz generation needs AI_QUIZ_INLINE and an ASGI server.")
+    lesson = await aget_object_or_404(Lesson, id=lesson_id)
+    user = await _auser(request)
+
+    async def events():
+        created = 0
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.AI_QUIZ_INLINE_TIMEOUT
+        quizzes = ai.astream_quizzes(lesson)
+        try:
+            while True:
+                # A deadline for the whole reply, checked between questions so no event is cut in half.
+                try:
+                    quiz = await asyncio.wait_for(anext(quizzes), deadline - loop.time())
+                except StopAsyncIteration:
+                    break
+                created += 1
+                yield _sse('quiz', {'id': quiz.id, 'number': created, 'question': quiz.question,
+                                    'options': quiz.options_list})
+        except Exception as e:
+            logger.warning("Streaming quiz generation for lesson %s failed: %r", lesson.id, e)
+            job = None
+            # A reply cut short by the deadline is finished by the worker; otherwise only retry from scratch.
+            if not created or isinstance(e, TimeoutError):
+                job = await sync_to_async(enqueue_quiz_generation)(lesson, user=user)
+            yield _sse('failed', {'message': "Quiz generation was interrupted.", 'job_id': job and job.id})
+            return
+        finally:
+            await quizzes.aclose()
+        yield _sse('done', {'created': created})
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # stop nginx from holding events back
+    return response
+
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@login_required
+def quiz_job_status(request, lesson_id, job_id):
+    job = get_object_or_404(QuizGenerationJob, id=job_id, lesson_id=lesson_id)
+    return JsonResponse({
+        'id': job.id,
+        'status': job.status,
+        'finished': job.is_finished,
+        'attempts': job.attempts,
+        'created_count': job.created_count,
+        'error': job.last_error,
+    })
+
 # HOME
 # ---------------------------
 def home(request):
-    lessons = Lesson.objects.all()
-    homepage_content = HomePageContent.objects.first()
+    # Anonymous visitors all see the same page, so it is served whole from the cache.
+    if not request.user.is_authenticated:
+        key = caching.versioned_key('home-page', caching.LESSONS, caching.HOMEPAGE)
+        content = cache.get(key)
+        if content is not None:
+            return HttpResponse(content)
+        response = _render_home(request)
+        cache.set(key, response.content, settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return _render_home(request)
+
+
+def _render_home(request):
+    lessons = Lesson.objects.only(*LESSON_CARD_FIELDS)
+    homepage_content = caching.homepage_content()
     return render(request, 'home.html', {
         'lessons': lessons,
-        'homepage_content': homepage_content
+        'homepage_content': homepage_content,
+        'lessons_version': caching.get_version(caching.LESSONS),
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
     })
 
 
@@ -118,27 +158,27 @@ def home(request):
 # ---------------------------
 @login_required
 def dashboard(request):
-    lessons = Lesson.objects.all()
-    progress_qs = Progress.objects.filter(user=request.user)
-
-    total_lessons = lessons.count()
-    total_completed = progress_qs.filter(completed=True).count()
+    lessons = list(Lesson.objects.only(*LESSON_CARD_FIELDS))
+    summary = (
+        UserProgressSummary.objects.select_related('next_lesson').defer('next_lesson__content')
+        .filter(user=request.user).first()
+        or UserProgressSummary(user=request.user)
+    )
+
+    total_lessons = len(lessons)
+    total_completed = summary.completed_count
     overall_progress = int((total_completed / total_lessons) * 100) if total_lessons > 0 else 0
 
     progress_dict = {
-        p.lesson.id: {'completed': p.completed, 'score': p.score, 'percentage': p.score}
-        for p in progress_qs
+        lesson_id: {'completed': completed, 'score': score, 'percentage': score}
+        for lesson_id, completed, score in Progress.objects.filter(user=request.user).values_list(
+            'lesson_id', 'completed', 'score'
+        )
     }
 
     bookings = MentorshipBooking.objects.filter(user=request.user).order_by('-date')
 
-    recommended_lesson = None
-    if progress_qs.exists():
-        lowest_score = min((p.score for p in progress_qs if p.score is not None), default=100)
-        if lowest_score < 70:
-            recommended_lesson = Lesson.objects.exclude(
-                id__in=progress_qs.filter(completed=True).values_list('lesson_id', flat=True)
-            ).first()
+    recommended_lesson = summary.next_lesson
 
     return render(request, 'dashboard.html', {
         'lessons': lessons,
@@ -158,9 +198,14 @@ def dashboard(request):
 def lesson_detail(request, id):
     lesson = get_object_or_404(Lesson, id=id)
     quizzes = lesson.quiz_set.all()
+    pending_job = lesson.quiz_jobs.filter(
+        status__in=[QuizGenerationJob.PENDING, QuizGenerationJob.RUNNING]
+    ).order_by('-id').first()
     return render(request, 'lesson_detail.html', {
         'lesson': lesson,
-        'quizzes': quizzes
+        'quizzes': quizzes,
+        'pending_job': pending_job,
+        'stream_quizzes': _can_stream(request),
     })
 
 
@@ -169,24 +214,37 @@ def lesson_detail(request, id):
 # ---------------------------
 @login_required
 def quiz_page(request, lesson_id):
-    lesson = get_object_or_404(Lesson, id=lesson_id)
+    lesson = get_object_or_404(Lesson.objects.only('id', 'title'), id=lesson_id)
     quizzes = lesson.quiz_set.all()
 
     if request.method == 'POST':
-        score = 0
-        total = quizzes.count()
-
-        for quiz in quizzes:
-            user_answer = request.POST.get(f'option_{quiz.id}')
-            if user_answer and user_answer == quiz.correct_option:
-                score += 1
-
+        # One query fetches every answer key; the submitted radio values are option numbers (1-4).
+        answer_key = Quiz.objects.filter(lesson=lesson).values_list('id', 'correct_index')
+        records = []
+        for quiz_id, correct_index in answer_key:
+            selected = request.POST.get(f'option_{quiz_id}', '')
+            selected_index = int(selected) if selected in ('1', '2', '3', '4') else None
+            records.append(AnswerRecord(quiz_id=quiz_id, selected_index=selected_index,
+                                        is_correct=selected_index == correct_index))
+
+        total = len(records)
+        score = sum(record.is_correct for record in records)
         percentage = int((score / total) * 100) if total > 0 else 0
 
-        progress, _ = Progress.objects.get_or_create(user=request.user, lesson=lesson)
-        progress.score = percentage
-        progress.completed = percentage >= 70
-        progress.save()
+        with transaction.atomic():
+            attempt = QuizAttempt.objects.create(user=request.user, lesson=lesson, score=percentage,
+                                                 correct_count=score, question_count=total)
+            for record in records:
+                record.attempt = attempt
+            AnswerRecord.objects.bulk_create(records, batch_size=500)
+            Progress.objects.bulk_create(
+                [Progress(user=request.user, lesson=lesson, score=percentage, completed=percentage >= 70)],
+                update_conflicts=True,
+                unique_fields=['user', 'lesson'],
+                update_fields=['score', 'completed'],
+            )
+            # bulk_create sends no post_save, so refresh the dashboard summary here.
+            UserProgressSummary.refresh_for(request.user.id)
 
         messages.success(request, f"You scored {percentage}% on {lesson.title}")
         return redirect('dashboard')
@@ -205,7 +263,8 @@ def register(request):
         form = UserCreationForm(request.POST)
         if form.is_valid():
             user = form.save()
-            login(request, user)
+            # With CachedUserBackend enabled both backends can load the user, so record the preferred one.
+            login(request, user, backend=settings.AUTHENTICATION_BACKENDS[0])
             return redirect('dashboard')
     else:
         form = UserCreationForm()
@@ -217,15 +276,37 @@ def register(request):
 # ---------------------------
 @login_required
 def mentorship_booking(request):
-    mentors = ['Pastor James', 'Mrs. Adaobi', 'Dr. Olakunle']
     if request.method == 'POST':
-        mentor = request.POST.get('mentor')
-        date_str = request.POST.get('date')
-        if mentor and date_str:
-            date_obj = timezone.datetime.fromisoformat(date_str)
-            MentorshipBooking.objects.create(user=request.user, mentor=mentor, date=date_obj)
+        slot_id = request.POST.get('slot', '')
+        if not slot_id.isdigit():
+            messages.error(request, "Please choose a session.")
+            return redirect('mentorship_booking')
+        try:
+            mentoring.book_slot(request.user, int(slot_id))
+        except mentoring.SlotUnavailable as e:
+            messages.error(request, str(e))
+            return redirect('mentorship_booking')
+        messages.success(request, "Your mentorship session is booked.")
         return redirect('dashboard')
-    return render(request, 'mentorship_booking.html', {'mentors': mentors})
+    mentoring.top_up_slots()
+    slots = mentoring.free_slots(weeks=MENTOR_BOOKING_WEEKS)
+    return render(request, 'mentorship_booking.html', {'slots': slots})
+
+
+@login_required
+def mentor_availability(request):
+    """Free slots as JSON: ?weeks=N (up to MENTOR_SLOT_WEEKS) and an optional ?mentor=<id>."""
+    try:
+        weeks = min(max(int(request.GET.get('weeks', MENTOR_BOOKING_WEEKS)), 1), settings.MENTOR_SLOT_WEEKS)
+        mentor_id = int(request.GET['mentor']) if request.GET.get('mentor') else None
+    except ValueError:
+        return JsonResponse({'error': 'weeks and mentor must be integers'}, status=400)
+    slots = mentoring.free_slots(weeks=weeks, mentor_id=mentor_id)
+    return JsonResponse({'slots': [
+        {'id': slot.id, 'mentor_id': slot.mentor_id, 'mentor': slot.mentor.name,
+         'start': slot.start.isoformat(), 'end': slot.end.isoformat()}
+        for slot in slots
+    ]})
 
 
 # ---------------------------
@@ -233,13 +314,42 @@ def mentorship_booking(request):
 # ---------------------------
 @login_required
 def forum(request):
-    posts = ForumPost.objects.all()
     if request.method == 'POST':
         title = request.POST.get('title')
         content = request.POST.get('content')
-        ForumPost.objects.create(user=request.user, title=title, content=content)
+        parent = None
+        parent_id = request.POST.get('parent', '')
+        if parent_id and not parent_id.isdigit():
+            messages.error(request, "That post could not be found.")
+            return redirect('forum')
+        if parent_id:
+            parent = get_object_or_404(ForumPost, id=int(parent_id))
+            title = title or f"Re: {parent.title}"[:200]
+        ForumPost.objects.create(user=request.user, title=title, content=content, parent=parent)
         return redirect('forum')
-    return render(request, 'forum.html', {'posts': posts})
+
+    roots, next_cursor = keyset_page(
+        ForumPost.objects.filter(parent__isnull=True).select_related('user'),
+        cursor=request.GET.get('before'),
+        page_size=FORUM_PAGE_SIZE,
+    )
+    replies = {}
+    for reply in ForumPost.objects.filter(thread__in=roots).select_related('user').order_by('thread_id', 'path'):
+        replies.setdefault(reply.thread_id, []).append(reply)
+    threads = [{'post': root, 'replies': replies.get(root.id, [])} for root in roots]
+    return render(request, 'forum.html', {'threads': threads, 'next_cursor': next_cursor})
+
+
+# ---------------------------
+# SEARCH
+# ---------------------------
+@login_required
+def search(request):
+    query = request.GET.get('q', '').strip()
+    started = time.perf_counter()
+    results = search_index.search(query) if query else []
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    return render(request, 'search.html', {'query': query, 'results': results, 'elapsed_ms': elapsed_ms})
 
 
 # ---------------------------
@@ -247,8 +357,12 @@ def forum(request):
 # ---------------------------
 @login_required
 def course(request):
-    lessons = Lesson.objects.all()
-    return render(request, 'course.html', {'lessons': lessons})
+    lessons = Lesson.objects.only(*LESSON_CARD_FIELDS)
+    return render(request, 'course.html', {
+        'lessons': lessons,
+        'lessons_version': caching.get_version(caching.LESSONS),
+        'page_cache_timeout': settings.PAGE_CACHE_TIMEOUT,
+    })
 
 
 # ---------------------------
@@ -266,7 +380,7 @@ def support(request):
 # ---------------------------
 @login_required
 def assessment(request):
-    first_lesson = Lesson.objects.first()
+    first_lesson = Lesson.objects.only('id').first()
     if first_lesson:
         return redirect('quiz_page', lesson_id=first_lesson.id)
     return render(request, 'dashboard.html', {
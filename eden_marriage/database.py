@@ -0,0 +1,58 @@
+"""
+Build ``DATABASES['default']`` from a DATABASE_URL.
+
+Postgres uses psycopg 3's connection pool (Django 5.1+): each worker process
+keeps a small set of open connections that requests borrow and return, and
+the pool checks a connection is alive before handing it out. Django refuses
+persistent connections alongside a pool, so ``CONN_MAX_AGE`` is 0 there;
+without a pool, connections persist for ``conn_max_age`` seconds and are
+health-checked when reused.
+
+SQLite is set up for several gunicorn workers sharing one file:
+``busy_timeout`` makes a writer wait for the lock instead of failing with
+"database is locked", and ``mmap_size`` serves reads from the page cache.
+WAL journaling (``sqlite_wal``) lets readers carry on while a writer commits,
+with ``synchronous=NORMAL`` syncing at checkpoints rather than on every
+commit (safe in WAL mode; a power cut can lose the last commits, never
+corrupt the file). It is opt-in because the journal mode is stored in the
+database file itself and needs ``-wal``/``-shm`` files next to it, which a
+read-only deploy cannot create; without it ``synchronous`` stays FULL. Atomic blocks
+start with ``BEGIN IMMEDIATE``, taking the write lock up front: a deferred
+transaction that reads and then writes cannot wait for the lock (SQLite
+fails it at once to avoid a deadlock), so without it the busy timeout would
+not help the views that check a row before changing it.
+"""
+import dj_database_url
+
+POSTGRES = 'django.db.backends.postgresql'
+SQLITE = 'django.db.backends.sqlite3'
+
+
+def database_config(url, conn_max_age=600, pool=True, pool_min_size=2, pool_max_size=10,
+                    pool_timeout=10.0, statement_timeout_ms=0, sqlite_tuning=True, sqlite_wal=False,
+                    sqlite_busy_timeout_ms=10000, sqlite_mmap_size=128 * 1024 * 1024):
+    config = dj_database_url.parse(url, conn_max_age=conn_max_age, conn_health_checks=True)
+    options = config.setdefault('OPTIONS', {})
+    if config['ENGINE'] == POSTGRES:
+        if pool:
+            from psycopg_pool import ConnectionPool
+
+            options['pool'] = {
+                'min_size': pool_min_size,
+                'max_size': pool_max_size,
+                'timeout': pool_timeout,  # seconds a request waits for a free connection
+                'check': ConnectionPool.check_connection,
+            }
+            config['CONN_MAX_AGE'] = 0
+        if statement_timeout_ms:
+            options['options'] = f'-c statement_timeout={int(statement_timeout_ms)}'
+    elif config['ENGINE'] == SQLITE and sqlite_tuning:
+        pragmas = ['PRAGMA journal_mode=WAL'] if sqlite_wal else []
+        pragmas += [
+            f"PRAGMA synchronous={'NORMAL' if sqlite_wal else 'FULL'}",
+            f'PRAGMA busy_timeout={int(sqlite_busy_timeout_ms)}',
+            f'PRAGMA mmap_size={int(sqlite_mmap_size)}',
+        ]
+        options['init_command'] = ';'.join(pragmas)
+        options['transaction_mode'] = 'IMMEDIATE'
+    return config
@@ -0,0 +1,35 @@
+"""
+Gunicorn settings, picked up automatically from the project root.
+
+SERVER_MODE=wsgi (default) runs the classic sync workers. SERVER_MODE=asgi
+runs uvicorn workers on eden_marriage.asgi, where the async AI views
+(generate_quiz_ai and its event stream) wait on the OpenAI API without tying
+up a worker; pair it with AI_QUIZ_INLINE=True to generate quizzes during the
+request instead of through the job queue. Views that only talk to the
+database stay sync: under ASGI they run in Django's thread pool, which
+`manage.py bench_http` measured at about half the WSGI throughput for the
+forum and dashboard had they been async.
+
+WEB_CONCURRENCY and GUNICORN_TIMEOUT override gunicorn's worker count and
+timeout; unset, gunicorn's own defaults (1 worker, 30 seconds) apply. Every
+worker has its own local-memory cache unless CACHE_URL is shared.
+"""
+import os
+
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'eden_marriage.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+elif SERVER_MODE == 'wsgi':
+    wsgi_app = 'eden_marriage.wsgi:application'
+    worker_class = 'sync'
+else:
+    raise RuntimeError(f"SERVER_MODE must be 'wsgi' or 'asgi', not {SERVER_MODE!r}")
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '8000')}"
+if os.environ.get('WEB_CONCURRENCY'):
+    workers = int(os.environ['WEB_CONCURRENCY'])
+if os.environ.get('GUNICORN_TIMEOUT'):
+    timeout = int(os.environ['GUNICORN_TIMEOUT'])
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG') or None